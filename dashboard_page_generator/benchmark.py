@@ -0,0 +1,394 @@
+"""
+Benchmark do pipeline com dados sintéticos em várias escalas.
+
+Gera N planilhas de vendas com M lojas cada e uma planilha do IPCA no formato do IBGE
+cobrindo várias décadas, e mede cada etapa do pipeline: process_xls_data, run_etl_pipeline,
+generate_mock_sales_data, build_sales_rollups e generate_dashboard. Cada etapa roda em um
+processo novo, de modo que o pico de RSS medido é o da etapa (mais o custo fixo dos imports).
+
+Exemplo:
+    python -m dashboard_page_generator.benchmark --scales 2x50,8x500,16x2000 --years 1995-2024
+    python -m dashboard_page_generator.benchmark --compare data/docs/.metrics/benchmark.jsonl
+"""
+import os
+import io
+import sys
+import json
+import shutil
+import logging
+import argparse
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from .etl_runner import MESES_MAP, run_etl_pipeline, process_xls_data, generate_mock_sales_data
+from .rollups import build_sales_rollups
+from .start import generate_dashboard
+from .instrumentation import RunMetrics
+from .storage import count_rows
+from .excel_reader import EXCEL_ENGINES
+
+logger = logging.getLogger(__name__)
+
+# Etapas medidas, na ordem em que dependem umas das outras
+BENCHMARK_STAGES = ('ipca', 'sales_etl', 'mock_sales', 'rollups', 'dashboard')
+
+# Colunas das planilhas de vendas, como nos relatórios em data_source
+SALES_WORKBOOK_COLUMNS = ['UF', 'Pet Shop', 'ID', 'Compra Maio 2023 (kg)']
+
+UFS = [
+    'AC', 'AL', 'AM', 'AP', 'BA', 'CE', 'DF', 'ES', 'GO', 'MA', 'MG', 'MS', 'MT', 'PA',
+    'PB', 'PE', 'PI', 'PR', 'RJ', 'RN', 'RO', 'RR', 'RS', 'SC', 'SE', 'SP', 'TO',
+]
+
+PET_SHOP_NAMES = [
+    'PetAmigo', 'Patinhas Felizes', 'Bicho Feliz', 'Rações e Carinhos', 'PetBoutique',
+    'Patas Contentes', 'Mundo Pet', 'Focinho Gelado', 'Cão & Gato', 'Pet Center',
+]
+
+# Cabeçalho repetido ao longo da planilha do IBGE
+IPCA_HEADER_ROW = ['ANO', 'MÊS', 'NÚMERO ÍNDICE', 'NO MÊS', '3 MESES', '6 MESES', 'NO ANO', '12 MESES']
+
+def generate_sales_workbooks(folder: str, n_workbooks: int, stores_per_workbook: int, seed: int = 0) -> list:
+    """
+    Gera planilhas de vendas sintéticas no layout dos relatórios 'Relatório Venda - Ração Premium'.
+
+    Args:
+        folder (str): A pasta onde as planilhas serão gravadas.
+        n_workbooks (int): A quantidade de planilhas. exemplo: 10
+        stores_per_workbook (int): A quantidade de lojas (linhas) de cada planilha. exemplo: 1000
+        seed (int): Semente do gerador aleatório, para dados reprodutíveis.
+
+    Returns:
+        list: Os caminhos das planilhas geradas.
+    """
+    os.makedirs(folder, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    pet_shops = np.array(PET_SHOP_NAMES)
+    paths = []
+
+    for workbook in range(n_workbooks):
+        loja = np.arange(stores_per_workbook) + workbook * stores_per_workbook
+        idx_pet_shop = rng.integers(0, len(pet_shops), stores_per_workbook)
+        df = pd.DataFrame({
+            'UF': rng.choice(UFS, stores_per_workbook),
+            'Pet Shop': pet_shops[idx_pet_shop],
+            'ID': [f"L{numero:07d}" for numero in loja],
+            'Compra Maio 2023 (kg)': rng.integers(50, 1000, stores_per_workbook) // 10 * 10,
+        }, columns=SALES_WORKBOOK_COLUMNS)
+
+        path = os.path.join(folder, f"Relatório Venda - Ração Premium {workbook + 1}.xlsx")
+        df.to_excel(path, index=False)
+        paths.append(path)
+
+    return paths
+
+def generate_ipca_workbook(path: str, start_year: int, end_year: int, last_month: int = 12, seed: int = 0) -> int:
+    """
+    Gera uma planilha no formato da série histórica do IPCA do IBGE: o ano aparece apenas na
+    linha de janeiro (coluna A), o mês abreviado na coluna B, o número índice na coluna C e a
+    inflação no mês na coluna D, com linhas em branco entre os anos e o cabeçalho repetido
+    a cada 5 anos.
+
+    O conteúdo é gravado em xlsx, mesmo com a extensão .xls, pois o pandas identifica o formato
+    pelo conteúdo do arquivo.
+
+    Args:
+        path (str): O caminho da planilha. exemplo: ipca_benchmark.xls
+        start_year (int): O primeiro ano da série. exemplo: 1994
+        end_year (int): O último ano da série. exemplo: 2025
+        last_month (int): A quantidade de meses publicados no último ano.
+        seed (int): Semente do gerador aleatório, para dados reprodutíveis.
+
+    Returns:
+        int: A quantidade de meses da série.
+    """
+    rng = np.random.default_rng(seed)
+    meses = list(MESES_MAP)
+    width = len(IPCA_HEADER_ROW)
+    blank = [None] * width
+    rows = [['SÉRIE HISTÓRICA DO IPCA'] + [None] * (width - 1), blank, IPCA_HEADER_ROW, blank]
+
+    indice = 1000.0
+    n_meses = 0
+    for ano in range(start_year, end_year + 1):
+        if ano != start_year and (ano - start_year) % 5 == 0:
+            rows += [IPCA_HEADER_ROW, blank]
+        for mes in range(12 if ano < end_year else last_month):
+            # O parser descarta meses com inflação zero, então a série sintética não tem zeros
+            inflacao = round(float(rng.normal(0.45, 0.35)), 2) or 0.01
+            indice *= 1 + inflacao / 100
+            rows.append([str(ano) if mes == 0 else None, meses[mes], round(indice, 2), inflacao] + [None] * (width - 4))
+            n_meses += 1
+        rows.append(blank)
+
+    # O ExcelWriter valida a extensão do arquivo, então a planilha é montada em memória
+    buffer = io.BytesIO()
+    pd.DataFrame(rows).to_excel(buffer, header=False, index=False, engine='openpyxl')
+    with open(path, 'wb') as f:
+        f.write(buffer.getvalue())
+    return n_meses
+
+def parse_scales(scales: str) -> list:
+    """Converte '2x50,10x1000' em [(2, 50), (10, 1000)] (planilhas x lojas por planilha)."""
+    parsed = []
+    for scale in scales.split(','):
+        n_workbooks, stores = scale.lower().strip().split('x')
+        parsed.append((int(n_workbooks), int(stores)))
+    return parsed
+
+def _stage_paths(workdir: str, file_extension: str) -> dict:
+    """Caminhos dos arquivos de entrada e de saída do benchmark dentro da pasta de trabalho."""
+    docs = os.path.join(workdir, 'docs')
+    return {
+        'raw': os.path.join(workdir, 'raw'),
+        'docs': docs,
+        'ipca_xls': os.path.join(docs, 'ipca_benchmark.xls'),
+        'inflacao': os.path.join(docs, f"inflacao{file_extension}"),
+        'dados': os.path.join(docs, f"dados{file_extension}"),
+        'vendas': os.path.join(docs, f"vendas_ficticias{file_extension}"),
+        'rollups': os.path.join(docs, 'rollups'),
+        'dashboard': os.path.join(docs, 'index.html'),
+    }
+
+def run_benchmark_stage(stage: str, workdir: str, years: list, file_extension: str = '.parquet',
+                        max_workers: int = None, chunk_size: int = None, trace_memory: bool = False,
+                        verbose: bool = False, excel_engine: str = 'pandas') -> dict:
+    """
+    Executa e mede uma etapa do pipeline sobre os dados gerados em workdir.
+
+    Definida no nível do módulo para rodar em um processo novo do ProcessPoolExecutor.
+
+    Args:
+        stage (str): Uma das etapas de BENCHMARK_STAGES.
+        workdir (str): A pasta com as subpastas 'raw' (planilhas) e 'docs' (saídas).
+        years (list): O intervalo de anos lido da planilha do IPCA. exemplo: [1995, 2024]
+        file_extension (str): O formato das tabelas intermediárias (.parquet, .feather ou .csv).
+        max_workers (int): Processos usados por run_etl_pipeline (vazio = sequencial).
+        chunk_size (int): Tamanho dos blocos de generate_mock_sales_data e build_sales_rollups.
+        trace_memory (bool): Mede também o pico de memória alocada com o tracemalloc (mais lento).
+        verbose (bool): Mantém os logs de nível INFO das etapas.
+        excel_engine (str): O motor de leitura das planilhas usado por run_etl_pipeline.
+
+    Returns:
+        dict: O registro da etapa do RunMetrics, com as linhas processadas e a vazão em linhas/s.
+    """
+    if not verbose:
+        logging.disable(logging.INFO)
+
+    paths = _stage_paths(workdir, file_extension)
+    docs = paths['docs']
+    metrics = RunMetrics(trace_memory=trace_memory)
+
+    # Cada etapa é medida pelo tamanho da tabela que produz; as agregações e o
+    # dashboard, pelo tamanho da tabela de vendas que resumem
+    if stage == 'ipca':
+        with metrics.stage(stage, inputs=[paths['ipca_xls']], outputs=[paths['inflacao']]) as record:
+            process_xls_data(paths['ipca_xls'], years, paths['inflacao'])
+        rows = count_rows(paths['inflacao'])
+    elif stage == 'sales_etl':
+        with metrics.stage(stage, outputs=[paths['dados']]) as record:
+            run_etl_pipeline(paths['raw'], os.path.basename(paths['dados']), docs, max_workers=max_workers, excel_engine=excel_engine)
+        rows = count_rows(paths['dados'])
+    elif stage == 'mock_sales':
+        with metrics.stage(stage, inputs=[paths['dados'], paths['inflacao']], outputs=[paths['vendas']]) as record:
+            generate_mock_sales_data(docs, os.path.basename(paths['dados']), os.path.basename(paths['inflacao']),
+                                     os.path.basename(paths['vendas']), chunk_size=chunk_size)
+        rows = count_rows(paths['vendas'])
+    elif stage == 'rollups':
+        with metrics.stage(stage, inputs=[paths['dados'], paths['inflacao']]) as record:
+            build_sales_rollups(docs, os.path.basename(paths['dados']), os.path.basename(paths['inflacao']),
+                                paths['rollups'], file_extension, chunk_size=chunk_size)
+        rows = count_rows(paths['vendas'])
+    elif stage == 'dashboard':
+        with metrics.stage(stage, outputs=[paths['dashboard']]) as record:
+            generate_dashboard(paths['vendas'], rollup_folder=paths['rollups'])
+        rows = count_rows(paths['vendas'])
+    else:
+        raise ValueError(f"Etapa desconhecida: '{stage}'. Use uma de {BENCHMARK_STAGES}.")
+
+    record['rows'] = rows
+    record['rows_per_second'] = round(rows / record['wall_seconds'], 1) if rows and record['wall_seconds'] else None
+    return record
+
+def run_benchmark(scales: list, years: list, workdir: str, file_extension: str = '.parquet', stages: list = None,
+                  repeat: int = 1, max_workers: int = None, chunk_size: int = None, trace_memory: bool = False,
+                  verbose: bool = False, keep: bool = False, excel_engine: str = 'pandas') -> list:
+    """
+    Gera os dados sintéticos de cada escala e mede as etapas do pipeline.
+
+    Args:
+        scales (list): Pares (planilhas, lojas por planilha). exemplo: [(2, 50), (10, 1000)]
+        years (list): Os anos da planilha do IPCA, todos usados na geração das vendas. exemplo: [1995, 2024]
+        workdir (str): A pasta onde os dados de cada escala são gerados.
+        file_extension (str): O formato das tabelas intermediárias (.parquet, .feather ou .csv).
+        stages (list): As etapas medidas. Padrão: todas, na ordem de BENCHMARK_STAGES.
+        repeat (int): Quantas vezes cada etapa é medida; o resultado é a execução mais rápida.
+        max_workers (int): Processos usados por run_etl_pipeline (vazio = sequencial).
+        chunk_size (int): Tamanho dos blocos de generate_mock_sales_data e build_sales_rollups.
+        trace_memory (bool): Mede também o pico de memória alocada com o tracemalloc.
+        verbose (bool): Mantém os logs de nível INFO das etapas.
+        keep (bool): Mantém os dados gerados em workdir ao final.
+        excel_engine (str): O motor de leitura das planilhas usado por run_etl_pipeline.
+
+    Returns:
+        list: Um resultado por escala e etapa.
+    """
+    stages = [stage for stage in BENCHMARK_STAGES if stage in (stages or BENCHMARK_STAGES)]
+    start_year, end_year = years
+    results = []
+
+    # Processos novos (spawn) para que o pico de RSS não herde a memória das etapas anteriores
+    mp_context = multiprocessing.get_context('spawn')
+
+    for n_workbooks, stores_per_workbook in scales:
+        scale = f"{n_workbooks}x{stores_per_workbook}"
+        scale_dir = os.path.join(workdir, scale)
+        shutil.rmtree(scale_dir, ignore_errors=True)
+        paths = _stage_paths(scale_dir, file_extension)
+        os.makedirs(paths['docs'], exist_ok=True)
+
+        generate_sales_workbooks(paths['raw'], n_workbooks, stores_per_workbook)
+        n_meses = generate_ipca_workbook(paths['ipca_xls'], start_year, end_year)
+        logger.info(
+            f"Escala {scale}: {n_workbooks * stores_per_workbook} lojas, {n_meses} meses de IPCA, "
+            f"{n_workbooks * stores_per_workbook * n_meses} linhas de vendas fictícias."
+        )
+
+        # O log em arquivo do etl_runner fica dentro da pasta da escala
+        os.environ['ETL_LOG_FILE'] = os.path.join(scale_dir, 'etl.log')
+
+        for stage in stages:
+            runs = []
+            for _ in range(repeat):
+                with ProcessPoolExecutor(max_workers=1, mp_context=mp_context) as executor:
+                    runs.append(executor.submit(
+                        run_benchmark_stage, stage, scale_dir, [start_year, end_year], file_extension,
+                        max_workers, chunk_size, trace_memory, verbose, excel_engine,
+                    ).result())
+            best = min(runs, key=lambda run: run['wall_seconds'])
+            best.update({'scale': scale, 'workbooks': n_workbooks, 'stores': n_workbooks * stores_per_workbook, 'months': n_meses})
+            results.append(best)
+            logger.info(
+                f"{scale:>12} {stage:<11} {best['wall_seconds']:>9.3f}s {best['rows'] or 0:>12} linhas "
+                f"{best['rows_per_second'] or 0:>14,.0f} linhas/s  pico RSS {best['peak_rss_mb']} MB"
+            )
+
+        if not keep:
+            shutil.rmtree(scale_dir, ignore_errors=True)
+
+    return results
+
+def compare_results(results: list, previous: list, tolerance: float) -> list:
+    """
+    Compara os tempos e o pico de RSS com uma execução anterior, nas mesmas escalas e etapas.
+
+    Args:
+        results (list): Os resultados da execução atual.
+        previous (list): Os resultados da execução de referência.
+        tolerance (float): A piora relativa aceita. exemplo: 0.2 (20%)
+
+    Returns:
+        list: Uma descrição de cada regressão encontrada.
+    """
+    reference = {(run['scale'], run['stage']): run for run in previous}
+    regressions = []
+    for run in results:
+        before = reference.get((run['scale'], run['stage']))
+        if before is None:
+            continue
+        for metric in ('wall_seconds', 'peak_rss_mb'):
+            if before.get(metric) and run.get(metric) and run[metric] > before[metric] * (1 + tolerance):
+                regressions.append(
+                    f"{run['scale']} {run['stage']}: {metric} {before[metric]} -> {run[metric]} "
+                    f"(+{(run[metric] / before[metric] - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+def main(argv: list = None) -> int:
+    """Executa o benchmark pela linha de comando. Retorna 1 se houver regressão em relação a --compare."""
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline com dados sintéticos.")
+    parser.add_argument('--scales', default='2x50,8x500,16x2000',
+                        help="Escalas no formato PLANILHASxLOJAS, separadas por vírgula. Padrão: %(default)s")
+    parser.add_argument('--years', default='1995-2024', help="Anos da planilha do IPCA. Padrão: %(default)s")
+    parser.add_argument('--format', default='parquet', choices=['parquet', 'feather', 'csv'],
+                        help="Formato das tabelas intermediárias. Padrão: %(default)s")
+    parser.add_argument('--stages', default=','.join(BENCHMARK_STAGES), help="Etapas medidas. Padrão: %(default)s")
+    parser.add_argument('--repeat', type=int, default=1, help="Execuções por etapa; vale a mais rápida.")
+    parser.add_argument('--max-workers', type=int, default=None, help="Processos do run_etl_pipeline.")
+    parser.add_argument('--chunk-size', type=int, default=None, help="Tamanho dos blocos das vendas fictícias.")
+    parser.add_argument('--excel-engine', default='pandas', choices=list(EXCEL_ENGINES),
+                        help="Motor de leitura das planilhas. Padrão: %(default)s")
+    parser.add_argument('--trace-memory', action='store_true', help="Mede também o pico do tracemalloc.")
+    parser.add_argument('--workdir', default=None, help="Pasta dos dados gerados. Padrão: pasta temporária.")
+    parser.add_argument('--keep', action='store_true', help="Mantém os dados gerados.")
+    parser.add_argument('--output', default=os.path.join('data/docs', '.metrics', 'benchmark.jsonl'),
+                        help="Arquivo .jsonl onde o resultado é anexado. Padrão: %(default)s")
+    parser.add_argument('--compare', default=None, help="Arquivo .jsonl com a execução de referência (a última linha).")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Piora relativa aceita no --compare. Padrão: %(default)s")
+    parser.add_argument('--verbose', action='store_true', help="Mostra os logs das etapas.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s', stream=sys.stdout)
+    start_year, end_year = (int(year) for year in args.years.split('-'))
+
+    # Lê a referência antes de anexar a execução atual, que pode ir para o mesmo arquivo
+    previous = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            lines = [line for line in f.read().splitlines() if line.strip()]
+        previous = json.loads(lines[-1])['results'] if lines else []
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='etl_benchmark_')
+    try:
+        results = run_benchmark(
+            parse_scales(args.scales),
+            [start_year, end_year],
+            workdir,
+            file_extension='.' + args.format,
+            stages=args.stages.split(','),
+            repeat=args.repeat,
+            max_workers=args.max_workers,
+            chunk_size=args.chunk_size,
+            trace_memory=args.trace_memory,
+            verbose=args.verbose,
+            keep=args.keep,
+            excel_engine=args.excel_engine,
+        )
+    finally:
+        if not args.keep and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        output_dir = os.path.dirname(args.output)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        run = {
+            'started_at': datetime.now(timezone.utc).isoformat(),
+            'format': args.format,
+            'years': [start_year, end_year],
+            'max_workers': args.max_workers,
+            'chunk_size': args.chunk_size,
+            'excel_engine': args.excel_engine,
+            'results': results,
+        }
+        with open(args.output, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(run, ensure_ascii=False) + '\n')
+        logger.info(f"Resultado do benchmark anexado a '{args.output}'.")
+
+    if previous is not None:
+        regressions = compare_results(results, previous, args.tolerance)
+        for regression in regressions:
+            logger.warning(f"⚠️ Regressão: {regression}")
+        if regressions:
+            return 1
+        logger.info(f"✅ Nenhuma regressão acima de {args.tolerance:.0%} em relação a '{args.compare}'.")
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
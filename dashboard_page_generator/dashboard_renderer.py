@@ -0,0 +1,346 @@
+import os
+import base64
+import html
+import json
+import logging
+import numpy as np
+import plotly.io as pio
+from plotly.offline import get_plotlyjs, get_plotlyjs_version
+
+logger = logging.getLogger(__name__)
+
+# Modos de inclusão do plotly.js na página
+PLOTLYJS_MODES = ('inline', 'asset', 'cdn')
+
+# Atributos dos traces convertidos para arrays tipados (codificados em base64 no json)
+TYPED_ARRAY_ATTRIBUTES = ('x', 'y', 'z', 'customdata')
+
+def plotlyjs_asset_name() -> str:
+    """Nome do arquivo local do plotly.js, com a versão para evitar cache desatualizado no navegador."""
+    return f"plotly-{get_plotlyjs_version()}.min.js"
+
+def write_plotlyjs_asset(asset_dir: str) -> str:
+    """
+    Grava o plotly.js como um arquivo local compartilhado entre as páginas.
+    O arquivo só é gravado se a versão ainda não existir na pasta.
+
+    Args:
+        asset_dir (str): A pasta dos arquivos estáticos. exemplo: data/docs/assets
+
+    Returns:
+        str: O caminho do arquivo do plotly.js.
+    """
+    os.makedirs(asset_dir, exist_ok=True)
+    asset_path = os.path.join(asset_dir, plotlyjs_asset_name())
+    if not os.path.exists(asset_path):
+        with open(asset_path, 'w', encoding='utf-8') as f:
+            f.write(get_plotlyjs())
+        logger.info(f"plotly.js {get_plotlyjs_version()} gravado em '{asset_path}'.")
+    return asset_path
+
+def use_typed_arrays(fig, min_length: int = 0):
+    """
+    Converte as séries numéricas dos traces em arrays numpy, que o plotly serializa como
+    arrays tipados em base64 em vez de listas de números em texto.
+
+    Args:
+        fig: A figura do plotly.
+        min_length (int): Converte apenas séries com pelo menos esse número de valores.
+    """
+    for trace in fig.data:
+        for attribute in TYPED_ARRAY_ATTRIBUTES:
+            values = getattr(trace, attribute, None)
+            if values is None or isinstance(values, np.ndarray):
+                continue
+            array = np.asarray(values)
+            if array.dtype.kind in 'iuf' and array.size >= min_length:
+                # O plotly ignora a atribuição de um valor igual ao atual, e o array tem os mesmos
+                # valores da lista; limpar o atributo antes faz o array substituir a lista
+                trace[attribute] = None
+                trace[attribute] = array
+    return fig
+
+def _script_json(value) -> str:
+    """Serializa em json compacto, seguro para ficar dentro de uma tag <script>."""
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False).replace('</', '<\\/')
+
+def _plotlyjs_tag(plotlyjs: str, html_path: str, asset_dir: str = None) -> tuple:
+    """Retorna a tag <script> do plotly.js no modo indicado e o caminho do arquivo local (modo 'asset')."""
+    if plotlyjs not in PLOTLYJS_MODES:
+        raise ValueError(f"Modo do plotly.js inválido: '{plotlyjs}'. Use um de {PLOTLYJS_MODES}.")
+
+    if plotlyjs == 'inline':
+        return f'<script type="text/javascript">{get_plotlyjs()}</script>', None
+    if plotlyjs == 'asset':
+        asset_path = write_plotlyjs_asset(asset_dir or os.path.join(os.path.dirname(html_path), 'assets'))
+        asset_src = os.path.relpath(asset_path, os.path.dirname(html_path) or '.').replace(os.sep, '/')
+        return f'<script type="text/javascript" src="{asset_src}"></script>', asset_path
+    return f'<script type="text/javascript" src="https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js"></script>', None
+
+def _write_figures(f, figures: list, typed_array_min_length: int = 0):
+    """Grava as figuras na página, com o template de layout de cada uma gravado uma única vez."""
+    templates = []
+    figures_json = []
+    for fig in figures:
+        use_typed_arrays(fig, typed_array_min_length)
+        fig_dict = json.loads(pio.to_json(fig, validate=False))
+        layout = fig_dict.get('layout', {})
+
+        template_index = None
+        template = layout.pop('template', None)
+        if template is not None:
+            if template not in templates:
+                templates.append(template)
+            template_index = templates.index(template)
+
+        figures_json.append({'data': fig_dict.get('data', []), 'layout': layout, 'template': template_index})
+
+    f.write("<br>".join(
+        f'<div id="figura-{i}" class="plotly-graph-div" style="height:450px; width:100%;"></div>'
+        for i in range(len(figures_json))
+    ))
+    f.write('<script type="text/javascript">')
+    f.write(f'var TEMPLATES = {_script_json(templates)};')
+    f.write(f'var FIGURES = {_script_json(figures_json)};')
+    f.write(
+        'FIGURES.forEach(function (fig, i) {'
+        'if (fig.template !== null) { fig.layout.template = TEMPLATES[fig.template]; }'
+        'Plotly.newPlot("figura-" + i, fig.data, fig.layout, {responsive: true});'
+        '});'
+    )
+    f.write('</script>')
+
+def render_dashboard_html(figures: list, html_path: str, title: str, heading: str,
+                          plotlyjs: str = 'asset', asset_dir: str = None, typed_array_min_length: int = 0) -> str:
+    """
+    Gera uma página HTML com várias figuras, carregando o plotly.js uma única vez.
+
+    O template de layout, que o plotly repete em cada figura, é gravado uma vez na página
+    e compartilhado entre as figuras com o mesmo template.
+
+    Args:
+        figures (list): As figuras do plotly, na ordem em que aparecem na página.
+        html_path (str): O caminho do arquivo HTML a ser gerado.
+        title (str): O título da página.
+        heading (str): O cabeçalho exibido acima das figuras.
+        plotlyjs (str): 'inline' embute o plotly.js na página; 'asset' usa um arquivo local
+            compartilhado em asset_dir; 'cdn' referencia o CDN do plotly (exige internet).
+        asset_dir (str): A pasta do plotly.js no modo 'asset'. Padrão: pasta 'assets' ao lado da página.
+        typed_array_min_length (int): Tamanho mínimo das séries numéricas codificadas como arrays tipados.
+
+    Returns:
+        str: O caminho do arquivo do plotly.js no modo 'asset', ou None nos outros modos.
+    """
+    plotlyjs_tag, asset_path = _plotlyjs_tag(plotlyjs, html_path, asset_dir)
+
+    with open(html_path, 'w', encoding='utf-8') as f:
+        f.write(f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{html.escape(title)}</title>')
+        f.write(plotlyjs_tag)
+        f.write(f'</head><body><h1>{html.escape(heading)}</h1>')
+        _write_figures(f, figures, typed_array_min_length)
+        f.write('</body></html>')
+
+    return asset_path
+
+# --- Dashboard interativo ---
+
+# Pet shops enviados individualmente para a página; os demais são somados em 'Outros'
+DRILLDOWN_MAX_PET_SHOPS = 100
+DRILLDOWN_OTHERS = 'Outros'
+DRILLDOWN_EMPTY = '(vazio)'
+
+def encode_column(values: np.ndarray) -> dict:
+    """
+    Codifica uma coluna numérica como array tipado em base64, no menor tipo que comporta os valores.
+
+    Returns:
+        dict: {'dtype': nome do array tipado do JavaScript (ex: 'Uint16Array'), 'data': bytes em base64}
+    """
+    values = np.asarray(values)
+    if values.dtype.kind in 'iu' and (values.size == 0 or values.min() >= 0):
+        top = int(values.max()) if values.size else 0
+        dtype = next(dt for dt in (np.uint8, np.uint16, np.uint32, np.float64) if dt == np.float64 or top <= np.iinfo(dt).max)
+    else:
+        dtype = np.float64
+    array = np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder('<'))
+    names = {np.uint8: 'Uint8Array', np.uint16: 'Uint16Array', np.uint32: 'Uint32Array', np.float64: 'Float64Array'}
+    return {'dtype': names[dtype], 'data': base64.b64encode(array.tobytes()).decode('ascii')}
+
+def build_drilldown_payload(df, max_pet_shops: int = DRILLDOWN_MAX_PET_SHOPS) -> dict:
+    """
+    Monta os dados do dashboard interativo em colunas: os nomes de UFs, pet shops e meses vão
+    uma única vez em dicionários, e cada linha leva apenas os códigos e o volume em arrays tipados.
+
+    O tamanho não depende da quantidade de lojas: são no máximo UFs x (max_pet_shops + 1) x meses
+    linhas, pois os pet shops fora dos max_pet_shops de maior volume são somados em 'Outros'.
+
+    Args:
+        df (pd.DataFrame): Volume por 'uf', 'pet_shop', 'ano' e 'mes', com a coluna 'ano_mes' e 'volume_vendas_(kg)'.
+        max_pet_shops (int): Quantidade máxima de pet shops enviados individualmente.
+
+    Returns:
+        dict: O payload serializável em json.
+    """
+    volume_column = 'volume_vendas_(kg)'
+    df = df.assign(
+        uf=df['uf'].astype(object).where(df['uf'].notna(), DRILLDOWN_EMPTY).astype(str),
+        pet_shop=df['pet_shop'].astype(object).where(df['pet_shop'].notna(), DRILLDOWN_EMPTY).astype(str),
+    )
+
+    totals = df.groupby('pet_shop', sort=False)[volume_column].sum().sort_values(ascending=False, kind='stable')
+    if len(totals) > max_pet_shops:
+        kept = set(totals.index[:max_pet_shops])
+        df = df.assign(pet_shop=df['pet_shop'].where(df['pet_shop'].isin(kept), DRILLDOWN_OTHERS))
+        df = df.groupby(['uf', 'pet_shop', 'ano', 'mes', 'ano_mes'], observed=True, sort=False)[volume_column].sum().reset_index()
+
+    months = df[['ano_mes', 'ano', 'mes']].drop_duplicates('ano_mes').sort_values('ano_mes')
+    month_codes = {ano_mes: i for i, ano_mes in enumerate(months['ano_mes'])}
+    ufs = sorted(df['uf'].unique())
+    pet_shops = sorted(df['pet_shop'].unique(), key=lambda name: (name == DRILLDOWN_OTHERS, name))
+
+    return {
+        'rows': len(df),
+        'ufs': ufs,
+        'pet_shops': pet_shops,
+        'meses': months['ano_mes'].tolist(),
+        'anos_meses': encode_column(months['ano'].to_numpy(dtype=np.int64)),
+        'outros': DRILLDOWN_OTHERS if DRILLDOWN_OTHERS in pet_shops else None,
+        'columns': {
+            'uf': encode_column(df['uf'].map({uf: i for i, uf in enumerate(ufs)}).to_numpy(dtype=np.int64)),
+            'pet_shop': encode_column(df['pet_shop'].map({name: i for i, name in enumerate(pet_shops)}).to_numpy(dtype=np.int64)),
+            'mes': encode_column(df['ano_mes'].map(month_codes).to_numpy(dtype=np.int64)),
+            'volume': encode_column(df[volume_column].to_numpy(dtype=np.int64)),
+        },
+    }
+
+# Filtros e agregação no navegador: um único laço sobre as linhas do payload recalcula todos os gráficos
+DRILLDOWN_SCRIPT = """
+function decodeColumn(col) {
+  var bin = atob(col.data), bytes = new Uint8Array(bin.length);
+  for (var i = 0; i < bin.length; i++) { bytes[i] = bin.charCodeAt(i); }
+  return new window[col.dtype](bytes.buffer);
+}
+var COLS = {};
+Object.keys(DATA.columns).forEach(function (name) { COLS[name] = decodeColumn(DATA.columns[name]); });
+var MONTH_YEAR = decodeColumn(DATA.anos_meses);
+var YEARS = Array.from(new Set(MONTH_YEAR)).sort();
+
+function fillSelect(id, labels, values) {
+  var select = document.getElementById(id);
+  labels.forEach(function (label, i) {
+    var option = document.createElement('option');
+    option.value = values ? values[i] : i; option.textContent = label; select.appendChild(option);
+  });
+}
+fillSelect('filtro-uf', DATA.ufs);
+fillSelect('filtro-ano', YEARS.map(String), YEARS);
+fillSelect('filtro-pet-shop', DATA.pet_shops);
+
+function topN(labels, totals, n) {
+  var idx = [];
+  for (var i = 0; i < totals.length; i++) { if (totals[i] > 0) { idx.push(i); } }
+  idx.sort(function (a, b) { return totals[b] - totals[a]; });
+  idx = idx.slice(0, n);
+  return {x: idx.map(function (i) { return labels[i]; }), y: idx.map(function (i) { return totals[i]; })};
+}
+
+function barLayout(title, xTitle) {
+  return {title: {text: title}, xaxis: {title: {text: xTitle}, type: 'category'}, yaxis: {title: {text: 'Volume de Vendas (kg)'}}, template: TEMPLATE};
+}
+
+function recompute() {
+  var started = performance.now();
+  var ufMask = new Uint8Array(DATA.ufs.length), anySelected = false;
+  Array.from(document.getElementById('filtro-uf').selectedOptions).forEach(function (o) { ufMask[+o.value] = 1; anySelected = true; });
+  if (!anySelected) { ufMask.fill(1); }
+  var ano = document.getElementById('filtro-ano').value, petShop = document.getElementById('filtro-pet-shop').value;
+  ano = ano === '' ? -1 : +ano; petShop = petShop === '' ? -1 : +petShop;
+  var n = Math.max(1, +document.getElementById('filtro-top-n').value || 1);
+
+  var uf = COLS.uf, ps = COLS.pet_shop, mes = COLS.mes, volume = COLS.volume;
+  var byMonth = new Float64Array(DATA.meses.length), byPetShop = new Float64Array(DATA.pet_shops.length);
+  var byUf = new Float64Array(DATA.ufs.length), total = 0;
+  for (var i = 0; i < DATA.rows; i++) {
+    if (!ufMask[uf[i]]) { continue; }
+    var m = mes[i];
+    if (ano >= 0 && MONTH_YEAR[m] !== ano) { continue; }
+    if (petShop >= 0 && ps[i] !== petShop) { continue; }
+    var v = volume[i];
+    byMonth[m] += v; byPetShop[ps[i]] += v; byUf[uf[i]] += v; total += v;
+  }
+  var petShopTotals = byPetShop;
+  if (DATA.outros !== null) { petShopTotals = byPetShop.slice(); petShopTotals[DATA.pet_shops.indexOf(DATA.outros)] = 0; }
+
+  var months = topN(DATA.meses, byMonth, n), petShops = topN(DATA.pet_shops, petShopTotals, n), ufs = topN(DATA.ufs, byUf, DATA.ufs.length);
+  var series = {x: [], y: []};
+  for (var k = 0; k < DATA.meses.length; k++) {
+    if (ano < 0 || MONTH_YEAR[k] === ano) { series.x.push(DATA.meses[k]); series.y.push(byMonth[k]); }
+  }
+  var elapsed = performance.now() - started;
+
+  Plotly.react('drill-meses', [{type: 'bar', x: months.x, y: months.y}], barLayout('Top ' + n + ' Meses com Maior Volume de Vendas', 'Mês (Ano)'), {responsive: true});
+  Plotly.react('drill-pet-shops', [{type: 'bar', x: petShops.x, y: petShops.y}], barLayout('Top ' + n + ' Pet Shops com Maior Volume de Vendas', 'Pet Shop'), {responsive: true});
+  Plotly.react('drill-ufs', [{type: 'bar', x: ufs.x, y: ufs.y}], barLayout('Volume de Vendas por UF', 'UF'), {responsive: true});
+  Plotly.react('drill-serie', [{type: 'scatter', mode: 'lines+markers', x: series.x, y: series.y}], barLayout('Volume Mensal de Vendas', 'Mês (Ano)'), {responsive: true});
+  document.getElementById('drill-status').textContent =
+    DATA.rows + ' linhas agregadas em ' + elapsed.toFixed(1) + ' ms. Volume total: ' + Math.round(total).toLocaleString('pt-BR') + ' kg.';
+}
+
+['filtro-uf', 'filtro-ano', 'filtro-pet-shop', 'filtro-top-n'].forEach(function (id) {
+  document.getElementById(id).addEventListener('input', recompute);
+});
+recompute();
+"""
+
+def render_drilldown_html(payload: dict, html_path: str, title: str, heading: str, plotlyjs: str = 'asset',
+                          asset_dir: str = None, top_n: int = 5, figures: list = None) -> str:
+    """
+    Gera o dashboard interativo: os filtros de UF, ano e pet shop e o top N são aplicados no
+    navegador sobre o payload de build_drilldown_payload, sem gerar a página de novo.
+
+    Args:
+        payload (dict): Os dados de build_drilldown_payload.
+        html_path (str): O caminho do arquivo HTML a ser gerado.
+        title (str): O título da página.
+        heading (str): O cabeçalho exibido acima dos filtros.
+        plotlyjs (str): 'inline', 'asset' ou 'cdn', como em render_dashboard_html.
+        asset_dir (str): A pasta do plotly.js no modo 'asset'. Padrão: pasta 'assets' ao lado da página.
+        top_n (int): O valor inicial do top N.
+        figures (list): Figuras estáticas exibidas abaixo dos gráficos interativos.
+
+    Returns:
+        str: O caminho do arquivo do plotly.js no modo 'asset', ou None nos outros modos.
+    """
+    plotlyjs_tag, asset_path = _plotlyjs_tag(plotlyjs, html_path, asset_dir)
+    template = pio.templates[pio.templates.default].to_plotly_json() if pio.templates.default else None
+    chart_style = 'height:450px; width:100%;'
+
+    with open(html_path, 'w', encoding='utf-8') as f:
+        f.write(f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{html.escape(title)}</title>')
+        f.write(plotlyjs_tag)
+        f.write('<style>.filtros{display:flex;gap:1.5em;align-items:flex-start;font-family:sans-serif}'
+                '.filtros label{display:flex;flex-direction:column;gap:.3em}#drill-status{font-family:sans-serif;color:#555}</style>')
+        f.write(f'</head><body><h1>{html.escape(heading)}</h1>')
+        f.write(
+            '<div class="filtros">'
+            '<label>UF (nenhuma = todas)<select id="filtro-uf" multiple size="6"></select></label>'
+            '<label>Ano<select id="filtro-ano"><option value="">Todos</option></select></label>'
+            '<label>Pet Shop<select id="filtro-pet-shop"><option value="">Todos</option></select></label>'
+            f'<label>Top N<input id="filtro-top-n" type="number" min="1" value="{int(top_n)}"></label>'
+            '</div><p id="drill-status"></p>'
+        )
+        f.write("<br>".join(
+            f'<div id="{div_id}" class="plotly-graph-div" style="{chart_style}"></div>'
+            for div_id in ('drill-meses', 'drill-pet-shops', 'drill-ufs', 'drill-serie')
+        ))
+        f.write('<script type="text/javascript">')
+        f.write(f'var DATA = {_script_json(payload)};')
+        f.write(f'var TEMPLATE = {_script_json(template)};')
+        f.write(DRILLDOWN_SCRIPT)
+        f.write('</script>')
+        if figures:
+            f.write('<br>')
+            _write_figures(f, figures)
+        f.write('</body></html>')
+
+    return asset_path
@@ -0,0 +1,283 @@
+"""
+Banco de dados local (SQLite) com o histórico das vendas, para consultas sem carregar as tabelas no pandas.
+
+Tabelas:
+    vendas   - uma linha por loja e mês (chave: ano, mes, id, ocorrencia), com índices em uf e pet_shop
+    lojas    - os dados base de cada loja (chave: id, ocorrencia)
+    inflacao - a inflação de cada mês (chave: ano, mes)
+
+O id não é único entre as planilhas regionais: duas planilhas podem trazer lojas diferentes com
+o mesmo id. A coluna ocorrencia numera as repetições do id nos dados base, na ordem em que
+aparecem (0 para a primeira), para que cada loja tenha as suas próprias linhas.
+
+O mês é gravado como número (1 a 12). As cargas são feitas em lotes com executemany e
+atualizam as linhas já existentes (upsert), então recarregar os mesmos dados não duplica linhas
+e lojas ou meses que saíram dos arquivos continuam no histórico.
+
+Exemplo de consulta:
+    python -m dashboard_page_generator.database data/docs/vendas.sqlite \
+        "SELECT uf, ano, SUM(volume_vendas_kg) AS volume FROM vendas GROUP BY uf, ano ORDER BY uf, ano"
+"""
+import os
+import sys
+import sqlite3
+import logging
+import numpy as np
+import pandas as pd
+
+from .manifest import load_manifest, save_manifest, stage_is_current, record_stage
+from .rollups import ROLLUPS, VOLUME_COLUMN
+from .schema import SALES_BASE_SCHEMA, INFLATION_SCHEMA, MOCK_SALES_SCHEMA, ROLLUP_SCHEMA, MONTH_NAMES, apply_schema, month_numbers
+from .storage import read_table, iter_table
+
+logger = logging.getLogger(__name__)
+
+# Linhas por lote de executemany
+DATABASE_BATCH_SIZE = 100_000
+
+# Versão do esquema das tabelas, gravada em PRAGMA user_version. Um banco de outra versão é
+# recriado na próxima carga, já que todo o conteúdo vem dos arquivos do pipeline
+DATABASE_VERSION = 2
+
+DATABASE_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS vendas (
+        id TEXT NOT NULL,
+        ocorrencia INTEGER NOT NULL DEFAULT 0,
+        ano INTEGER NOT NULL,
+        mes INTEGER NOT NULL,
+        uf TEXT,
+        pet_shop TEXT,
+        volume_vendas_kg INTEGER NOT NULL,
+        PRIMARY KEY (ano, mes, id, ocorrencia)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS lojas (
+        id TEXT NOT NULL,
+        ocorrencia INTEGER NOT NULL DEFAULT 0,
+        uf TEXT,
+        pet_shop TEXT,
+        compra_maio_2023_kg REAL,
+        PRIMARY KEY (id, ocorrencia)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS inflacao (
+        ano INTEGER NOT NULL,
+        mes INTEGER NOT NULL,
+        inflacao_no_mes REAL,
+        PRIMARY KEY (ano, mes)
+    )
+    """,
+]
+
+# Índices secundários da tabela vendas: nome -> colunas. A tabela já é ordenada pela chave
+# (ano, mes, id, ocorrencia), que serve às consultas por mês. Os índices incluem o volume para
+# que as somas por UF e por pet shop sejam calculadas só com o índice, sem ler a tabela
+DATABASE_INDEXES = {
+    'idx_vendas_uf': 'uf, ano, mes, volume_vendas_kg',
+    'idx_vendas_pet_shop': 'pet_shop, volume_vendas_kg',
+}
+
+# As linhas que não mudaram não são regravadas, o que evita atualizar os índices em uma recarga
+UPSERT_VENDAS = """
+    INSERT INTO vendas (id, ocorrencia, ano, mes, uf, pet_shop, volume_vendas_kg) VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (ano, mes, id, ocorrencia) DO UPDATE SET
+        uf = excluded.uf, pet_shop = excluded.pet_shop, volume_vendas_kg = excluded.volume_vendas_kg
+    WHERE uf IS NOT excluded.uf OR pet_shop IS NOT excluded.pet_shop OR volume_vendas_kg IS NOT excluded.volume_vendas_kg
+"""
+
+UPSERT_LOJAS = """
+    INSERT INTO lojas (id, ocorrencia, uf, pet_shop, compra_maio_2023_kg) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (id, ocorrencia) DO UPDATE SET
+        uf = excluded.uf, pet_shop = excluded.pet_shop, compra_maio_2023_kg = excluded.compra_maio_2023_kg
+"""
+
+UPSERT_INFLACAO = """
+    INSERT INTO inflacao (ano, mes, inflacao_no_mes) VALUES (?, ?, ?)
+    ON CONFLICT (ano, mes) DO UPDATE SET inflacao_no_mes = excluded.inflacao_no_mes
+"""
+
+def connect_database(database_path: str) -> sqlite3.Connection:
+    """Abre o banco de dados, criando as tabelas e os índices que ainda não existem."""
+    database_dir = os.path.dirname(database_path)
+    if database_dir:
+        os.makedirs(database_dir, exist_ok=True)
+    conn = sqlite3.connect(database_path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version != DATABASE_VERSION:
+        tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        if tables:
+            logger.info(f"Banco de dados '{database_path}' na versão {version} do esquema; as tabelas serão recriadas na versão {DATABASE_VERSION}.")
+        with conn:
+            for table in ('vendas', 'lojas', 'inflacao'):
+                conn.execute(f"DROP TABLE IF EXISTS {table}")
+            conn.execute(f"PRAGMA user_version = {DATABASE_VERSION}")
+    for statement in DATABASE_TABLES:
+        conn.execute(statement)
+    create_indexes(conn)
+    return conn
+
+def create_indexes(conn: sqlite3.Connection):
+    """Cria os índices secundários da tabela vendas que ainda não existem."""
+    for name, columns in DATABASE_INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON vendas ({columns})")
+
+def _rows(df: pd.DataFrame, columns: list):
+    """Linhas do DataFrame como tuplas de tipos do Python, com None no lugar dos valores vazios."""
+    values = [df[col].astype(object).where(df[col].notna(), None).tolist() for col in columns]
+    return zip(*values)
+
+def store_occurrences(df_lojas: pd.DataFrame) -> np.ndarray:
+    """Número da ocorrência do id de cada loja nos dados base: 0 na primeira vez, 1 na segunda, ..."""
+    return df_lojas.groupby('id', observed=True, sort=False).cumcount().to_numpy(dtype=np.int64)
+
+def upsert_sales(conn: sqlite3.Connection, df: pd.DataFrame, ocorrencia=0) -> int:
+    """
+    Grava um bloco de vendas fictícias na tabela vendas, atualizando as lojas e meses já existentes.
+
+    Args:
+        conn (sqlite3.Connection): A conexão aberta por connect_database.
+        df (pd.DataFrame): Vendas no formato de MOCK_SALES_SCHEMA.
+        ocorrencia: A ocorrência do id de cada linha (veja store_occurrences), ou 0 para todas.
+
+    Returns:
+        int: A quantidade de linhas do bloco.
+    """
+    batch = pd.DataFrame({
+        'id': df['id'],
+        'ocorrencia': np.broadcast_to(np.asarray(ocorrencia, dtype=np.int64), len(df)),
+        'ano': df['ano'].astype('int64'),
+        'mes': month_numbers(df['mes']).astype('int64'),
+        'uf': df['uf'],
+        'pet_shop': df['pet_shop'],
+        'volume': df[VOLUME_COLUMN].astype('int64'),
+    })
+    conn.executemany(UPSERT_VENDAS, _rows(batch, ['id', 'ocorrencia', 'ano', 'mes', 'uf', 'pet_shop', 'volume']))
+    return len(batch)
+
+def load_sales_database(source_csv_file_folder: str, base_data_file: str, inflacao_file: str, sales_file: str, database_path: str,
+                        manifest_path: str = None, batch_size: int = DATABASE_BATCH_SIZE) -> int:
+    """
+    Carrega as vendas fictícias, os dados base das lojas e a inflação no banco de dados.
+
+    Na primeira carga os índices secundários de vendas são criados depois da inserção, o que é
+    bem mais rápido do que atualizá-los linha a linha. Toda a carga é feita em uma única transação.
+
+    Args:
+        source_csv_file_folder (str): A pasta com os arquivos do pipeline.
+        base_data_file (str): O nome do arquivo com os dados de maio de 2023.
+        inflacao_file (str): O nome do arquivo com os dados de inflação.
+        sales_file (str): O nome do arquivo de vendas fictícias gerado por generate_mock_sales_data.
+        database_path (str): O caminho do arquivo do banco de dados. exemplo: data/docs/vendas.sqlite
+        manifest_path (str): Manifesto do modo incremental. Quando informado, a carga é pulada
+            se os arquivos de origem não mudaram desde a última execução.
+        batch_size (int): Quantidade de linhas lidas e gravadas por lote.
+
+    Returns:
+        int: A quantidade de linhas de vendas carregadas (0 se a carga foi pulada).
+    """
+    sales_path = os.path.join(source_csv_file_folder, sales_file)
+    sales_base_path = os.path.join(source_csv_file_folder, base_data_file)
+    inflacao_file_path = os.path.join(source_csv_file_folder, inflacao_file)
+    inputs = [sales_path, sales_base_path, inflacao_file_path]
+
+    if manifest_path:
+        manifest = load_manifest(manifest_path)
+        if stage_is_current(manifest, 'database', inputs, [database_path]):
+            logger.info(f"✅ O banco de dados '{database_path}' está atualizado.")
+            return 0
+
+    conn = connect_database(database_path)
+    rows_loaded = 0
+    try:
+        with conn:
+            first_load = conn.execute("SELECT NOT EXISTS (SELECT 1 FROM vendas)").fetchone()[0]
+            if first_load:
+                for name in DATABASE_INDEXES:
+                    conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+            df_lojas = read_table(sales_base_path, SALES_BASE_SCHEMA)
+            occurrences = store_occurrences(df_lojas)
+            store_ids = df_lojas['id'].astype(str).to_numpy()
+
+            for chunk in iter_table(sales_path, MOCK_SALES_SCHEMA, batch_size=batch_size):
+                if occurrences.any():
+                    # Com ids repetidos, a loja de cada linha vem da posição: as vendas fictícias
+                    # seguem a ordem meses x lojas dos dados base (veja iter_mock_sales_chunks)
+                    positions = (rows_loaded + np.arange(len(chunk))) % len(df_lojas)
+                    if not (chunk['id'].astype(str).to_numpy() == store_ids[positions]).all():
+                        raise ValueError(f"As vendas de '{sales_path}' não seguem a ordem das lojas de '{sales_base_path}'.")
+                    rows_loaded += upsert_sales(conn, chunk, occurrences[positions])
+                else:
+                    rows_loaded += upsert_sales(conn, chunk)
+
+            df_lojas = df_lojas.assign(ocorrencia=occurrences)
+            conn.executemany(UPSERT_LOJAS, _rows(df_lojas, ['id', 'ocorrencia', 'uf', 'pet_shop', 'compra_maio_2023_(kg)']))
+
+            df_inflacao = read_table(inflacao_file_path, INFLATION_SCHEMA)
+            df_inflacao = df_inflacao.assign(MES=month_numbers(df_inflacao['MES']).astype('int64'), ANO=df_inflacao['ANO'].astype('int64'))
+            conn.executemany(UPSERT_INFLACAO, _rows(df_inflacao, ['ANO', 'MES', 'INFLACAO_NO_MES']))
+
+            create_indexes(conn)
+        conn.execute("PRAGMA optimize")
+    finally:
+        conn.close()
+
+    logger.info(f"✅ {rows_loaded} linhas de vendas carregadas no banco de dados '{database_path}'.")
+
+    if manifest_path:
+        record_stage(manifest, 'database', inputs, [database_path])
+        save_manifest(manifest, manifest_path)
+
+    return rows_loaded
+
+def query_database(database_path: str, sql: str, params: tuple = ()) -> pd.DataFrame:
+    """Executa uma consulta no banco de dados e retorna o resultado como DataFrame."""
+    conn = sqlite3.connect(f"file:{database_path}?mode=ro", uri=True)
+    try:
+        return pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
+
+def rollups_from_database(database_path: str) -> dict:
+    """
+    Calcula as agregações de ROLLUPS com consultas SQL, no mesmo formato de read_rollups.
+
+    Args:
+        database_path (str): O caminho do banco de dados carregado por load_sales_database.
+
+    Returns:
+        dict: Um DataFrame por agregação, com as colunas de agrupamento, o volume total e,
+            nas agregações por mês, a coluna 'ano_mes'.
+    """
+    rollups = {}
+    for name, keys in ROLLUPS.items():
+        columns = ', '.join(keys)
+        df = query_database(
+            database_path,
+            f'SELECT {columns}, SUM(volume_vendas_kg) AS "{VOLUME_COLUMN}" FROM vendas GROUP BY {columns} ORDER BY {columns}',
+        )
+        if 'mes' in df.columns:
+            df = df.assign(
+                ano_mes=df['ano'].astype(str) + '-' + df['mes'].map('{:02d}'.format),
+                mes=df['mes'].map(MONTH_NAMES),
+            )
+        rollups[name] = apply_schema(df, ROLLUP_SCHEMA)
+    return rollups
+
+def main(argv: list = None) -> int:
+    """Executa uma consulta SQL no banco de dados e imprime o resultado."""
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2:
+        print("Uso: python -m dashboard_page_generator.database <banco.sqlite> \"<consulta SQL>\"")
+        return 2
+    database_path, sql = argv
+    print(query_database(database_path, sql).to_string(index=False))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
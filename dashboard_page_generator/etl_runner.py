@@ -6,6 +6,22 @@ import requests
 import zipfile
 import glob
 import shutil
+import itertools
+import io
+import json
+import fnmatch
+import multiprocessing
+from urllib.parse import urlparse
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED, as_completed
+
+from .manifest import load_manifest, save_manifest, fingerprint_file, record_file, stage_is_current, record_stage
+from .schema import SALES_BASE_SCHEMA, INFLATION_SCHEMA, MOCK_SALES_SCHEMA, categorical_codes, month_numbers
+from .storage import storage_format, with_extension, read_table, write_table, TableWriter
+from .excel_reader import read_excel_columns, resolve_excel_engine
+from .price_index import PRICE_INDEX_FILE, PriceIndexStore, update_price_index
+from .validation import (
+    ColumnMapping, REJECTION_REPORT_FILE, validate_sales_data, failed_file_report, log_rejections, write_rejection_report,
+)
 
 # --- Seção de Configuração do Logger ---
 logger = logging.getLogger(__name__)
@@ -14,7 +30,8 @@ logger.setLevel(logging.INFO)
 # Adiciona handlers ao logger apenas se eles ainda não existirem
 if not logger.handlers:
     c_handler = logging.StreamHandler()
-    f_handler = logging.FileHandler('file.log')
+    # O arquivo de log pode ser trocado pela variável de ambiente ETL_LOG_FILE
+    f_handler = logging.FileHandler(os.environ.get('ETL_LOG_FILE', 'file.log'))
 
     c_format = logging.Formatter('%(name)s - %(levelname)s - %(message)s')
     f_format = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -25,45 +42,128 @@ if not logger.handlers:
     logger.addHandler(f_handler)
 # --- Fim da Seção de Configuração do Logger ---
 
-def run_etl_pipeline(source_data_folder: str, output_filename: str, output_source_data_folder: str,):
+# Tamanho padrão dos blocos do download do IPCA (1 MB)
+IPCA_DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Diretório do cache do ZIP do IPCA, dentro da pasta de saída
+IPCA_CACHE_DIR = '.ipca_cache'
+
+# Mapeamento dos meses de português para números
+MESES_MAP = {
+    'JAN': '01', 'FEV': '02', 'MAR': '03', 'ABR': '04', 'MAI': '05', 'JUN': '06',
+    'JUL': '07', 'AGO': '08', 'SET': '09', 'OUT': '10', 'NOV': '11', 'DEZ': '12'
+}
+
+# Método de início dos processos que leem as planilhas. As etapas do pipeline rodam em threads
+# (scheduler.run_stages) e um fork feito com outras threads ativas copia os locks no estado em
+# que estão (os do logging, por exemplo), podendo travar o processo filho; 'spawn' inicia um
+# interpretador novo, como no benchmark
+PROCESS_START_METHOD = 'spawn'
+
+# Colunas das planilhas de vendas usadas pelo pipeline. Os nomes aceitos no cabeçalho de cada
+# uma estão em validation.DEFAULT_COLUMN_MAPPING
+SALES_COLUMNS = ['uf', 'id', 'pet_shop', 'compra_maio_2023_(kg)']
+
+def load_excel(file_path: str, engine: str = 'pandas', mapping: ColumnMapping = None) -> pd.DataFrame:
+    """
+    Extrai dados de um único arquivo Excel.
+
+    Args:
+        file_path (str): O caminho da planilha xlsx.
+        engine (str): 'pandas' lê todas as colunas com pd.read_excel. 'openpyxl', 'calamine' e 'auto'
+            leem apenas as colunas do mapeamento, já com os tipos de SALES_BASE_SCHEMA (exceto as quantidades).
+        mapping (ColumnMapping): O mapeamento das colunas. Padrão: validation.DEFAULT_COLUMN_MAPPING.
+    """
+    try:
+        if engine == 'pandas':
+            return pd.read_excel(file_path)
+        mapping = mapping or ColumnMapping()
+        # As quantidades chegam como estão na planilha; a conversão (e a rejeição do que não é
+        # número) fica com validate_sales_data
+        dtypes = {
+            col: dtype for col, dtype in SALES_BASE_SCHEMA.items()
+            if mapping.columns.get(col, {}).get('tipo') != 'quantidade'
+        }
+        return read_excel_columns(file_path, mapping.names, dtypes, engine=engine, mapping=mapping)
+    except Exception as e:
+        raise ConnectionRefusedError(f"Erro ao carregar o arquivo Excel {file_path}: {e}")
+
+def clean_sales_data(df: pd.DataFrame, mapping: ColumnMapping = None) -> pd.DataFrame:
+    """
+    Limpa e transforma o DataFrame de dados de vendas: localiza as colunas pelo mapeamento,
+    reorganiza-as e descarta as linhas rejeitadas pela validação (veja validate_sales_data).
+    """
+    clean_df, _ = validate_sales_data(df, mapping or ColumnMapping())
+    return clean_df
+
+def process_sales_workbook(file_path: str, excel_engine: str = 'pandas', mapping: ColumnMapping = None) -> tuple:
+    """
+    Extrai, valida e limpa uma planilha de vendas. Definida no nível do módulo para
+    poder ser executada em processos do ProcessPoolExecutor.
+
+    Returns:
+        tuple: As linhas válidas (pd.DataFrame) e o relatório de rejeições da planilha (dict).
+    """
+    mapping = mapping or ColumnMapping()
+    raw_df = load_excel(file_path, engine=excel_engine, mapping=mapping)
+    clean_df, report = validate_sales_data(raw_df, mapping, os.path.basename(file_path))
+    log_rejections(report)
+    return clean_df, report
+
+def run_etl_pipeline(source_data_folder: str, output_filename: str, output_source_data_folder: str, max_workers: int = None, manifest_path: str = None, excel_engine: str = 'pandas',
+                     column_mapping: ColumnMapping = None):
     """
     Orquestra o processo ETL para os arquivos Excel na pasta especificada.
-    As funções auxiliares de ETL são definidas localmente para encapsulamento.
+
+    Sem max_workers, as planilhas são processadas em sequência e concatenadas ao final.
+    Com max_workers, as planilhas são processadas em paralelo por um pool de processos
+    e cada resultado é anexado ao arquivo de saída assim que fica pronto, de modo que o uso
+    de memória não cresce com a quantidade de arquivos. Nesse modo a ordem das linhas
+    segue a ordem de conclusão das planilhas.
+
+    As linhas rejeitadas pela validação e as planilhas que não puderam ser lidas ficam no
+    relatório REJECTION_REPORT_FILE, gravado na pasta de saída.
 
     Args:
         source_data_folder (str): O caminho para as planilhas xlsx com dados base
-        output_filename (str): Arquivo csv a ser gerado. exemplo: dados.csv 
-        source_data_folder (str): O caminho para salvar o arquivo csv de saída com dados base
+        output_filename (str): Arquivo a ser gerado; o formato segue a extensão (.csv, .parquet ou .feather). exemplo: dados.parquet
+        output_source_data_folder (str): O caminho para salvar o arquivo de saída com dados base
+        max_workers (int): Quantidade de processos para o processamento paralelo. exemplo: 4
+        manifest_path (str): Manifesto para o modo incremental. Quando informado, delega para run_incremental_etl_pipeline.
+        excel_engine (str): O motor de leitura das planilhas: 'pandas' (todas as colunas), 'openpyxl', 'calamine'
+            ou 'auto' (apenas as colunas usadas). Veja excel_reader.EXCEL_ENGINES.
+        column_mapping (ColumnMapping): O mapeamento das colunas das planilhas. Padrão: validation.DEFAULT_COLUMN_MAPPING.
     """
+    # Valida o motor antes de distribuir as planilhas, resolvendo o modo 'auto' uma única vez
+    excel_engine = resolve_excel_engine(excel_engine)
+    logger.info(f"Motor de leitura das planilhas: '{excel_engine}'.")
+    column_mapping = column_mapping or ColumnMapping()
+    report_path = os.path.join(output_source_data_folder, REJECTION_REPORT_FILE)
+
+    if manifest_path:
+        return run_incremental_etl_pipeline(
+            source_data_folder, output_filename, output_source_data_folder, manifest_path,
+            max_workers=max_workers, excel_engine=excel_engine, column_mapping=column_mapping,
+        )
 
     # --- Funções de ETL ---
-    def load_excel(file_path: str) -> pd.DataFrame:
-        """Extrai dados de um único arquivo Excel usando pandas."""
-        try:
-            df = pd.read_excel(file_path)
-            return df
-        except Exception as e:
-            raise ConnectionRefusedError(f"Erro ao carregar o arquivo Excel {file_path}: {e}")
-
-    def clean_sales_data(df: pd.DataFrame) -> pd.DataFrame:
-        """
-        Limpa e transforma o DataFrame de dados de vendas,
-        incluindo a reorganização das colunas.
-        """
-        df.columns = [col.lower().strip().replace(' ', '_') for col in df.columns]
-        new_column_order = ['uf', 'id', 'pet_shop', 'compra_maio_2023_(kg)']
-        df_reordered = df[new_column_order]
-        return df_reordered.dropna()
-
-    def save_to_csv(df: pd.DataFrame, output_source_data_folder: str):
-        """Salva o DataFrame como csv na pasta especificada."""
+    def save_table(df: pd.DataFrame, output_source_data_folder: str):
+        """Salva o DataFrame na pasta especificada, no formato indicado pela extensão do arquivo."""
         try:
             file_path = os.path.join(output_source_data_folder, output_filename)
-            df.to_csv(file_path, index=False)
+            write_table(df, file_path, SALES_BASE_SCHEMA)
             logger.info(f"O arquivo '{file_name}' foi salvo com sucesso em '{file_path}'.")
         except Exception as e:
-            logger.error(f"Erro ao salvar dados no arquivo CSV: {e}")
-            raise OSError(f"Erro ao carregar dados para o arquivo CSV.")
+            logger.error(f"Erro ao salvar dados no arquivo {output_filename}: {e}")
+            raise OSError(f"Erro ao carregar dados para o arquivo {output_filename}.")
+
+    def append_table(writer: TableWriter, df: pd.DataFrame):
+        """Anexa o DataFrame ao arquivo de saída."""
+        try:
+            writer.write(df)
+        except Exception as e:
+            logger.error(f"Erro ao salvar dados no arquivo {output_filename}: {e}")
+            raise OSError(f"Erro ao carregar dados para o arquivo {output_filename}.")
     # --- Fim das Funções de ETL aninhadas ---
 
     excel_files = [f for f in os.listdir(source_data_folder) if f.endswith('.xlsx') and not f.startswith('~')]
@@ -72,6 +172,49 @@ def run_etl_pipeline(source_data_folder: str, output_filename: str, output_sourc
         logger.warning(f"Nenhum arquivo Excel encontrado em {source_data_folder}. Pulando o ETL.")
         return
 
+    reports = []
+
+    if max_workers:
+        pending_files = iter(excel_files)
+        output_path = os.path.join(output_source_data_folder, output_filename)
+
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(PROCESS_START_METHOD)) as executor, TableWriter(output_path, SALES_BASE_SCHEMA) as writer:
+            # Mantém no máximo 2 planilhas por processo em andamento para limitar a memória
+            futures = {}
+            for file_name in itertools.islice(pending_files, max_workers * 2):
+                file_path = os.path.join(source_data_folder, file_name)
+                logger.info(f"Iniciando ETL para o arquivo: {file_path}")
+                futures[executor.submit(process_sales_workbook, file_path, excel_engine, column_mapping)] = file_name
+
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_name = futures.pop(future)
+                    try:
+                        clean_df, report = future.result()
+                    except Exception as e:
+                        logger.error(f"Erro ao processar o arquivo {file_name}: {e}")
+                        clean_df, report = None, failed_file_report(file_name, e)
+                    reports.append(report)
+
+                    if clean_df is not None:
+                        append_table(writer, clean_df)
+                        logger.info(f"Processado com sucesso o arquivo {file_name}")
+
+                    next_file = next(pending_files, None)
+                    if next_file is not None:
+                        file_path = os.path.join(source_data_folder, next_file)
+                        logger.info(f"Iniciando ETL para o arquivo: {file_path}")
+                        futures[executor.submit(process_sales_workbook, file_path, excel_engine, column_mapping)] = next_file
+
+        if writer.rows_written:
+            logger.info(f"{writer.rows_written} linhas salvas em '{output_path}'.")
+            logger.info("Todos os dados processados foram carregados no banco de dados.")
+        else:
+            logger.info("Nenhum dado para carregar no banco de dados após o processamento dos arquivos.")
+        write_rejection_report(reports, report_path)
+        return
+
     all_cleaned_data = []
 
     for file_name in excel_files:
@@ -79,72 +222,371 @@ def run_etl_pipeline(source_data_folder: str, output_filename: str, output_sourc
         logger.info(f"Iniciando ETL para o arquivo: {file_path}")
 
         try:
-            raw_df = load_excel(file_path)
-            clean_df = clean_sales_data(raw_df)
+            clean_df, report = process_sales_workbook(file_path, excel_engine, column_mapping)
             all_cleaned_data.append(clean_df)
             logger.info(f"Processado com sucesso o arquivo {file_name}")
         except Exception as e:
             logger.error(f"Erro ao processar o arquivo {file_name}: {e}")
+            report = failed_file_report(file_name, e)
+        reports.append(report)
 
     if all_cleaned_data:
         final_df = pd.concat(all_cleaned_data, ignore_index=True)
-        save_to_csv(final_df, output_source_data_folder)
+        save_table(final_df, output_source_data_folder)
         logger.info("Todos os dados processados foram carregados no banco de dados.")
     else:
         logger.info("Nenhum dado para carregar no banco de dados após o processamento dos arquivos.")
+    write_rejection_report(reports, report_path)
 
-def download_and_extract_data(url_zip, target_dir):
+def run_incremental_etl_pipeline(source_data_folder: str, output_filename: str, output_source_data_folder: str, manifest_path: str, max_workers: int = None, excel_engine: str = 'pandas',
+                                 column_mapping: ColumnMapping = None):
     """
-    Baixa um arquivo ZIP de uma URL, descompacta-o e move o arquivo .xls
-    para o diretório de destino.
+    Executa o ETL de forma incremental usando o manifesto.
+
+    Cada planilha limpa é guardada como uma partição, no mesmo formato do arquivo de saída,
+    identificada pelo hash do seu conteúdo e do mapeamento de colunas. Apenas planilhas novas
+    ou alteradas são lidas novamente; o arquivo de saída é remontado a partir das partições e
+    só é regravado quando o conjunto de planilhas mudou. O relatório de rejeições de cada
+    partição fica no manifesto, de modo que o relatório gravado cobre todas as planilhas.
+
+    Args:
+        source_data_folder (str): O caminho para as planilhas xlsx com dados base
+        output_filename (str): Arquivo a ser gerado; o formato segue a extensão (.csv, .parquet ou .feather). exemplo: dados.parquet
+        output_source_data_folder (str): O caminho para salvar o arquivo de saída com dados base
+        manifest_path (str): O caminho para o arquivo json do manifesto.
+        max_workers (int): Quantidade de processos para ler as planilhas alteradas em paralelo. exemplo: 4
+        excel_engine (str): O motor de leitura das planilhas. Veja excel_reader.EXCEL_ENGINES.
+        column_mapping (ColumnMapping): O mapeamento das colunas das planilhas.
+    """
+    excel_engine = resolve_excel_engine(excel_engine)
+    column_mapping = column_mapping or ColumnMapping()
+    excel_files = sorted(f for f in os.listdir(source_data_folder) if f.endswith('.xlsx') and not f.startswith('~'))
+
+    if not excel_files:
+        logger.warning(f"Nenhum arquivo Excel encontrado em {source_data_folder}. Pulando o ETL.")
+        return
+
+    manifest = load_manifest(manifest_path)
+    partitions_dir = os.path.join(output_source_data_folder, '.etl_cache', 'partitions')
+    os.makedirs(partitions_dir, exist_ok=True)
+    output_path = os.path.join(output_source_data_folder, output_filename)
+    partition_extension = os.path.splitext(output_filename)[1].lower()
+    storage_format(output_path)
+
+    report_path = os.path.join(output_source_data_folder, REJECTION_REPORT_FILE)
+    # Um mapeamento de colunas diferente gera outras partições para as mesmas planilhas
+    mapping_key = column_mapping.digest[:12]
+
+    def partition_key(fingerprint: dict) -> str:
+        return f"{fingerprint['sha256']}-{mapping_key}"
+
+    def partition_path(fingerprint: dict) -> str:
+        return os.path.join(partitions_dir, f"{partition_key(fingerprint)}{partition_extension}")
+
+    fingerprints = {}
+    changed_files = []
+    for file_name in excel_files:
+        file_path = os.path.join(source_data_folder, file_name)
+        fingerprints[file_path] = fingerprint_file(manifest, file_path)
+        if not os.path.exists(partition_path(fingerprints[file_path])):
+            changed_files.append(file_path)
+
+    logger.info(f"{len(changed_files)} de {len(excel_files)} planilhas novas ou alteradas.")
+
+    failed_reports = {}
+
+    def store_partition(file_path: str, clean_df: pd.DataFrame, report: dict):
+        fingerprint = fingerprints[file_path]
+        write_table(clean_df, partition_path(fingerprint), SALES_BASE_SCHEMA)
+        manifest['partitions'][partition_key(fingerprint)] = {'rows': len(clean_df), 'report': report}
+        record_file(manifest, file_path, fingerprint, rows=len(clean_df))
+        logger.info(f"Processado com sucesso o arquivo {os.path.basename(file_path)}")
+
+    def fail_partition(file_path: str, error: Exception):
+        logger.error(f"Erro ao processar o arquivo {os.path.basename(file_path)}: {error}")
+        failed_reports[file_path] = failed_file_report(os.path.basename(file_path), error)
+
+    if max_workers and len(changed_files) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(PROCESS_START_METHOD)) as executor:
+            futures = {executor.submit(process_sales_workbook, path, excel_engine, column_mapping): path for path in changed_files}
+            for future in as_completed(futures):
+                file_path = futures[future]
+                try:
+                    store_partition(file_path, *future.result())
+                except Exception as e:
+                    fail_partition(file_path, e)
+    else:
+        for file_path in changed_files:
+            logger.info(f"Iniciando ETL para o arquivo: {file_path}")
+            try:
+                store_partition(file_path, *process_sales_workbook(file_path, excel_engine, column_mapping))
+            except Exception as e:
+                fail_partition(file_path, e)
+
+    # Planilhas com erro ficam sem partição e são tentadas de novo na próxima execução
+    valid_files = [path for path in fingerprints if os.path.exists(partition_path(fingerprints[path]))]
+    reports = list(failed_reports.values())
+    for file_path in valid_files:
+        partition = manifest['partitions'].get(partition_key(fingerprints[file_path]), {})
+        record_file(manifest, file_path, fingerprints[file_path], rows=partition.get('rows'))
+        if partition.get('report'):
+            reports.append({**partition['report'], 'arquivo': os.path.basename(file_path)})
+    write_rejection_report(reports, report_path)
+
+    if not valid_files:
+        logger.info("Nenhum dado para carregar no banco de dados após o processamento dos arquivos.")
+        save_manifest(manifest, manifest_path)
+        return
+
+    if stage_is_current(manifest, 'sales_etl', valid_files, [output_path], {'mapeamento': mapping_key}):
+        logger.info(f"✅ Nenhuma planilha alterada. '{output_path}' está atualizado.")
+        save_manifest(manifest, manifest_path)
+        return
+
+    # Remonta o arquivo de saída a partir das partições, uma por vez
+    try:
+        if storage_format(output_path) == 'csv':
+            # No csv as partições são concatenadas direto, sem carregá-las no pandas
+            with open(output_path, 'wb') as output:
+                for i, file_path in enumerate(valid_files):
+                    with open(partition_path(fingerprints[file_path]), 'rb') as partition:
+                        header = partition.readline()
+                        if i == 0:
+                            output.write(header)
+                        shutil.copyfileobj(partition, output)
+        else:
+            with TableWriter(output_path, SALES_BASE_SCHEMA) as writer:
+                for file_path in valid_files:
+                    writer.write(read_table(partition_path(fingerprints[file_path]), SALES_BASE_SCHEMA))
+    except Exception as e:
+        logger.error(f"Erro ao salvar dados no arquivo {output_filename}: {e}")
+        raise OSError(f"Erro ao carregar dados para o arquivo {output_filename}.")
+
+    record_stage(manifest, 'sales_etl', valid_files, [output_path], {'mapeamento': mapping_key})
+    save_manifest(manifest, manifest_path)
+    logger.info(f"O arquivo '{output_filename}' foi salvo com sucesso em '{output_path}'.")
+    logger.info("Todos os dados processados foram carregados no banco de dados.")
+
+def fetch_ipca_archive(url_zip: str, cache_dir: str, chunk_size: int = IPCA_DOWNLOAD_CHUNK_SIZE, timeout: int = 60) -> str:
+    """
+    Obtém o arquivo ZIP do IPCA usando um cache local persistente.
+
+    Quando o ZIP já está no cache, a requisição é condicional (If-None-Match /
+    If-Modified-Since) e uma resposta 304 reaproveita o arquivo local. Um download
+    interrompido fica salvo como '.part' e é retomado com uma requisição Range.
+    Se o servidor estiver inacessível, o ZIP em cache é usado.
 
     Args:
         url_zip (str): A url para baixar o arquivo zip do IPCA.
-        target_dir (str): O diretório para destino do arquivo xls.
+        cache_dir (str): O diretório do cache local.
+        chunk_size (int): Tamanho dos blocos gravados durante o download, em bytes.
+        timeout (int): Tempo limite das requisições, em segundos.
+
+    Returns:
+        str: O caminho para o arquivo ZIP em cache.
     """
-    local_zip = os.path.join(target_dir, "ipca_data.zip")
-    temp_dir = os.path.join(target_dir, "temp_data_ipca")
+    os.makedirs(cache_dir, exist_ok=True)
+    zip_name = os.path.basename(urlparse(url_zip).path) or "ipca_data.zip"
+    zip_path = os.path.join(cache_dir, zip_name)
+    part_path = f"{zip_path}.part"
+    meta_path = f"{zip_path}.json"
+
+    meta = {}
+    if os.path.exists(meta_path):
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    # Os validadores só valem para a mesma url
+    if meta.get('url') != url_zip:
+        meta = {'url': url_zip}
+
+    def save_meta():
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    def discard_partial():
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        meta.pop('partial', None)
+        save_meta()
+
+    headers = {}
+    resume_from = 0
+    partial = meta.get('partial') or {}
+    if os.path.exists(part_path) and partial.get('validator'):
+        resume_from = os.path.getsize(part_path)
+        headers['Range'] = f"bytes={resume_from}-"
+        headers['If-Range'] = partial['validator']
+        logging.info(f"Retomando o download de '{url_zip}' a partir do byte {resume_from}...")
+    elif os.path.exists(zip_path):
+        complete = meta.get('complete') or {}
+        if complete.get('etag'):
+            headers['If-None-Match'] = complete['etag']
+        if complete.get('last_modified'):
+            headers['If-Modified-Since'] = complete['last_modified']
+        logging.info(f"Verificando se '{url_zip}' mudou desde o último download...")
+    else:
+        logging.info(f"Iniciando o download de '{url_zip}'...")
 
-    logging.info(f"Iniciando o download de '{url_zip}'...")
-    resposta = requests.get(url_zip, stream=True)
-    resposta.raise_for_status()
+    try:
+        with requests.get(url_zip, headers=headers, stream=True, timeout=timeout) as resposta:
+            if resposta.status_code == 304:
+                logging.info(f"✅ O arquivo em cache '{zip_path}' está atualizado.")
+                return zip_path
+
+            if headers.get('Range') and resposta.status_code != 206:
+                # O servidor não retomou o download (o arquivo mudou, a faixa é inválida ou houve
+                # um erro): o parcial não serve mais e não é usado de novo na próxima execução
+                logging.info(f"O download de '{url_zip}' não foi retomado (HTTP {resposta.status_code}); o arquivo parcial foi descartado.")
+                discard_partial()
+                if resposta.status_code == 416:
+                    return fetch_ipca_archive(url_zip, cache_dir, chunk_size, timeout)
+            resposta.raise_for_status()
+
+            if resposta.status_code == 206:
+                content_range = resposta.headers.get('Content-Range', '')
+                if not content_range.startswith(f"bytes {resume_from}-"):
+                    # Faixa diferente da pedida: descarta o parcial e baixa do início
+                    discard_partial()
+                    return fetch_ipca_archive(url_zip, cache_dir, chunk_size, timeout)
+                mode = 'ab'
+            else:
+                resume_from = 0
+                mode = 'wb'
+
+            # Guarda um validador forte para que um download interrompido possa ser retomado
+            etag = resposta.headers.get('ETag')
+            last_modified = resposta.headers.get('Last-Modified')
+            validator = etag if etag and not etag.startswith('W/') else last_modified
+            meta['partial'] = {'validator': validator, 'etag': etag, 'last_modified': last_modified}
+            save_meta()
+
+            expected_size = resposta.headers.get('Content-Length')
+            with open(part_path, mode) as arquivo_zip_local:
+                for chunk in resposta.iter_content(chunk_size=chunk_size):
+                    arquivo_zip_local.write(chunk)
+
+            if expected_size is not None and os.path.getsize(part_path) != resume_from + int(expected_size):
+                raise requests.exceptions.ConnectionError(
+                    f"Download incompleto de '{url_zip}'. O arquivo parcial será retomado na próxima execução."
+                )
+    except requests.exceptions.RequestException as e:
+        if os.path.exists(zip_path) and not headers.get('Range'):
+            logging.warning(f"Não foi possível verificar '{url_zip}' ({e}). Usando o arquivo em cache '{zip_path}'.")
+            return zip_path
+        raise
+
+    os.replace(part_path, zip_path)
+    meta['complete'] = {'etag': meta['partial']['etag'], 'last_modified': meta['partial']['last_modified']}
+    meta.pop('partial', None)
+    save_meta()
 
-    with open(local_zip, 'wb') as arquivo_zip_local:
-        for chunk in resposta.iter_content(chunk_size=8192):
-            arquivo_zip_local.write(chunk)
-    
     logging.info("✅ Download do arquivo ZIP concluído com sucesso!")
-    logging.info(f"Descompactando o arquivo '{local_zip}'...")
-    
-    if os.path.exists(temp_dir):
-        shutil.rmtree(temp_dir)
-    os.makedirs(temp_dir)
+    return zip_path
 
-    with zipfile.ZipFile(local_zip, 'r') as zip_ref:
-        zip_ref.extractall(temp_dir)
-        
-    logging.info("✅ Arquivo ZIP descompactado com sucesso!")
+def read_ipca_xls_from_zip(path_to_zip: str, pattern: str = 'ipca_*.xls'):
+    """
+    Lê a planilha 'ipca_*.xls' direto do arquivo ZIP, em memória, sem descompactar em disco.
 
-    path_to_xls_temp = glob.glob(os.path.join(temp_dir, '**', 'ipca_*.xls'), recursive=True)
-    if not path_to_xls_temp:
-        raise FileNotFoundError("Nenhum arquivo .xls com o padrão 'ipca_' foi encontrado no diretório descompactado.")
-    
-    path_to_xls_temp = path_to_xls_temp[0]
-    nome_arquivo_xls = os.path.basename(path_to_xls_temp)
-    path_to_xls_final = os.path.join(target_dir, nome_arquivo_xls)
-    
-    shutil.move(path_to_xls_temp, path_to_xls_final)
-    
-    return path_to_xls_final
+    Args:
+        path_to_zip (str): O caminho para o arquivo zip do IPCA.
+        pattern (str): O padrão do nome da planilha. Os ZIPs de outros índices do IBGE seguem o
+            mesmo layout. exemplo: 'inpc_*.xls'
+
+    Returns:
+        tuple: O nome da planilha dentro do ZIP e o seu conteúdo em bytes.
+    """
+    with zipfile.ZipFile(path_to_zip, 'r') as zip_ref:
+        members = [
+            name for name in zip_ref.namelist()
+            if fnmatch.fnmatchcase(os.path.basename(name), pattern)
+        ]
+        if not members:
+            raise FileNotFoundError(f"Nenhum arquivo com o padrão '{pattern}' foi encontrado no arquivo ZIP.")
+        return members[0], zip_ref.read(members[0])
+
+def normalize_year_ranges(years_to_filter) -> list:
+    """
+    Normaliza o filtro de anos para uma lista de intervalos fechados.
+
+    Args:
+        years_to_filter: Um intervalo com ano de início e ano de fim ex: [2020, 2024],
+            ou uma lista de intervalos ex: [[2000, 2005], [2020, 2024]]
+
+    Returns:
+        list: Lista de tuplas (ano_inicio, ano_fim).
+    """
+    years = list(years_to_filter)
+    if years and all(isinstance(year, (list, tuple)) for year in years):
+        return [(int(min(year_range)), int(max(year_range))) for year_range in years]
+    return [(int(min(years)), int(max(years)))]
+
+def parse_ipca_sheet(df_raw: pd.DataFrame, years_to_filter) -> pd.DataFrame:
+    """
+    Extrai a inflação mensal da planilha histórica do IBGE, sem iterar linha a linha.
+
+    As linhas que marcam um ano (4 dígitos na coluna 'A') são localizadas com uma máscara.
+    Para cada ano dentro dos intervalos são tomadas a linha do ano e as 11 seguintes
+    (1 ano = 12 meses), com o mês na coluna 'B' e a inflação na coluna 'D'.
+
+    Args:
+        df_raw (pd.DataFrame): A planilha lida sem cabeçalho.
+        years_to_filter: Um intervalo [2020, 2024] ou uma lista de intervalos [[2000, 2005], [2020, 2024]].
+            None extrai a série completa.
+
+    Returns:
+        pd.DataFrame: Colunas 'ANO', 'MES' e 'INFLACAO_NO_MES', na ordem da planilha.
+    """
+    year_ranges = normalize_year_ranges(years_to_filter) if years_to_filter is not None else [(0, 9999)]
+
+    # Converte a coluna 'A' para string para verificar se contém um ano de 4 dígitos
+    col_a = df_raw[0].astype(str)
+    is_year = (col_a.str.len() == 4) & col_a.str.isdigit()
+    years = pd.to_numeric(col_a.where(is_year), errors='coerce')
+
+    in_range = pd.Series(False, index=df_raw.index)
+    for start_year, end_year in year_ranges:
+        in_range |= years.between(start_year, end_year)
+
+    year_positions = np.flatnonzero((is_year & in_range).to_numpy())
+    logging.info(f"Encontrados {len(year_positions)} anos nos intervalos {year_ranges}.")
+
+    # Posições da linha do ano e das 11 próximas, descartando as que passam do fim da planilha
+    positions = (year_positions[:, np.newaxis] + np.arange(12)).ravel()
+    year_of_row = np.repeat(years.to_numpy()[year_positions], 12)
+    valid = positions < len(df_raw)
+    positions, year_of_row = positions[valid], year_of_row[valid]
+
+    # Extrai os dados das colunas B (índice 1) e D (índice 3)
+    mes = df_raw[1].iloc[positions].reset_index(drop=True)
+    inflacao = df_raw[3].iloc[positions].reset_index(drop=True)
+
+    # Mantém apenas as linhas com mês e inflação preenchidos (valores vazios ou zero são ignorados)
+    def is_filled(values: pd.Series) -> pd.Series:
+        filled = values.notna() & values.astype(bool)
+        return filled & (values.astype(str) != '')
+    keep = (is_filled(mes) & is_filled(inflacao)).to_numpy()
+
+    return pd.DataFrame({
+        'ANO': year_of_row[keep].astype(np.int64),
+        'MES': mes[keep].astype(str).str.strip().to_numpy(),
+        # Converte a coluna de inflação (com vírgula decimal) para formato numérico
+        'INFLACAO_NO_MES': pd.to_numeric(
+            inflacao[keep].astype(str).str.replace(',', '.').str.strip(), errors='coerce'
+        ).to_numpy(),
+    })
 
 def process_xls_data(path_to_xls, years_to_filter, path_to_csv_file):
     """
-    Lê o arquivo XLS, processa os dados de inflação e os salva em um arquivo CSV.
+    Lê o arquivo XLS, processa os dados de inflação e os salva em um arquivo csv, parquet ou feather.
 
     Args:
-        path_to_xls (str): O caminho para a planilha xls com dados históricos do IPCA
-        years_to_filter (str): Array para intervalo de interesse com um ano de início e um ano de fim ex: [2020, 2024]
-        path_to_csv_file : O caminho para o arquivo csv que será exportado.
+        path_to_xls (str): O caminho para a planilha xls com dados históricos do IPCA, ou o seu conteúdo em memória (io.BytesIO)
+        years_to_filter (str): Array para intervalo de interesse com um ano de início e um ano de fim ex: [2020, 2024],
+            ou lista de intervalos lidos de uma só vez ex: [[2000, 2005], [2020, 2024]]
+        path_to_csv_file : O caminho para o arquivo que será exportado; o formato segue a extensão.
+
+    Returns:
+        pd.DataFrame: Os dados de inflação exportados.
     """
     logging.info("Iniciando o processamento dos dados do arquivo XLS...")
     
@@ -152,91 +594,149 @@ def process_xls_data(path_to_xls, years_to_filter, path_to_csv_file):
     df_raw = pd.read_excel(path_to_xls, header=None)
     logging.info(f"DataFrame bruto lido com {len(df_raw)} linhas.")
 
-    final_data = []
-    start_year = min(years_to_filter)
-    end_year = max(years_to_filter)
-
-    for index, row in df_raw.iterrows():
-        # Converte a célula da coluna 'A' para string para verificar se contém um ano
-        col_a_value = str(row[0])
-
-        # Verifica se o valor é um ano de 4 dígitos e está no intervalo desejado
-        if len(col_a_value) == 4 and col_a_value.isdigit():
-            year_found = int(col_a_value)
-            logging.info(f"Encontrado ano {year_found} na linha {index}.")
-
-            # Se o ano for um dos anos para filtrar, processa as 12 linhas seguintes (1 ano = 12 meses)
-            if start_year <= year_found <= end_year:
-                # O processamento será feito para a linha atual e as 11 próximas
-                for i in range(12):
-                    current_row_index = index + i
-                    # Verifica se a linha existe no DataFrame para evitar erros
-                    if current_row_index < len(df_raw):
-                        row_ipca_data = df_raw.iloc[current_row_index]
-
-                        # Extrai os dados das colunas B (índice 1) e D (índice 3)
-                        mes = row_ipca_data[1] if pd.notna(row_ipca_data[1]) else None
-                        inflacao = row_ipca_data[3] if pd.notna(row_ipca_data[3]) else None
-
-                        # Adiciona os dados à lista
-                        if mes and inflacao:
-                            final_data.append({
-                                'ANO': year_found,
-                                'MES': str(mes).strip(),
-                                'INFLACAO_NO_MES': str(inflacao).replace(',', '.').strip()
-                            })
-
-    # Cria o DataFrame final a partir da lista
-    df_final = pd.DataFrame(final_data)
-
-    # Converte a coluna de inflação para formato numérico
-    df_final['INFLACAO_NO_MES'] = pd.to_numeric(df_final['INFLACAO_NO_MES'], errors='coerce')
-    
+    df_final = parse_ipca_sheet(df_raw, years_to_filter)
+
     # Adiciona a contagem de linhas ao log
     logging.info(f"Dados processados: {len(df_final)} entradas.")
 
-    # Exporta para CSV
-    df_final.to_csv(path_to_csv_file, index=False, encoding='utf-8')
+    # Exporta no formato indicado pela extensão do arquivo
+    write_table(df_final, path_to_csv_file, INFLATION_SCHEMA)
     
     logging.info(f"✅ Dados dos anos {years_to_filter} exportados com sucesso para '{path_to_csv_file}'.")
 
-def process_ipca_data(url_zip, years_to_filter, csv_filename, OUTPUT_MOCK_FOLDER):
+    return df_final
+
+def read_price_index_source(source, indice: str = 'IPCA') -> pd.DataFrame:
     """
-    Orquestra o processo de obtenção e processamento dos dados de inflação IPCA.
+    Lê a série completa de um índice de preços a partir de um arquivo local.
 
     Args:
-        url_zip (str): A url para baixar o arquivo zip do IPCA.
-        years_to_filter (str): Array para intervalo de interesse com um ano de início e um ano de fim ex: [2020, 2024]
-        csv_filename : O nome do arquivo CSV gerado com os dados de inflação no período de interesse.
+        source: A planilha da série histórica do IBGE (.xls ou .xlsx, ou o seu conteúdo em io.BytesIO),
+            o ZIP do IBGE com a planilha '<indice>_*.xls', ou uma tabela (.csv, .parquet ou .feather)
+            com as colunas de INFLATION_SCHEMA.
+        indice (str): O nome do índice, usado para localizar a planilha dentro do ZIP. exemplo: 'INPC'
+
+    Returns:
+        pd.DataFrame: Colunas 'ANO', 'MES' e 'INFLACAO_NO_MES'.
+    """
+    if isinstance(source, str):
+        extension = os.path.splitext(source)[1].lower()
+        if extension == '.zip':
+            nome_arquivo_xls, conteudo_xls = read_ipca_xls_from_zip(source, f"{indice.lower()}_*.xls")
+            logging.info(f"Lendo a planilha '{nome_arquivo_xls}' direto do arquivo '{source}'.")
+            source = io.BytesIO(conteudo_xls)
+        elif extension not in ('.xls', '.xlsx'):
+            return read_table(source, INFLATION_SCHEMA)
+    return parse_ipca_sheet(pd.read_excel(source, header=None), None)
+
+def process_price_index_files(sources: dict, store_path: str, manifest_path: str = None) -> PriceIndexStore:
     """
+    Carrega na base de índices de preços as séries de arquivos locais, como o INPC.
 
-    OUTPUT_MOCK_FOLDER = "data/docs"
+    Args:
+        sources (dict): Índice -> arquivo, nos formatos de read_price_index_source.
+            exemplo: {'INPC': 'data/docs/inpc_202508SerieHist.xls'}
+        store_path (str): O caminho da base. exemplo: data/docs/indices_precos.parquet
+        manifest_path (str): Manifesto do modo incremental. Quando informado, um arquivo só é
+            lido de novo se mudou desde a última carga.
+
+    Returns:
+        PriceIndexStore: A base atualizada.
+    """
+    manifest = load_manifest(manifest_path) if manifest_path else None
+    stored = PriceIndexStore.load(store_path).indices if os.path.exists(store_path) else []
+
+    for indice, path in sources.items():
+        stage = f"price_index_{indice.lower()}"
+        if manifest is not None and indice.upper() in stored and stage_is_current(manifest, stage, [path], [store_path]):
+            logging.info(f"✅ O índice {indice.upper()} na base está atualizado com '{path}'.")
+            continue
+        update_price_index(store_path, indice, read_price_index_source(path, indice))
+        if manifest is not None:
+            record_stage(manifest, stage, [path], [store_path])
+            save_manifest(manifest, manifest_path)
+
+    return PriceIndexStore.load(store_path)
+
+def process_ipca_data(url_zip, years_to_filter, csv_filename, OUTPUT_MOCK_FOLDER, manifest_path=None, chunk_size=IPCA_DOWNLOAD_CHUNK_SIZE,
+                      price_index_file=PRICE_INDEX_FILE):
+    """
+    Orquestra o processo de obtenção e processamento dos dados de inflação IPCA.
+
+    A série completa do IPCA é lida uma única vez para a base de índices de preços
+    (price_index_file) e o arquivo de inflação do intervalo de anos é gerado a partir da base.
+    Um novo intervalo de anos não exige ler a planilha de novo; ela só é lida quando muda.
 
+    Args:
+        url_zip (str): A url para baixar o arquivo zip do IPCA.
+        years_to_filter (str): Array para intervalo de interesse com um ano de início e um ano de fim ex: [2020, 2024],
+            ou lista de intervalos ex: [[2000, 2005], [2020, 2024]]
+        csv_filename : O nome do arquivo gerado com os dados de inflação no período de interesse (.csv, .parquet ou .feather).
+        OUTPUT_MOCK_FOLDER (str): A pasta com a planilha 'ipca_*.xls' local, o cache do ZIP, a base de
+            índices e o arquivo gerado. exemplo: data/docs
+        manifest_path (str): Manifesto do modo incremental. Quando informado, o csv só é regerado
+            se a planilha xls (ou o ZIP do IBGE) ou o intervalo de anos mudaram desde a última execução.
+            Sem manifesto, a planilha só é lida se a base ainda não tem o IPCA.
+        chunk_size (int): Tamanho dos blocos gravados durante o download do ZIP, em bytes.
+        price_index_file (str): O nome do arquivo da base de índices de preços, na mesma pasta.
+    """
     target_dir = OUTPUT_MOCK_FOLDER
     path_to_csv_file = os.path.join(target_dir, csv_filename)
-    
-    # --- Passo 1: Verifica se o arquivo final já existe ---
-    found_csv_files = glob.glob(os.path.join(target_dir, f"ipca_*.csv"))
-    if found_csv_files:
-        logging.info(f"✅ O arquivo '{found_csv_files[0]}' já existe. O script será encerrado.")
-        return
-    
-    path_to_xls = None
+    store_path = os.path.join(target_dir, price_index_file)
+    year_ranges = normalize_year_ranges(years_to_filter)
+
+    def export_window(store: PriceIndexStore):
+        df_final = store.monthly_table('IPCA', year_ranges)
+        write_table(df_final, path_to_csv_file, INFLATION_SCHEMA)
+        logging.info(f"✅ Dados dos anos {years_to_filter} exportados com sucesso para '{path_to_csv_file}'.")
+        return df_final
+
     try:
+        store = PriceIndexStore.load(store_path) if os.path.exists(store_path) else None
+
+        # --- Passo 1: Sem manifesto, a série já gravada na base é usada sem consultar a origem ---
+        if store is not None and 'IPCA' in store.indices and not manifest_path:
+            logging.info(f"✅ O IPCA já está na base '{store_path}'. Pulando a leitura da planilha.")
+            export_window(store)
+            return
+
         # --- Verifica se o arquivo xls já foi obtido ---
         sheet_xls_local = glob.glob(os.path.join(target_dir, f"ipca_*.xls"))
         if sheet_xls_local:
             logging.info(f"✅ Foi encontrada a planilha '{sheet_xls_local[0]}'. Pulando o download.")
-            path_to_xls = sheet_xls_local[0]
+            path_to_source = sheet_xls_local[0]
         else:
             # Cria os diretórios necessários
             os.makedirs(target_dir, exist_ok=True)
-            # Baixa e extrai os dados
-            path_to_xls = download_and_extract_data(url_zip, target_dir)
-            
-        # --- Processa os dados a partir do arquivo XLS ---
-        if path_to_xls:
-            process_xls_data(path_to_xls, years_to_filter, path_to_csv_file)
+            # Obtém o ZIP pelo cache local, baixando apenas se ele mudou no servidor
+            path_to_source = fetch_ipca_archive(url_zip, os.path.join(target_dir, IPCA_CACHE_DIR), chunk_size=chunk_size)
+
+        store_is_current = store is not None and 'IPCA' in store.indices
+        if manifest_path:
+            manifest = load_manifest(manifest_path)
+            params = {'years_to_filter': [list(year_range) for year_range in year_ranges]}
+            if stage_is_current(manifest, 'ipca', [path_to_source], [path_to_csv_file, store_path], params):
+                logging.info(f"✅ O arquivo '{path_to_csv_file}' está atualizado com '{path_to_source}'.")
+                return
+            store_is_current = store_is_current and stage_is_current(manifest, 'price_index_ipca', [path_to_source], [store_path])
+
+        # --- Lê a série completa da planilha, direto do ZIP quando é o caso, só se ela mudou ---
+        if store_is_current:
+            logging.info(f"✅ O IPCA na base '{store_path}' está atualizado com '{path_to_source}'.")
+        else:
+            df_serie = read_price_index_source(path_to_source, 'IPCA')
+            logging.info(f"Série completa do IPCA lida de '{path_to_source}': {len(df_serie)} meses.")
+            store = PriceIndexStore(update_price_index(store_path, 'IPCA', df_serie))
+            if manifest_path:
+                record_stage(manifest, 'price_index_ipca', [path_to_source], [store_path])
+
+        df_final = export_window(store)
+
+        if manifest_path:
+            record_file(manifest, path_to_source, fingerprint_file(manifest, path_to_source), rows=len(df_final))
+            record_file(manifest, path_to_csv_file, fingerprint_file(manifest, path_to_csv_file), rows=len(df_final))
+            record_stage(manifest, 'ipca', [path_to_source], [path_to_csv_file, store_path], params)
+            save_manifest(manifest, manifest_path)
 
     except requests.exceptions.RequestException as e:
         logging.error(f"❌ Erro de download: {e}")
@@ -246,38 +746,157 @@ def process_ipca_data(url_zip, years_to_filter, csv_filename, OUTPUT_MOCK_FOLDER
         logging.error(f"❌ Erro: {e}")
     except Exception as e:
         logging.error(f"❌ Ocorreu um erro inesperado: {e}")
-    finally:
-        # Limpeza de arquivos temporários
-        temp_dir = os.path.join(target_dir, "temp_data_ipca")
-        local_zip = os.path.join(target_dir, "ipca_data.zip")
-        if os.path.exists(local_zip):
-            os.remove(local_zip)
-        if os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir)
-        logging.info("Limpeza de arquivos temporários concluída.")
-
-def generate_mock_sales_data(source_csv_file_folder: str, base_data_file: str, inflacao_file: str, output_file: str):
+
+def prepare_inflation_table(df_inflacao: pd.DataFrame) -> pd.DataFrame:
+    """
+    Prepara a tabela de inflação: adiciona as colunas 'MES_NUM' e 'DATA' e ordena por data.
+
+    Args:
+        df_inflacao (pd.DataFrame): Tabela com as colunas 'ANO', 'MES' e 'INFLACAO_NO_MES'.
+
+    Returns:
+        pd.DataFrame: A tabela ordenada por data.
+    """
+    # Converte a coluna 'MES' para o número do mês (int8)
+    df_inflacao['MES_NUM'] = month_numbers(df_inflacao['MES'])
+
+    # Cria a coluna 'DATA' a partir do ano e do número do mês, sem montar strings de data
+    df_inflacao['DATA'] = pd.to_datetime(pd.DataFrame({
+        'year': df_inflacao['ANO'], 'month': df_inflacao['MES_NUM'], 'day': 1,
+    }))
+
+    return df_inflacao.sort_values(by='DATA', ascending=True)
+
+def build_cumulative_inflation_index(df_inflacao: pd.DataFrame) -> np.ndarray:
+    """
+    Calcula o fator de inflação acumulada para cada mês da série, já ordenada por data.
+
+    O fator de um mês é o produto de (1 + inflação/100) de todos os meses até ele,
+    inclusive. Meses sem valor de inflação não alteram o acumulado. O mês base
+    (MAI/2023) recebe fator 1, mantendo as vendas originais.
+
+    Args:
+        df_inflacao (pd.DataFrame): Tabela de inflação ordenada com as colunas 'ANO', 'MES' e 'INFLACAO_NO_MES'.
+
+    Returns:
+        np.ndarray: Vetor com um fator acumulado por linha de df_inflacao.
+    """
+    fatores_mensais = (1 + df_inflacao['INFLACAO_NO_MES'] / 100).fillna(1)
+    inflacao_acumulada = fatores_mensais.cumprod().to_numpy(dtype=float)
+
+    # Verificar se é o mês de MAI de 2023 para tratar o caso base
+    mes_base = (df_inflacao['ANO'] == 2023) & (df_inflacao['MES'].str.upper() == 'MAI')
+    return np.where(mes_base.to_numpy(), 1.0, inflacao_acumulada)
+
+def iter_mock_sales_chunks(df_inflacao: pd.DataFrame, df_sales_maio_2023: pd.DataFrame, chunk_size: int = None, inflacao_acumulada: np.ndarray = None):
+    """
+    Gera as vendas fictícias (meses x lojas) em blocos de no máximo chunk_size linhas.
+
+    As linhas seguem a ordem do processamento mês a mês: todas as lojas do primeiro mês,
+    depois todas as lojas do segundo, e assim por diante. Um bloco pode cobrir parte das
+    lojas de um mês ou vários meses inteiros. Sem chunk_size, um único bloco com todas as linhas.
+
+    Args:
+        df_inflacao (pd.DataFrame): Tabela de inflação ordenada por data.
+        df_sales_maio_2023 (pd.DataFrame): Dados base com as colunas 'uf', 'id', 'pet_shop' e 'venda_base'.
+        chunk_size (int): Quantidade máxima de linhas por bloco. exemplo: 1_000_000
+        inflacao_acumulada (np.ndarray): Fatores acumulados já calculados para as linhas de df_inflacao.
+            Permite gerar apenas alguns meses usando os fatores da série completa.
+
+    Yields:
+        pd.DataFrame: Bloco com as colunas 'ano', 'mes', 'uf', 'id', 'pet_shop' e 'volume_vendas_(kg)'.
+    """
+    # Índice de inflação acumulada calculado uma única vez para toda a série
+    if inflacao_acumulada is None:
+        inflacao_acumulada = build_cumulative_inflation_index(df_inflacao)
+    vendas_base = df_sales_maio_2023['venda_base'].to_numpy(dtype=float)
+
+    # As colunas de texto são montadas como categóricas a partir dos códigos de cada mês e
+    # de cada loja, sem criar uma string por linha (veja schema.MOCK_SALES_SCHEMA)
+    anos = df_inflacao['ANO'].to_numpy().astype(np.int16)
+    meses = categorical_codes(df_inflacao['MES'])
+    lojas = {col: categorical_codes(df_sales_maio_2023[col]) for col in ('uf', 'id', 'pet_shop')}
+
+    n_lojas = len(vendas_base)
+    total_linhas = len(inflacao_acumulada) * n_lojas
+    chunk_size = chunk_size or max(total_linhas, 1)
+    index_dtype = np.int32 if total_linhas < np.iinfo(np.int32).max else np.int64
+
+    for inicio in range(0, max(total_linhas, 1), chunk_size):
+        # Cada linha do bloco corresponde a um par (mês, loja) do produto cartesiano
+        linhas = np.arange(inicio, min(inicio + chunk_size, total_linhas), dtype=index_dtype)
+        idx_mes, idx_loja = np.divmod(linhas, index_dtype(max(n_lojas, 1)))
+        del linhas
+
+        # Arredonda os valores para baixo e converte para inteiro, dividindo no próprio vetor
+        volume = vendas_base[idx_loja]
+        volume /= inflacao_acumulada[idx_mes]
+
+        chunk = {'ano': anos[idx_mes], 'mes': pd.Categorical.from_codes(meses[0][idx_mes], categories=meses[1])}
+        for col, (codes, categories) in lojas.items():
+            chunk[col] = pd.Categorical.from_codes(codes[idx_loja], categories=categories)
+        chunk['volume_vendas_(kg)'] = volume.astype(np.int32)
+        yield pd.DataFrame(chunk)
+
+def write_mock_sales_data(df_inflacao: pd.DataFrame, df_sales_maio_2023: pd.DataFrame, output_path: str, export_csv: bool = False, chunk_size: int = None) -> int:
+    """
+    Gera e grava as vendas fictícias a partir das tabelas já carregadas em memória.
+
+    Args:
+        df_inflacao (pd.DataFrame): Tabela de inflação preparada por prepare_inflation_table.
+        df_sales_maio_2023 (pd.DataFrame): Dados base com as colunas 'uf', 'id', 'pet_shop' e 'venda_base'.
+        output_path (str): O caminho do arquivo de saída; o formato segue a extensão.
+        export_csv (bool): Exporta também uma cópia em csv quando a saída for parquet ou feather.
+        chunk_size (int): Quando informado, gera e grava a saída em blocos de no máximo chunk_size linhas.
+
+    Returns:
+        int: A quantidade de linhas gravadas.
+    """
+    if chunk_size:
+        # Modo em blocos: cada bloco é gravado assim que gerado, limitando o uso de memória
+        writers = [TableWriter(output_path, MOCK_SALES_SCHEMA)]
+        if export_csv and storage_format(output_path) != 'csv':
+            writers.append(TableWriter(with_extension(output_path, '.csv'), MOCK_SALES_SCHEMA))
+        try:
+            for chunk in iter_mock_sales_chunks(df_inflacao, df_sales_maio_2023, chunk_size):
+                for writer in writers:
+                    writer.write(chunk)
+        finally:
+            for writer in writers:
+                writer.close()
+        return writers[0].rows_written
+
+    final_df = next(iter_mock_sales_chunks(df_inflacao, df_sales_maio_2023))
+    write_table(final_df, output_path, MOCK_SALES_SCHEMA, export_csv=export_csv)
+    return len(final_df)
+
+def generate_mock_sales_data(source_csv_file_folder: str, base_data_file: str, inflacao_file: str, output_file: str, manifest_path: str = None, export_csv: bool = False, chunk_size: int = None):
     """
     Gera dados de vendas fictícios com base em dados de inflação e um arquivo de dados base.
 
     Args:
-        source_csv_file_folder (str): O caminho para a pasta que contém os arquivo csv com dados base.
-        base_data_file (str): O nome do arquivo CSV com os dados de maio de 2023.
-        inflacao_file (str): O nome do arquivo CSV com os dados de inflação.
-        output_file (str): O nome do arquivo de saída para os dados fictícios.
-    """
-    # Mapeamento dos meses de português para números
-    meses_map = {
-        'JAN': '01', 'FEV': '02', 'MAR': '03', 'ABR': '04', 'MAI': '05', 'JUN': '06',
-        'JUL': '07', 'AGO': '08', 'SET': '09', 'OUT': '10', 'NOV': '11', 'DEZ': '12'
-    }
-    
+        source_csv_file_folder (str): O caminho para a pasta que contém os arquivos com dados base.
+        base_data_file (str): O nome do arquivo (.csv, .parquet ou .feather) com os dados de maio de 2023.
+        inflacao_file (str): O nome do arquivo (.csv, .parquet ou .feather) com os dados de inflação.
+        output_file (str): O nome do arquivo de saída para os dados fictícios; o formato segue a extensão.
+        manifest_path (str): Manifesto do modo incremental. Quando informado, a geração é pulada
+            se os arquivos de inflação e de dados base não mudaram desde a última execução.
+        export_csv (bool): Exporta também uma cópia em csv quando a saída for parquet ou feather.
+        chunk_size (int): Quando informado, gera e grava a saída em blocos de no máximo chunk_size linhas,
+            com uso de memória limitado pelo tamanho do bloco. O resultado é o mesmo do modo em memória.
+    """
     inflacao_file_path = os.path.join(source_csv_file_folder, inflacao_file)
     sales_base_path = os.path.join(source_csv_file_folder, base_data_file)
     output_path = os.path.join(os.path.dirname(sales_base_path), output_file)
 
+    if manifest_path:
+        manifest = load_manifest(manifest_path)
+        if stage_is_current(manifest, 'mock_sales', [inflacao_file_path, sales_base_path], [output_path]):
+            logger.info(f"✅ O arquivo '{output_path}' está atualizado. Pulando a geração.")
+            return
+
     try:
-        df_inflacao = pd.read_csv(inflacao_file_path)
+        df_inflacao = read_table(inflacao_file_path, INFLATION_SCHEMA)
         logger.info(f"Arquivo de inflação '{inflacao_file_path}' carregado.")
     except FileNotFoundError:
         logger.error(f"Erro: Arquivo de inflação '{inflacao_file_path}' não encontrado.")
@@ -287,7 +906,7 @@ def generate_mock_sales_data(source_csv_file_folder: str, base_data_file: str, i
         return
 
     try:
-        df_sales_maio_2023 = pd.read_csv(sales_base_path)
+        df_sales_maio_2023 = read_table(sales_base_path, SALES_BASE_SCHEMA)
         logger.info(f"Arquivo de dados base '{sales_base_path}' carregado.")
     except FileNotFoundError:
         logger.error(f"Erro: Arquivo de dados base '{sales_base_path}' não encontrado.")
@@ -297,59 +916,21 @@ def generate_mock_sales_data(source_csv_file_folder: str, base_data_file: str, i
         return
         
     # Prepara a tabela de inflação
-    # Converte a coluna 'MES' para maiúsculas e usa o .map() para traduzir
-    df_inflacao['MES_NUM'] = df_inflacao['MES'].str.upper().map(meses_map)
-
-    # Cria a coluna 'DATA' usando a nova coluna numérica
-    df_inflacao['DATA'] = pd.to_datetime(
-        df_inflacao['ANO'].astype(str) + '-' + df_inflacao['MES_NUM'].astype(str) + '-01'
-    )
-    
-    df_inflacao = df_inflacao.sort_values(by='DATA', ascending=True)
+    df_inflacao = prepare_inflation_table(df_inflacao)
 
     # Renomear a coluna para facilitar o processamento
     df_sales_maio_2023 = df_sales_maio_2023.rename(columns={'compra_maio_2023_(kg)': 'venda_base'})
 
-    df_ficticio = pd.DataFrame()
-    
-    for index, row in df_inflacao.iterrows():
-        temp_df = df_sales_maio_2023.copy()
-
-        # Verificar se é o mês de MAI de 2023 para tratar o caso base
-        if row['ANO'] == 2023 and row['MES'].upper() == 'MAI':
-            # Atribui diretamente os valores de 'venda_base' para o mês base
-            temp_df['volume_vendas_(kg)'] = df_sales_maio_2023['venda_base']
-        else:
-            # Para os outros meses, aplica a lógica de inflação
-            inflacao_acumulada = (1 + df_inflacao[df_inflacao['DATA'] <= row['DATA']]['INFLACAO_NO_MES'] / 100).product()
-            temp_df['volume_vendas_(kg)'] = df_sales_maio_2023['venda_base'] / inflacao_acumulada
-
-        # Arredonda os valores para baixo e converte para inteiro
-        temp_df['volume_vendas_(kg)'] = temp_df['volume_vendas_(kg)'].astype(int)
-
-        temp_df['ano'] = row['ANO']
-        temp_df['mes'] = row['MES']
-        
-        df_ficticio = pd.concat([df_ficticio, temp_df], ignore_index=True)
-
-    # Reorganiza as colunas na nova ordem
-    new_column_order = [
-        'ano',
-        'mes',
-        'uf',
-        'id',
-        'pet_shop',
-        'volume_vendas_(kg)'
-    ]
-
-    # Cria o DataFrame final com a nova ordem das colunas
-    final_df = df_ficticio[new_column_order]
-
-    # Salva os dados fictícios em um arquivo CSV
+    # Salva os dados fictícios no formato indicado pela extensão do arquivo
     try:
-        final_df.to_csv(output_path, index=False)
+        rows_written = write_mock_sales_data(df_inflacao, df_sales_maio_2023, output_path, export_csv=export_csv, chunk_size=chunk_size)
         logger.info(f"Arquivo '{output_file}' gerado com sucesso em '{output_path}'!")
     except Exception as e:
         logger.error(f"Erro ao salvar o arquivo '{output_file}': {e}")
         raise OSError(f"Não foi possível salvar o arquivo '{output_file}'.")
 
+    if manifest_path:
+        record_file(manifest, output_path, fingerprint_file(manifest, output_path), rows=rows_written)
+        record_stage(manifest, 'mock_sales', [inflacao_file_path, sales_base_path], [output_path])
+        save_manifest(manifest, manifest_path)
+
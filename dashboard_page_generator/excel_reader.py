@@ -0,0 +1,140 @@
+import importlib.util
+import logging
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Motores de leitura das planilhas xlsx:
+#   'pandas'   - pd.read_excel com o openpyxl padrão, lendo todas as colunas (comportamento original)
+#   'openpyxl' - openpyxl em modo somente leitura, percorrendo as linhas apenas no intervalo das colunas usadas
+#   'calamine' - leitor em Rust do pacote opcional python-calamine
+#   'auto'     - calamine quando instalado, senão openpyxl
+EXCEL_ENGINES = ('pandas', 'openpyxl', 'calamine', 'auto')
+
+def normalize_header(name) -> str:
+    """Normaliza o nome de uma coluna da planilha. exemplo: 'Compra Maio 2023 (kg)' -> 'compra_maio_2023_(kg)'"""
+    return str(name).lower().strip().replace(' ', '_')
+
+def calamine_available() -> bool:
+    """Indica se o pacote opcional python-calamine está instalado."""
+    return importlib.util.find_spec('python_calamine') is not None
+
+def resolve_excel_engine(engine: str) -> str:
+    """
+    Valida o motor de leitura e resolve o modo 'auto'.
+
+    Args:
+        engine (str): Um dos motores de EXCEL_ENGINES.
+
+    Returns:
+        str: 'pandas', 'openpyxl' ou 'calamine'.
+    """
+    engine = (engine or 'pandas').lower()
+    if engine not in EXCEL_ENGINES:
+        raise ValueError(f"Motor de leitura de Excel inválido: '{engine}'. Use um de {EXCEL_ENGINES}.")
+    if engine == 'auto':
+        return 'calamine' if calamine_available() else 'openpyxl'
+    if engine == 'calamine' and not calamine_available():
+        raise ImportError("O motor 'calamine' exige o pacote python-calamine (pip install python-calamine).")
+    return engine
+
+def _find_columns(header: list, columns: list, mapping=None) -> dict:
+    """
+    Retorna a posição de cada coluna pedida no cabeçalho, pelo nome normalizado ou, com
+    mapping (validation.ColumnMapping), pelos aliases do mapeamento.
+    """
+    if mapping is not None:
+        return mapping.resolve(header)
+
+    positions = {}
+    for position, name in enumerate(header):
+        normalized = normalize_header(name) if name is not None else None
+        if normalized in columns and normalized not in positions:
+            positions[normalized] = position
+
+    missing = [col for col in columns if col not in positions]
+    if missing:
+        raise KeyError(f"Colunas ausentes na planilha: {missing}")
+    return positions
+
+def _read_openpyxl(file_path: str, columns: list, mapping=None) -> tuple:
+    """Lê as colunas com o openpyxl em modo somente leitura, sem montar as células das demais colunas."""
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = workbook.worksheets[0]
+        # As dimensões gravadas no arquivo podem estar erradas; lê até a última linha existente
+        sheet.reset_dimensions()
+
+        header = next(sheet.iter_rows(min_row=1, max_row=1, values_only=True), ())
+        positions = _find_columns(list(header), columns, mapping)
+        source_columns = {col: str(header[position]) for col, position in positions.items()}
+        min_col = min(positions.values()) + 1
+        max_col = max(positions.values()) + 1
+
+        values = {col: [] for col in columns}
+        offsets = [(values[col], positions[col] - min_col + 1) for col in columns]
+        for row in sheet.iter_rows(min_row=2, min_col=min_col, max_col=max_col, values_only=True):
+            for column_values, offset in offsets:
+                column_values.append(row[offset])
+    finally:
+        workbook.close()
+
+    # Os valores ficam como o openpyxl os leu; os tipos são definidos pelo esquema e pela validação
+    return values, source_columns
+
+def _read_calamine(file_path: str, columns: list, mapping=None) -> tuple:
+    """Lê as colunas com o leitor calamine do pandas."""
+    if mapping is not None:
+        usecols = mapping.accepts
+    else:
+        usecols = lambda name: normalize_header(name) in columns
+    df = pd.read_excel(file_path, engine='calamine', usecols=usecols)
+    header = list(df.columns)
+    if mapping is None:
+        df.columns = [normalize_header(col) for col in df.columns]
+    positions = _find_columns(list(df.columns), columns, mapping)
+    source_columns = {col: str(header[position]) for col, position in positions.items()}
+    return {col: df.iloc[:, positions[col]] for col in columns}, source_columns
+
+def read_excel_columns(file_path: str, columns: list, dtypes: dict = None, engine: str = 'auto', mapping=None) -> pd.DataFrame:
+    """
+    Lê da primeira aba da planilha apenas as colunas informadas, localizadas pelo nome
+    normalizado do cabeçalho (minúsculas, sem espaços nas pontas e com '_' no lugar dos espaços)
+    ou, com mapping, pelos aliases do mapeamento de colunas.
+
+    Args:
+        file_path (str): O caminho da planilha xlsx.
+        columns (list): Os nomes normalizados das colunas. exemplo: ['uf', 'id', 'pet_shop']
+        dtypes (dict): Tipos das colunas, aplicados na montagem do DataFrame. As colunas sem
+            tipo definido têm o tipo inferido pelo pandas. exemplo: SALES_BASE_SCHEMA
+        engine (str): 'openpyxl', 'calamine' ou 'auto'. 'pandas' lê a planilha inteira antes de selecionar as colunas.
+        mapping (validation.ColumnMapping): Mapeamento com os aliases de cada coluna de columns.
+
+    Returns:
+        pd.DataFrame: As colunas na ordem de columns, com os nomes normalizados. O nome original
+            de cada coluna no cabeçalho fica em df.attrs['source_columns'].
+    """
+    engine = resolve_excel_engine(engine)
+    dtypes = dtypes or {}
+
+    if engine == 'pandas':
+        df = pd.read_excel(file_path)
+        header = list(df.columns)
+        if mapping is None:
+            df.columns = [normalize_header(col) for col in df.columns]
+        positions = _find_columns(list(df.columns), columns, mapping)
+        source_columns = {col: str(header[position]) for col, position in positions.items()}
+        values = {col: df.iloc[:, positions[col]] for col in columns}
+    elif engine == 'calamine':
+        values, source_columns = _read_calamine(file_path, columns, mapping)
+    else:
+        values, source_columns = _read_openpyxl(file_path, columns, mapping)
+
+    df = pd.DataFrame({
+        col: pd.Series(column_values, dtype=dtypes.get(col)).reset_index(drop=True)
+        for col, column_values in values.items()
+    })
+    df.attrs['source_columns'] = source_columns
+    return df
@@ -0,0 +1,192 @@
+import os
+import sys
+import json
+import time
+import uuid
+import cProfile
+import logging
+import platform
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from .storage import count_rows
+
+logger = logging.getLogger(__name__)
+
+def _peak_rss_mb() -> float:
+    """Pico de memória residente do processo (RSS), em MB. None se indisponível na plataforma."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # No macOS o valor é em bytes; no Linux, em KB
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 2)
+
+def _children_cpu_seconds() -> float:
+    """Tempo de CPU dos processos filhos já encerrados (por exemplo, do ProcessPoolExecutor)."""
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+def _process_io() -> dict:
+    """Contadores de leitura e escrita do processo em /proc/self/io (apenas Linux)."""
+    try:
+        with open('/proc/self/io', 'r') as f:
+            counters = dict(line.split(': ') for line in f.read().splitlines())
+        return {key: int(counters[key]) for key in ('rchar', 'wchar', 'read_bytes', 'write_bytes')}
+    except (OSError, KeyError, ValueError):
+        return None
+
+def _files_summary(paths: list) -> dict:
+    """Soma o tamanho e conta as linhas dos arquivos existentes."""
+    existing = [path for path in paths if path and os.path.isfile(path)]
+    rows = 0
+    for path in existing:
+        file_rows = count_rows(path)
+        if file_rows is None:
+            rows = None
+            break
+        rows += file_rows
+    return {
+        'files': len(existing),
+        'bytes': sum(os.path.getsize(path) for path in existing),
+        'rows': rows,
+    }
+
+class RunMetrics:
+    """
+    Coleta métricas de cada etapa de uma execução do pipeline e as grava em json.
+
+    Por etapa: tempo de relógio, tempo de CPU (do processo e dos processos filhos), pico de RSS
+    do processo, pico de memória alocada (tracemalloc, opcional), linhas e bytes dos arquivos
+    de entrada e de saída e os contadores de I/O do processo. Etapas listadas em profile_stages
+    também têm um perfil do cProfile gravado em profile_dir.
+
+    As medições de CPU e memória são do processo inteiro; com etapas em paralelo elas se sobrepõem.
+    O início de cada etapa em relação ao início da execução mostra quais etapas rodaram juntas.
+
+    Exemplo:
+        metrics = RunMetrics(profile_stages=['sales_etl'], profile_dir='data/docs/.metrics')
+        with metrics.stage('sales_etl', inputs=planilhas, outputs=['data/docs/dados.parquet']):
+            run_etl_pipeline(...)
+        metrics.save('data/docs/.metrics/etl_metrics.jsonl')
+    """
+
+    def __init__(self, profile_stages: list = None, profile_dir: str = None, trace_memory: bool = False):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self.profile_stages = set(profile_stages or [])
+        self.profile_dir = profile_dir
+        self.trace_memory = trace_memory
+        self.stages = []
+        self._started = time.perf_counter()
+        # Etapas em paralelo compartilham o tracemalloc: ele só é parado quando a última termina
+        self._tracing_lock = threading.Lock()
+        self._tracing_stages = 0
+        self._owns_tracing = False
+
+    @contextmanager
+    def stage(self, name: str, inputs: list = None, outputs: list = None):
+        """
+        Mede a execução de uma etapa.
+
+        Args:
+            name (str): O nome da etapa. exemplo: 'mock_sales'
+            inputs (list): Arquivos lidos pela etapa, medidos ao final dela.
+            outputs (list): Arquivos gravados pela etapa, medidos ao final dela.
+
+        Yields:
+            dict: O registro da etapa, onde a etapa pode incluir informações extras.
+        """
+        record = {'stage': name, 'status': 'ok', 'started_seconds': round(time.perf_counter() - self._started, 4)}
+        profiler = cProfile.Profile() if name in self.profile_stages else None
+        if self.trace_memory:
+            with self._tracing_lock:
+                if self._tracing_stages == 0 and not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    self._owns_tracing = True
+                elif self._tracing_stages == 0:
+                    tracemalloc.reset_peak()
+                self._tracing_stages += 1
+
+        io_before = _process_io()
+        children_cpu_before = _children_cpu_seconds()
+        cpu_before = time.process_time()
+        wall_before = time.perf_counter()
+        if profiler:
+            profiler.enable()
+
+        try:
+            yield record
+        except Exception as e:
+            record['status'] = 'error'
+            record['error'] = str(e)
+            raise
+        finally:
+            if profiler:
+                profiler.disable()
+            record['wall_seconds'] = round(time.perf_counter() - wall_before, 4)
+            record['cpu_seconds'] = round(time.process_time() - cpu_before, 4)
+            record['children_cpu_seconds'] = round(_children_cpu_seconds() - children_cpu_before, 4)
+            record['peak_rss_mb'] = _peak_rss_mb()
+
+            if self.trace_memory:
+                with self._tracing_lock:
+                    record['tracemalloc_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
+                    self._tracing_stages -= 1
+                    if self._tracing_stages == 0 and self._owns_tracing:
+                        tracemalloc.stop()
+                        self._owns_tracing = False
+
+            io_after = _process_io()
+            if io_before and io_after:
+                record['process_io'] = {key: io_after[key] - io_before[key] for key in io_after}
+
+            # Linhas e bytes dos arquivos são medidos fora do tempo da etapa
+            record['input'] = _files_summary(inputs or [])
+            record['output'] = _files_summary(outputs or [])
+
+            if profiler and self.profile_dir:
+                os.makedirs(self.profile_dir, exist_ok=True)
+                profile_path = os.path.join(self.profile_dir, f"{self.run_id}_{name}.prof")
+                profiler.dump_stats(profile_path)
+                record['profile'] = profile_path
+
+            self.stages.append(record)
+            rows_written = record['output']['rows']
+            logger.info(
+                f"⏱️ Etapa '{name}': {record['wall_seconds']}s, CPU {record['cpu_seconds']}s, "
+                f"pico RSS {record['peak_rss_mb']} MB, {rows_written if rows_written is not None else '-'} linhas gravadas."
+            )
+
+    def to_dict(self) -> dict:
+        """Retorna as métricas da execução como um dicionário serializável em json."""
+        return {
+            'run_id': self.run_id,
+            'started_at': self.started_at,
+            'wall_seconds': round(time.perf_counter() - self._started, 4),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'stages': self.stages,
+        }
+
+    def save(self, metrics_path: str):
+        """
+        Anexa as métricas da execução como uma linha json, mantendo o histórico das execuções.
+
+        Args:
+            metrics_path (str): O caminho do arquivo .jsonl de métricas.
+        """
+        metrics_dir = os.path.dirname(metrics_path)
+        if metrics_dir:
+            os.makedirs(metrics_dir, exist_ok=True)
+        with open(metrics_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(self.to_dict(), ensure_ascii=False) + '\n')
+        logger.info(f"Métricas da execução '{self.run_id}' gravadas em '{metrics_path}'.")
@@ -0,0 +1,173 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Serializa as gravações do manifesto quando etapas rodam em paralelo no mesmo processo
+_manifest_lock = threading.Lock()
+
+MANIFEST_SECTIONS = ('files', 'partitions', 'stages')
+
+class Manifest(dict):
+    """
+    O manifesto carregado por load_manifest. Guarda uma cópia das entradas como estavam no
+    arquivo, para que save_manifest grave apenas as entradas que este chamador alterou.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.saved = {section: {} for section in MANIFEST_SECTIONS}
+
+    def mark_saved(self):
+        """Passa a considerar o conteúdo atual como o que está gravado no arquivo."""
+        self.saved = json.loads(json.dumps({section: self.get(section, {}) for section in MANIFEST_SECTIONS}))
+
+    def changes(self, section: str) -> dict:
+        """As entradas da seção novas ou alteradas desde a leitura (ou a última gravação)."""
+        saved = self.saved.get(section, {})
+        return {key: value for key, value in self.get(section, {}).items() if saved.get(key) != value}
+
+def load_manifest(manifest_path: str) -> dict:
+    """
+    Carrega o manifesto do pipeline incremental.
+
+    O manifesto guarda a impressão digital (hash, mtime, tamanho e linhas) de cada
+    arquivo de origem e as entradas usadas na última execução de cada etapa.
+
+    Args:
+        manifest_path (str): O caminho para o arquivo json do manifesto.
+
+    Returns:
+        Manifest: O manifesto, vazio se o arquivo ainda não existir ou estiver corrompido.
+    """
+    manifest = Manifest({section: {} for section in MANIFEST_SECTIONS})
+    if not os.path.exists(manifest_path):
+        return manifest
+
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Manifesto '{manifest_path}' ilegível, será recriado: {e}")
+        return manifest
+
+    for section in MANIFEST_SECTIONS:
+        manifest[section].update(saved.get(section, {}))
+    manifest.mark_saved()
+    return manifest
+
+def save_manifest(manifest: dict, manifest_path: str):
+    """
+    Grava o manifesto mesclando com o conteúdo já salvo, para que etapas diferentes
+    possam atualizar suas próprias entradas sem sobrescrever as das outras.
+
+    Só as entradas alteradas desde load_manifest são gravadas: etapas que rodam ao mesmo tempo
+    carregam o manifesto antes de as outras terminarem, e gravar as entradas antigas que elas
+    não alteraram desfaria o registro feito pelas outras nesse intervalo.
+
+    Args:
+        manifest (dict): O manifesto com as entradas atualizadas. Um dict que não veio de
+            load_manifest tem todas as suas entradas gravadas.
+        manifest_path (str): O caminho para o arquivo json do manifesto.
+    """
+    with _manifest_lock:
+        merged = load_manifest(manifest_path)
+        for section in MANIFEST_SECTIONS:
+            if isinstance(manifest, Manifest):
+                merged[section].update(manifest.changes(section))
+            else:
+                merged[section].update(manifest.get(section, {}))
+
+        manifest_dir = os.path.dirname(manifest_path)
+        if manifest_dir:
+            os.makedirs(manifest_dir, exist_ok=True)
+
+        # Grava em um arquivo temporário e substitui para não deixar um json pela metade
+        tmp_path = f"{manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(merged, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp_path, manifest_path)
+
+        if isinstance(manifest, Manifest):
+            manifest.mark_saved()
+
+def compute_file_hash(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Calcula o hash sha256 do conteúdo do arquivo, lendo em blocos."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def fingerprint_file(manifest: dict, file_path: str) -> dict:
+    """
+    Retorna a impressão digital do arquivo. O hash só é recalculado quando o mtime
+    ou o tamanho mudaram em relação ao manifesto.
+
+    Args:
+        manifest (dict): O manifesto carregado.
+        file_path (str): O caminho para o arquivo.
+
+    Returns:
+        dict: Dicionário com 'sha256', 'mtime' e 'size'.
+    """
+    stat = os.stat(file_path)
+    known = manifest['files'].get(os.path.normpath(file_path))
+    if known and known.get('mtime') == stat.st_mtime and known.get('size') == stat.st_size:
+        return {'sha256': known['sha256'], 'mtime': stat.st_mtime, 'size': stat.st_size}
+
+    return {'sha256': compute_file_hash(file_path), 'mtime': stat.st_mtime, 'size': stat.st_size}
+
+def record_file(manifest: dict, file_path: str, fingerprint: dict, rows: int = None):
+    """Registra a impressão digital do arquivo e a quantidade de linhas extraídas dele."""
+    entry = dict(fingerprint)
+    if rows is not None:
+        entry['rows'] = int(rows)
+    manifest['files'][os.path.normpath(file_path)] = entry
+
+def stage_is_current(manifest: dict, stage: str, input_paths: list, output_paths: list, params: dict = None) -> bool:
+    """
+    Verifica se a etapa pode ser pulada: todas as saídas existem e as entradas
+    (pelo hash do conteúdo) e os parâmetros são os mesmos da última execução.
+
+    Args:
+        manifest (dict): O manifesto carregado.
+        stage (str): O nome da etapa. exemplo: 'mock_sales'
+        input_paths (list): Os arquivos de entrada da etapa.
+        output_paths (list): Os arquivos gerados pela etapa.
+        params (dict): Parâmetros da etapa que também invalidam as saídas. exemplo: {'anos': [2020, 2024]}
+    """
+    record = manifest['stages'].get(stage)
+    if not record:
+        return False
+    if not all(os.path.exists(path) for path in output_paths):
+        return False
+    if record.get('params') != (params or {}):
+        return False
+    if not all(os.path.exists(path) for path in input_paths):
+        return False
+
+    current_inputs = {
+        os.path.normpath(path): fingerprint_file(manifest, path)['sha256'] for path in input_paths
+    }
+    return record.get('inputs') == current_inputs
+
+def record_stage(manifest: dict, stage: str, input_paths: list, output_paths: list, params: dict = None):
+    """Registra as entradas, saídas e parâmetros da execução da etapa."""
+    inputs = {}
+    for path in input_paths:
+        fingerprint = fingerprint_file(manifest, path)
+        # Preserva a contagem de linhas já registrada enquanto o conteúdo não mudar
+        known = manifest['files'].get(os.path.normpath(path), {})
+        known_rows = known.get('rows') if known.get('sha256') == fingerprint['sha256'] else None
+        record_file(manifest, path, fingerprint, rows=known_rows)
+        inputs[os.path.normpath(path)] = fingerprint['sha256']
+
+    manifest['stages'][stage] = {
+        'inputs': inputs,
+        'outputs': [os.path.normpath(path) for path in output_paths],
+        'params': params or {},
+    }
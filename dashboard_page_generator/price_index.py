@@ -0,0 +1,204 @@
+"""
+Base local de índices de preços (IPCA, INPC, ...), com a série histórica completa de cada índice.
+
+A base é uma única tabela, no formato indicado pela extensão do arquivo, com uma linha por
+índice e mês (chave: indice, ano, mes) e o fator acumulado de cada mês já calculado:
+
+    fator_acumulado(m) = produto de (1 + variacao_no_mes / 100) de todos os meses até m, inclusive
+
+Assim, a inflação entre dois meses quaisquer é a razão entre os fatores, e trazer um valor
+de preços do mês a para preços do mês b é multiplicá-lo por fator(b) / fator(a). Qualquer
+janela de deflação é atendida por consultas à base, sem ler de novo a planilha de origem.
+
+Exemplo:
+    store = PriceIndexStore.load('data/docs/indices_precos.parquet')
+    store.ratio('IPCA', (2020, 1), (2024, 12))   # inflação acumulada de FEV/2020 a DEZ/2024, como fator
+"""
+import os
+import logging
+import numpy as np
+import pandas as pd
+
+from .schema import PRICE_INDEX_SCHEMA, INFLATION_SCHEMA, MONTH_NAMES, MONTH_NUMBERS, apply_schema, month_numbers
+from .storage import read_table, write_table
+
+logger = logging.getLogger(__name__)
+
+# Nome padrão do arquivo da base, na pasta de saída do pipeline
+PRICE_INDEX_FILE = 'indices_precos.parquet'
+
+def price_index_rows(df_inflacao: pd.DataFrame, indice: str) -> pd.DataFrame:
+    """
+    Converte uma série mensal no formato de INFLATION_SCHEMA nas linhas da base, com o fator acumulado.
+
+    Meses sem variação não alteram o acumulado, como em build_cumulative_inflation_index.
+
+    Args:
+        df_inflacao (pd.DataFrame): Colunas 'ANO', 'MES' (abreviado em português) e 'INFLACAO_NO_MES'.
+        indice (str): O nome do índice. exemplo: 'IPCA'
+
+    Returns:
+        pd.DataFrame: As linhas do índice em ordem cronológica, no formato de PRICE_INDEX_SCHEMA.
+    """
+    # Linhas que não são meses (como o cabeçalho repetido depois do último ano da planilha) são descartadas
+    valid = df_inflacao['MES'].astype(str).str.strip().str.upper().isin(list(MONTH_NUMBERS)).to_numpy()
+    if not valid.all():
+        logger.warning(f"{int((~valid).sum())} linhas sem mês válido descartadas da série do {indice.upper()}.")
+    df_inflacao = df_inflacao[valid]
+
+    df = pd.DataFrame({
+        'indice': indice.upper(),
+        'ano': df_inflacao['ANO'].to_numpy(dtype=np.int16),
+        'mes': month_numbers(df_inflacao['MES'].astype(str).str.strip()),
+        'variacao_no_mes': df_inflacao['INFLACAO_NO_MES'].to_numpy(dtype=float),
+    })
+    # Um mês repetido na origem fica com a última ocorrência
+    df = df.drop_duplicates(['ano', 'mes'], keep='last').sort_values(['ano', 'mes'], ignore_index=True)
+    df['fator_acumulado'] = (1 + df['variacao_no_mes'] / 100).fillna(1).cumprod()
+    return apply_schema(df, PRICE_INDEX_SCHEMA)
+
+def update_price_index(store_path: str, indice: str, df_inflacao: pd.DataFrame) -> pd.DataFrame:
+    """
+    Grava a série completa de um índice na base, substituindo a série anterior do mesmo índice.
+
+    Args:
+        store_path (str): O caminho da base (.csv, .parquet ou .feather).
+        indice (str): O nome do índice. exemplo: 'INPC'
+        df_inflacao (pd.DataFrame): A série mensal no formato de INFLATION_SCHEMA, de preferência completa.
+
+    Returns:
+        pd.DataFrame: A base inteira, com todos os índices.
+    """
+    rows = price_index_rows(df_inflacao, indice)
+    if os.path.exists(store_path):
+        stored = read_table(store_path, PRICE_INDEX_SCHEMA)
+        stored = stored[stored['indice'].astype(str) != indice.upper()]
+        frames = [stored, rows] if len(stored) else [rows]
+    else:
+        frames = [rows]
+
+    # Categorias diferentes entre as partes viram object no concat; o esquema as restaura
+    store = pd.concat(frames, ignore_index=True).astype({'indice': str})
+    store = apply_schema(store.sort_values(['indice', 'ano', 'mes'], ignore_index=True), PRICE_INDEX_SCHEMA)
+
+    store_dir = os.path.dirname(store_path)
+    if store_dir:
+        os.makedirs(store_dir, exist_ok=True)
+    write_table(store, store_path, PRICE_INDEX_SCHEMA)
+    logger.info(f"✅ Índice {indice.upper()} gravado na base '{store_path}': {len(rows)} meses.")
+    return store
+
+class PriceIndexStore:
+    """
+    Consultas à base de índices de preços em tempo constante.
+
+    O fator acumulado de cada índice fica em um vetor denso, com uma posição por mês desde o
+    primeiro mês da série (posição = ano * 12 + mes - 1 - primeiro mês). Meses faltando no meio
+    da série repetem o fator do mês anterior; meses fora da série resultam em NaN.
+
+    Args:
+        df_store (pd.DataFrame): A base no formato de PRICE_INDEX_SCHEMA.
+    """
+
+    def __init__(self, df_store: pd.DataFrame):
+        self.table = df_store
+        self._series = {}
+        for indice, df in df_store.groupby('indice', observed=True, sort=True):
+            months = df['ano'].to_numpy(dtype=np.int64) * 12 + df['mes'].to_numpy(dtype=np.int64) - 1
+            first = int(months.min())
+            factors = np.full(int(months.max()) - first + 1, np.nan)
+            factors[months - first] = df['fator_acumulado'].to_numpy(dtype=float)
+            # Repete o último fator conhecido nos meses sem valor
+            filled = np.maximum.accumulate(np.where(np.isnan(factors), 0, np.arange(len(factors))))
+            self._series[str(indice)] = (first, factors[filled])
+
+    @classmethod
+    def load(cls, store_path: str) -> 'PriceIndexStore':
+        """Carrega a base gravada por update_price_index."""
+        return cls(read_table(store_path, PRICE_INDEX_SCHEMA))
+
+    @property
+    def indices(self) -> list:
+        """Os índices presentes na base. exemplo: ['INPC', 'IPCA']"""
+        return list(self._series)
+
+    def _lookup(self, indice: str, anos, meses) -> np.ndarray:
+        key = indice.upper()
+        if key not in self._series:
+            raise KeyError(f"Índice '{indice}' não encontrado na base. Índices disponíveis: {self.indices}")
+        first, factors = self._series[key]
+        positions = np.asarray(anos, dtype=np.int64) * 12 + np.asarray(meses, dtype=np.int64) - 1 - first
+        inside = (positions >= 0) & (positions < len(factors))
+        return np.where(inside, factors[np.clip(positions, 0, len(factors) - 1)], np.nan)
+
+    def factors(self, indice: str, anos, meses) -> np.ndarray:
+        """
+        Fatores acumulados de vários meses de uma vez.
+
+        Args:
+            indice (str): O nome do índice. exemplo: 'IPCA'
+            anos: Os anos (escalar, lista ou vetor).
+            meses: Os meses de 1 a 12, do mesmo tamanho de anos.
+
+        Returns:
+            np.ndarray: O fator acumulado de cada mês, NaN fora da série.
+        """
+        return self._lookup(indice, anos, meses)
+
+    def factor(self, indice: str, ano: int, mes: int) -> float:
+        """Fator acumulado do índice no mês."""
+        return float(self._lookup(indice, ano, mes))
+
+    def ratio(self, indice: str, start: tuple, end: tuple) -> float:
+        """
+        Variação acumulada do índice entre dois meses, como fator: fator(end) / fator(start).
+
+        Args:
+            indice (str): O nome do índice. exemplo: 'IPCA'
+            start (tuple): O mês de referência dos preços, (ano, mes). exemplo: (2023, 5)
+            end (tuple): O mês para o qual os preços são levados, (ano, mes).
+
+        Returns:
+            float: O fator. exemplo: 1.1 para uma inflação acumulada de 10% de start a end.
+        """
+        return self.factor(indice, *end) / self.factor(indice, *start)
+
+    def ratios(self, indice: str, anos, meses, base: tuple) -> np.ndarray:
+        """
+        Fator de cada mês em relação ao mês base, para corrigir ou deflacionar uma coluna inteira.
+
+        Args:
+            indice (str): O nome do índice.
+            anos: Os anos de cada linha.
+            meses: Os meses de 1 a 12 de cada linha.
+            base (tuple): O mês base, (ano, mes). exemplo: (2023, 5)
+
+        Returns:
+            np.ndarray: fator(linha) / fator(base). Multiplicar por ele leva valores de preços do mês
+                base para preços do mês da linha; dividir por ele leva de volta ao mês base.
+        """
+        return self._lookup(indice, anos, meses) / self.factor(indice, *base)
+
+    def monthly_table(self, indice: str, year_ranges: list) -> pd.DataFrame:
+        """
+        A variação mensal do índice nos intervalos de anos, no formato de INFLATION_SCHEMA.
+
+        Args:
+            indice (str): O nome do índice.
+            year_ranges (list): Lista de intervalos fechados (ano_inicio, ano_fim). exemplo: [(2020, 2024)]
+
+        Returns:
+            pd.DataFrame: Colunas 'ANO', 'MES' e 'INFLACAO_NO_MES', em ordem cronológica.
+        """
+        if indice.upper() not in self._series:
+            raise KeyError(f"Índice '{indice}' não encontrado na base. Índices disponíveis: {self.indices}")
+        df = self.table[self.table['indice'].astype(str) == indice.upper()]
+        in_range = np.zeros(len(df), dtype=bool)
+        for start_year, end_year in year_ranges:
+            in_range |= df['ano'].between(start_year, end_year).to_numpy()
+        df = df[in_range]
+        return apply_schema(pd.DataFrame({
+            'ANO': df['ano'].to_numpy(dtype=np.int64),
+            'MES': df['mes'].map(MONTH_NAMES).to_numpy(),
+            'INFLACAO_NO_MES': df['variacao_no_mes'].to_numpy(),
+        }), INFLATION_SCHEMA)
@@ -0,0 +1,187 @@
+import os
+import logging
+import pandas as pd
+
+from .etl_runner import MESES_MAP, prepare_inflation_table, build_cumulative_inflation_index, iter_mock_sales_chunks
+from .manifest import load_manifest, save_manifest, stage_is_current, record_stage
+from .schema import SALES_BASE_SCHEMA, INFLATION_SCHEMA, MOCK_SALES_SCHEMA, ROLLUP_SCHEMA
+from .storage import read_table, write_table
+
+logger = logging.getLogger(__name__)
+
+VOLUME_COLUMN = 'volume_vendas_(kg)'
+
+# Tabelas pré-agregadas e as colunas de agrupamento de cada uma
+ROLLUPS = {
+    'vendas_por_mes': ['ano', 'mes'],
+    'vendas_por_pet_shop': ['pet_shop'],
+    'vendas_por_uf': ['uf'],
+    'vendas_por_uf_mes': ['uf', 'ano', 'mes'],
+    # Base do dashboard interativo, que filtra por UF, ano e pet shop no navegador
+    'vendas_por_uf_pet_shop_mes': ['uf', 'pet_shop', 'ano', 'mes'],
+}
+
+# Linhas agregadas por bloco quando chunk_size não é informado. As agregações parciais são
+# somadas, então o bloco limita a memória sem mudar o resultado
+ROLLUP_CHUNK_SIZE = 2_000_000
+
+# Tabelas de estado com os meses e as lojas já incluídos nas agregações
+MONTHS_STATE = 'estado_meses'
+STORES_STATE = 'estado_lojas'
+
+def aggregate_sales(df: pd.DataFrame) -> dict:
+    """
+    Agrega um bloco de vendas em todas as tabelas de ROLLUPS.
+
+    Args:
+        df (pd.DataFrame): Vendas com as colunas 'ano', 'mes', 'uf', 'pet_shop' e 'volume_vendas_(kg)'.
+
+    Returns:
+        dict: Um DataFrame por agregação, com as colunas de agrupamento e o volume total.
+    """
+    return {
+        name: df.groupby(keys, observed=True, sort=False)[VOLUME_COLUMN].sum().reset_index()
+        for name, keys in ROLLUPS.items()
+    }
+
+def merge_rollups(partials: list) -> dict:
+    """Soma agregações parciais (por exemplo, de blocos diferentes) em uma única agregação."""
+    merged = {}
+    for name, keys in ROLLUPS.items():
+        frames = [partial[name] for partial in partials if partial]
+        combined = pd.concat(frames, ignore_index=True)
+        merged[name] = combined.groupby(keys, observed=True, sort=False)[VOLUME_COLUMN].sum().reset_index()
+    return merged
+
+def add_month_key(df: pd.DataFrame) -> pd.DataFrame:
+    """Adiciona a coluna 'ano_mes' no formato 'AAAA-MM', calculada sobre a tabela já agregada."""
+    if 'mes' in df.columns:
+        df = df.assign(ano_mes=df['ano'].astype(str) + '-' + df['mes'].astype(str).str.upper().map(MESES_MAP))
+    return df
+
+def rollup_paths(rollup_folder: str, file_extension: str) -> dict:
+    """Retorna o caminho de cada tabela pré-agregada. exemplo: {'vendas_por_uf': 'data/docs/rollups/vendas_por_uf.parquet'}"""
+    return {name: os.path.join(rollup_folder, f"{name}{file_extension}") for name in ROLLUPS}
+
+def read_rollups(rollup_folder: str, file_extension: str) -> dict:
+    """Lê as tabelas pré-agregadas gravadas por build_sales_rollups."""
+    return {name: read_table(path, ROLLUP_SCHEMA) for name, path in rollup_paths(rollup_folder, file_extension).items()}
+
+def rollups_from_sales_table(sales_path: str) -> dict:
+    """Calcula as agregações a partir da tabela completa de vendas fictícias."""
+    columns = ['ano', 'mes', 'uf', 'pet_shop', VOLUME_COLUMN]
+    return {name: add_month_key(df) for name, df in aggregate_sales(read_table(sales_path, MOCK_SALES_SCHEMA, columns=columns)).items()}
+
+def _tag_occurrences(df: pd.DataFrame, columns: list) -> pd.DataFrame:
+    """Numera as repetições de cada chave, para comparar tabelas com linhas duplicadas."""
+    keys = df[columns].astype(str)
+    return keys.assign(_ocorrencia=keys.groupby(columns).cumcount(), _posicao=range(len(keys)))
+
+def build_sales_rollups(source_csv_file_folder: str, base_data_file: str, inflacao_file: str, rollup_folder: str,
+                        file_extension: str = '.parquet', manifest_path: str = None, chunk_size: int = None) -> dict:
+    """
+    Gera e grava as tabelas pré-agregadas de vendas: por mês, por pet shop, por UF e por UF x mês.
+
+    As agregações são calculadas direto da inflação e dos dados base, com a mesma fórmula de
+    generate_mock_sales_data, sem reler a tabela completa de vendas. A atualização é incremental:
+    quando só chegam meses novos ou lojas novas, apenas as linhas (meses novos x todas as lojas)
+    e (meses antigos x lojas novas) são calculadas e somadas às agregações existentes. Se um mês
+    ou uma loja já agregada mudou ou foi removida, as agregações são refeitas do zero.
+
+    Args:
+        source_csv_file_folder (str): O caminho para a pasta que contém os arquivos com dados base.
+        base_data_file (str): O nome do arquivo com os dados de maio de 2023.
+        inflacao_file (str): O nome do arquivo com os dados de inflação.
+        rollup_folder (str): A pasta onde as tabelas pré-agregadas serão gravadas.
+        file_extension (str): O formato das tabelas (.parquet, .feather ou .csv).
+        manifest_path (str): Manifesto do modo incremental. Quando informado, a etapa é pulada
+            se os arquivos de inflação e de dados base não mudaram desde a última execução.
+        chunk_size (int): Quantidade máxima de linhas geradas por bloco durante a agregação. Padrão: ROLLUP_CHUNK_SIZE.
+
+    Returns:
+        dict: O caminho de cada tabela pré-agregada.
+    """
+    inflacao_file_path = os.path.join(source_csv_file_folder, inflacao_file)
+    sales_base_path = os.path.join(source_csv_file_folder, base_data_file)
+    paths = rollup_paths(rollup_folder, file_extension)
+    months_state_path = os.path.join(rollup_folder, f"{MONTHS_STATE}{file_extension}")
+    stores_state_path = os.path.join(rollup_folder, f"{STORES_STATE}{file_extension}")
+    output_paths = list(paths.values()) + [months_state_path, stores_state_path]
+
+    if manifest_path:
+        manifest = load_manifest(manifest_path)
+        if stage_is_current(manifest, 'rollups', [inflacao_file_path, sales_base_path], output_paths):
+            logger.info(f"✅ As tabelas pré-agregadas em '{rollup_folder}' estão atualizadas.")
+            return paths
+
+    os.makedirs(rollup_folder, exist_ok=True)
+
+    df_inflacao = prepare_inflation_table(read_table(inflacao_file_path, INFLATION_SCHEMA)).reset_index(drop=True)
+    df_sales = read_table(sales_base_path, SALES_BASE_SCHEMA).rename(columns={'compra_maio_2023_(kg)': 'venda_base'})
+    df_sales = df_sales.reset_index(drop=True)
+    inflacao_acumulada = build_cumulative_inflation_index(df_inflacao)
+
+    months = pd.DataFrame({'ano': df_inflacao['ANO'], 'mes': df_inflacao['MES'].astype(str), 'fator': inflacao_acumulada})
+    stores = df_sales[['id', 'uf', 'pet_shop', 'venda_base']]
+
+    # --- Compara com o estado salvo para descobrir os meses e as lojas novos ---
+    new_months = pd.Series(True, index=months.index)
+    new_stores = pd.Series(True, index=stores.index)
+    existing = None
+
+    if all(os.path.exists(path) for path in output_paths):
+        old_months = read_table(months_state_path)
+        old_stores = read_table(stores_state_path)
+
+        month_match = old_months.astype({'mes': str}).merge(
+            months.reset_index(), on=['ano', 'mes', 'fator'], how='left'
+        )
+        store_columns = ['id', 'uf', 'pet_shop', 'venda_base']
+        store_match = _tag_occurrences(old_stores, store_columns).merge(
+            _tag_occurrences(stores, store_columns), on=store_columns + ['_ocorrencia'], how='left', suffixes=('_old', '')
+        )
+
+        if month_match['index'].notna().all() and store_match['_posicao'].notna().all():
+            new_months.loc[month_match['index'].astype(int)] = False
+            new_stores.loc[store_match['_posicao'].astype(int)] = False
+            existing = read_rollups(rollup_folder, file_extension)
+        else:
+            logger.info("Meses ou lojas já agregados foram alterados. Refazendo as agregações do zero.")
+
+    # Linhas a agregar: (meses novos x todas as lojas) e (meses antigos x lojas novas)
+    month_new_idx = new_months.to_numpy().nonzero()[0]
+    month_old_idx = (~new_months).to_numpy().nonzero()[0]
+    store_new_idx = new_stores.to_numpy().nonzero()[0]
+    blocks = [
+        (df_inflacao.iloc[month_new_idx], df_sales, inflacao_acumulada[month_new_idx]),
+        (df_inflacao.iloc[month_old_idx], df_sales.iloc[store_new_idx], inflacao_acumulada[month_old_idx]),
+    ]
+    logger.info(
+        f"Agregando {len(month_new_idx)} meses novos e {len(store_new_idx)} lojas novas "
+        f"({len(months)} meses x {len(stores)} lojas no total)."
+    )
+
+    partials = [existing] if existing else []
+    for block_inflacao, block_sales, block_fatores in blocks:
+        if len(block_inflacao) == 0 or len(block_sales) == 0:
+            continue
+        for chunk in iter_mock_sales_chunks(block_inflacao, block_sales, chunk_size or ROLLUP_CHUNK_SIZE, inflacao_acumulada=block_fatores):
+            partials = [merge_rollups(partials + [aggregate_sales(chunk)])]
+
+    if partials:
+        rollups = partials[0]
+    else:
+        empty = pd.DataFrame({col: pd.Series(dtype=MOCK_SALES_SCHEMA[col]) for col in MOCK_SALES_SCHEMA})
+        rollups = aggregate_sales(empty)
+
+    for name, path in paths.items():
+        write_table(add_month_key(rollups[name].drop(columns='ano_mes', errors='ignore')), path, ROLLUP_SCHEMA)
+    write_table(months, months_state_path)
+    write_table(stores, stores_state_path, SALES_BASE_SCHEMA)
+    logger.info(f"✅ Tabelas pré-agregadas gravadas em '{rollup_folder}'.")
+
+    if manifest_path:
+        record_stage(manifest, 'rollups', [inflacao_file_path, sales_base_path], output_paths)
+        save_manifest(manifest, manifest_path)
+
+    return paths
@@ -0,0 +1,289 @@
+"""
+Projeção das vendas em vários cenários de inflação, calculados de uma só vez.
+
+Cada cenário define um caminho de inflação mensal, a elasticidade das vendas à inflação por UF
+e o mês base. O volume de uma loja em um mês é:
+
+    volume = venda_base / fator_acumulado ** elasticidade_da_uf
+
+onde o fator acumulado é o produto de (1 + inflação/100) até o mês, com fator 1 no mês base,
+como em build_cumulative_inflation_index. Com a inflação do IPCA, elasticidade 1 e mês base
+MAI/2023, o cenário reproduz exatamente generate_mock_sales_data.
+
+Os cenários são lidos de um arquivo json com uma lista de objetos:
+
+    [
+        {"name": "ipca"},
+        {"name": "ipca_mais_0.2pp", "inflation_shift": 0.2},
+        {"name": "ipca_x1.5", "inflation_scale": 1.5},
+        {"name": "meta_3pct_ano", "inflation": 0.247},
+        {"name": "sp_elastico", "elasticity": {"SP": 1.4, "default": 1.0}},
+        {"name": "base_jan_2022", "base_month": [2022, "JAN"]}
+    ]
+
+    inflation: inflação mensal (%) fixa ou uma lista com um valor por mês. Padrão: a série do IPCA.
+    inflation_shift: pontos percentuais somados à inflação de cada mês.
+    inflation_scale: multiplicador da inflação de cada mês (aplicado antes do shift).
+    elasticity: elasticidade única ou por UF, com 'default' para as demais UFs. Padrão: 1.
+    base_month: [ano, mês] com fator 1. Padrão: [2023, "MAI"].
+"""
+import os
+import json
+import logging
+import numpy as np
+import pandas as pd
+
+from .etl_runner import prepare_inflation_table
+from .rollups import add_month_key
+from .manifest import load_manifest, save_manifest, stage_is_current, record_stage
+from .schema import (
+    SALES_BASE_SCHEMA, INFLATION_SCHEMA, SCENARIO_SALES_SCHEMA, SCENARIO_ROLLUP_SCHEMA,
+    apply_schema, categorical_codes, month_numbers,
+)
+from .storage import read_table, write_table, TableWriter, storage_format
+
+logger = logging.getLogger(__name__)
+
+VOLUME_COLUMN = 'volume_vendas_(kg)'
+
+# Mês base padrão dos cenários, o mesmo de build_cumulative_inflation_index
+DEFAULT_BASE_MONTH = (2023, 'MAI')
+
+def load_scenarios(scenarios_file: str) -> list:
+    """Lê a lista de cenários de um arquivo json."""
+    with open(scenarios_file, 'r', encoding='utf-8') as f:
+        scenarios = json.load(f)
+    if not isinstance(scenarios, list) or not scenarios:
+        raise ValueError(f"O arquivo '{scenarios_file}' deve conter uma lista de cenários.")
+    names = [scenario.get('name') for scenario in scenarios]
+    if any(not name for name in names) or len(set(names)) != len(names):
+        raise ValueError(f"Cada cenário precisa de um 'name' único. Encontrados: {names}")
+    return scenarios
+
+def build_scenario_matrices(df_inflacao: pd.DataFrame, ufs: pd.Index, scenarios: list) -> dict:
+    """
+    Monta as matrizes dos cenários a partir das especificações.
+
+    Args:
+        df_inflacao (pd.DataFrame): Tabela de inflação preparada por prepare_inflation_table.
+        ufs (pd.Index): As UFs das lojas, na ordem dos códigos das categorias.
+        scenarios (list): As especificações dos cenários (veja a documentação do módulo).
+
+    Returns:
+        dict: 'names' (lista), 'inflation' (cenários x meses, em %), 'elasticity'
+            (cenários x UFs, com uma coluna extra para lojas sem UF) e 'base_index'
+            (posição do mês base de cada cenário, ou -1 se ele não estiver na série).
+    """
+    n_months = len(df_inflacao)
+    ipca = df_inflacao['INFLACAO_NO_MES'].to_numpy(dtype=float)
+    anos = df_inflacao['ANO'].to_numpy()
+    meses = month_numbers(df_inflacao['MES'])
+    uf_labels = [str(uf).upper() for uf in ufs]
+
+    inflation = np.empty((len(scenarios), n_months))
+    elasticity = np.ones((len(scenarios), len(ufs) + 1))
+    base_index = np.full(len(scenarios), -1)
+
+    for i, scenario in enumerate(scenarios):
+        path = scenario.get('inflation')
+        if path is None:
+            path = ipca
+        path = np.broadcast_to(np.asarray(path, dtype=float), (n_months,))
+        inflation[i] = path * scenario.get('inflation_scale', 1.0) + scenario.get('inflation_shift', 0.0)
+
+        value = scenario.get('elasticity', 1.0)
+        if isinstance(value, dict):
+            elasticity[i] = value.get('default', 1.0)
+            for j, uf in enumerate(uf_labels):
+                elasticity[i, j] = value.get(uf, value.get('default', 1.0))
+        else:
+            elasticity[i] = value
+
+        base_year, base_month = scenario.get('base_month', DEFAULT_BASE_MONTH)
+        base_number = month_numbers(pd.Series([base_month]))[0]
+        matches = np.flatnonzero((anos == int(base_year)) & (meses == base_number))
+        if len(matches):
+            base_index[i] = matches[0]
+
+    return {
+        'names': [scenario['name'] for scenario in scenarios],
+        'inflation': inflation,
+        'elasticity': elasticity,
+        'base_index': base_index,
+    }
+
+def scenario_factors(inflation: np.ndarray, base_index: np.ndarray) -> np.ndarray:
+    """
+    Fatores de inflação acumulada de todos os cenários de uma vez.
+
+    Args:
+        inflation (np.ndarray): Inflação mensal em % (cenários x meses). Valores vazios não alteram o acumulado.
+        base_index (np.ndarray): Posição do mês base de cada cenário (-1 = sem mês base).
+
+    Returns:
+        np.ndarray: Fatores acumulados (cenários x meses), com 1 no mês base de cada cenário.
+    """
+    factors = np.cumprod(np.nan_to_num(1 + inflation / 100, nan=1.0), axis=1)
+    has_base = base_index >= 0
+    factors[np.flatnonzero(has_base), base_index[has_base]] = 1.0
+    return factors
+
+def project_scenarios(factors: np.ndarray, elasticity: np.ndarray, vendas_base: np.ndarray, uf_codes: np.ndarray) -> np.ndarray:
+    """
+    Calcula o volume de vendas de todos os cenários em um único array (cenários x meses x lojas).
+
+    Args:
+        factors (np.ndarray): Fatores acumulados (cenários x meses), de scenario_factors.
+        elasticity (np.ndarray): Elasticidade por UF (cenários x UFs + 1; a última coluna vale para lojas sem UF).
+        vendas_base (np.ndarray): A venda base de cada loja.
+        uf_codes (np.ndarray): O código da UF de cada loja (-1 = sem UF).
+
+    Returns:
+        np.ndarray: Volumes arredondados para baixo, em int32.
+    """
+    store_elasticity = elasticity[:, uf_codes]
+    divisor = factors[:, :, np.newaxis] ** store_elasticity[:, np.newaxis, :]
+    volume = vendas_base[np.newaxis, np.newaxis, :] / divisor
+    return volume.astype(np.int32)
+
+def iter_scenario_sales_chunks(df_inflacao: pd.DataFrame, df_sales: pd.DataFrame, matrices: dict, chunk_size: int = None):
+    """
+    Gera as vendas de todos os cenários em blocos de cenários inteiros, com no máximo chunk_size
+    linhas por bloco (ou um cenário por bloco, se um cenário passar de chunk_size).
+
+    As linhas seguem a ordem cenário, mês e loja. Cada bloco é calculado por project_scenarios.
+
+    Args:
+        df_inflacao (pd.DataFrame): Tabela de inflação preparada por prepare_inflation_table.
+        df_sales (pd.DataFrame): Dados base com as colunas 'uf', 'id', 'pet_shop' e 'venda_base'.
+        matrices (dict): As matrizes dos cenários, de build_scenario_matrices.
+        chunk_size (int): Quantidade máxima de linhas por bloco. Sem ele, todos os cenários em um bloco.
+
+    Yields:
+        tuple: O bloco de vendas (pd.DataFrame no formato de SCENARIO_SALES_SCHEMA) e o array
+            de volumes do bloco (cenários x meses x lojas).
+    """
+    n_months, n_stores = len(df_inflacao), len(df_sales)
+    names = matrices['names']
+    factors = scenario_factors(matrices['inflation'], matrices['base_index'])
+
+    vendas_base = df_sales['venda_base'].to_numpy(dtype=float)
+    uf_codes, _ = categorical_codes(df_sales['uf'])
+    # Lojas sem UF usam a última coluna da matriz de elasticidade
+    uf_codes = np.where(uf_codes < 0, matrices['elasticity'].shape[1] - 1, uf_codes)
+
+    anos = df_inflacao['ANO'].to_numpy().astype(np.int16)
+    meses = categorical_codes(df_inflacao['MES'])
+    lojas = {col: categorical_codes(df_sales[col]) for col in ('uf', 'id', 'pet_shop')}
+
+    rows_per_scenario = max(n_months * n_stores, 1)
+    scenarios_per_chunk = max(1, (chunk_size or rows_per_scenario * len(names)) // rows_per_scenario)
+
+    for start in range(0, len(names), scenarios_per_chunk):
+        block = slice(start, start + scenarios_per_chunk)
+        volumes = project_scenarios(factors[block], matrices['elasticity'][block], vendas_base, uf_codes)
+        n_block = volumes.shape[0]
+
+        idx_cenario = np.repeat(np.arange(start, start + n_block, dtype=np.int32), n_months * n_stores)
+        idx_mes = np.tile(np.repeat(np.arange(n_months, dtype=np.int32), n_stores), n_block)
+        idx_loja = np.tile(np.arange(n_stores, dtype=np.int32), n_block * n_months)
+
+        chunk = {
+            'cenario': pd.Categorical.from_codes(idx_cenario, categories=names),
+            'ano': anos[idx_mes],
+            'mes': pd.Categorical.from_codes(meses[0][idx_mes], categories=meses[1]),
+        }
+        for col, (codes, categories) in lojas.items():
+            chunk[col] = pd.Categorical.from_codes(codes[idx_loja], categories=categories)
+        chunk[VOLUME_COLUMN] = volumes.reshape(-1)
+        yield pd.DataFrame(chunk), volumes
+
+def scenario_monthly_totals(df_inflacao: pd.DataFrame, names: list, totals: np.ndarray) -> pd.DataFrame:
+    """Monta a tabela do volume mensal de cada cenário a partir da matriz de somas (cenários x meses)."""
+    n_scenarios, n_months = totals.shape
+    df = pd.DataFrame({
+        'cenario': pd.Categorical(np.repeat(names, n_months), categories=names),
+        'ano': np.tile(df_inflacao['ANO'].to_numpy(), n_scenarios),
+        'mes': np.tile(df_inflacao['MES'].astype(str).to_numpy(), n_scenarios),
+        VOLUME_COLUMN: totals.reshape(-1),
+    })
+    return add_month_key(df)
+
+def read_scenario_sales(path: str, scenarios: list = None, columns: list = None) -> pd.DataFrame:
+    """
+    Lê as vendas projetadas, opcionalmente apenas de alguns cenários. No parquet o filtro é
+    aplicado na leitura, pulando os blocos de linhas dos demais cenários.
+
+    Args:
+        path (str): O caminho do arquivo gerado por generate_scenario_sales_data.
+        scenarios (list): Os nomes dos cenários lidos. Padrão: todos.
+        columns (list): Lê apenas as colunas informadas.
+    """
+    if scenarios and storage_format(path) == 'parquet':
+        df = pd.read_parquet(path, columns=columns, filters=[('cenario', 'in', list(scenarios))])
+        return apply_schema(df, SCENARIO_SALES_SCHEMA)
+    df = read_table(path, SCENARIO_SALES_SCHEMA, columns=columns)
+    if scenarios:
+        df = df[df['cenario'].isin(scenarios)].reset_index(drop=True)
+    return df
+
+def generate_scenario_sales_data(source_csv_file_folder: str, base_data_file: str, inflacao_file: str, scenarios_file: str,
+                                 output_file: str, rollup_folder: str, manifest_path: str = None, chunk_size: int = None) -> str:
+    """
+    Projeta as vendas de todos os cenários do arquivo json e grava o resultado em uma tabela
+    com a coluna 'cenario', mais a tabela 'vendas_cenarios_por_mes' usada pelo dashboard.
+
+    Args:
+        source_csv_file_folder (str): A pasta com os dados base e os dados de inflação.
+        base_data_file (str): O nome do arquivo com os dados de maio de 2023.
+        inflacao_file (str): O nome do arquivo com os dados de inflação.
+        scenarios_file (str): O caminho do arquivo json com os cenários.
+        output_file (str): O nome do arquivo de saída; o formato segue a extensão. exemplo: vendas_cenarios.parquet
+        rollup_folder (str): A pasta onde a tabela do volume mensal por cenário é gravada.
+        manifest_path (str): Manifesto do modo incremental. Quando informado, a projeção é pulada
+            se os dados base, a inflação e os cenários não mudaram desde a última execução.
+        chunk_size (int): Quantidade máxima de linhas por bloco; cada bloco tem cenários inteiros.
+
+    Returns:
+        str: O caminho da tabela do volume mensal por cenário.
+    """
+    inflacao_file_path = os.path.join(source_csv_file_folder, inflacao_file)
+    sales_base_path = os.path.join(source_csv_file_folder, base_data_file)
+    output_path = os.path.join(source_csv_file_folder, output_file)
+    file_extension = os.path.splitext(output_file)[1]
+    monthly_path = os.path.join(rollup_folder, f"vendas_cenarios_por_mes{file_extension}")
+    inputs = [inflacao_file_path, sales_base_path, scenarios_file]
+
+    if manifest_path:
+        manifest = load_manifest(manifest_path)
+        if stage_is_current(manifest, 'scenarios', inputs, [output_path, monthly_path]):
+            logger.info(f"✅ As projeções em '{output_path}' estão atualizadas.")
+            return monthly_path
+
+    scenarios = load_scenarios(scenarios_file)
+    df_inflacao = prepare_inflation_table(read_table(inflacao_file_path, INFLATION_SCHEMA)).reset_index(drop=True)
+    df_sales = read_table(sales_base_path, SALES_BASE_SCHEMA).rename(columns={'compra_maio_2023_(kg)': 'venda_base'})
+    _, ufs = categorical_codes(df_sales['uf'])
+    matrices = build_scenario_matrices(df_inflacao, ufs, scenarios)
+    logger.info(
+        f"Projetando {len(scenarios)} cenários x {len(df_inflacao)} meses x {len(df_sales)} lojas "
+        f"({len(scenarios) * len(df_inflacao) * len(df_sales)} linhas)."
+    )
+
+    os.makedirs(rollup_folder, exist_ok=True)
+    totals = []
+    with TableWriter(output_path, SCENARIO_SALES_SCHEMA) as writer:
+        for chunk, volumes in iter_scenario_sales_chunks(df_inflacao, df_sales, matrices, chunk_size):
+            writer.write(chunk)
+            # O volume mensal de cada cenário é a soma do eixo das lojas, sem agrupar as linhas
+            totals.append(volumes.sum(axis=2, dtype=np.int64))
+
+    monthly = scenario_monthly_totals(df_inflacao, matrices['names'], np.concatenate(totals))
+    write_table(monthly, monthly_path, SCENARIO_ROLLUP_SCHEMA)
+    logger.info(f"✅ {writer.rows_written} linhas de vendas projetadas gravadas em '{output_path}'.")
+
+    if manifest_path:
+        record_stage(manifest, 'scenarios', inputs, [output_path, monthly_path])
+        save_manifest(manifest, manifest_path)
+
+    return monthly_path
@@ -0,0 +1,174 @@
+"""
+Execução das etapas do pipeline como um grafo de dependências.
+
+Cada etapa declara as etapas das quais depende e os arquivos que lê e grava. Etapas
+independentes (como a obtenção do IPCA e a leitura das planilhas de vendas) rodam ao mesmo
+tempo em um pool de threads, e cada etapa começa assim que suas dependências terminam, de
+modo que o tempo total é o do caminho crítico do grafo e não a soma das etapas.
+
+As etapas rodam em threads porque o trabalho pesado ou libera o GIL (download e leitura de
+arquivos) ou já usa seu próprio pool de processos (leitura das planilhas com ETL_MAX_WORKERS).
+Esse pool é criado enquanto outras etapas rodam em threads, e um fork nesse momento copiaria
+locks possivelmente ocupados por elas para o processo filho; por isso os pools de processos
+do pipeline usam o método 'spawn' (etl_runner.PROCESS_START_METHOD), nunca o fork padrão do Linux.
+"""
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from .manifest import load_manifest, stage_is_current
+from .instrumentation import RunMetrics
+
+logger = logging.getLogger(__name__)
+
+class Stage:
+    """
+    Uma etapa do grafo do pipeline.
+
+    Args:
+        name (str): O nome da etapa, o mesmo usado no manifesto e nas métricas. exemplo: 'mock_sales'
+        func (callable): A função executada, sem argumentos.
+        depends_on (list): Os nomes das etapas que precisam terminar antes desta.
+        inputs (list): Os arquivos lidos pela etapa.
+        outputs (list): Os arquivos gravados pela etapa.
+        description (str): Descrição usada no log de falha. exemplo: 'geração de dados fictícios'
+        retries (int): Quantas vezes a etapa é repetida depois de uma falha.
+        retry_delay (float): Espera antes da primeira repetição, em segundos; dobra a cada nova tentativa.
+        skip_when_current (bool): Pula a etapa sem chamar func quando o manifesto indica que as saídas
+            estão atualizadas com as entradas. Só vale para etapas cujas entradas e saídas declaradas
+            são as mesmas que a função registra no manifesto.
+        params (dict): Parâmetros da etapa registrados no manifesto junto com as entradas.
+    """
+
+    def __init__(self, name: str, func, depends_on: list = None, inputs: list = None, outputs: list = None,
+                 description: str = None, retries: int = 0, retry_delay: float = 1.0,
+                 skip_when_current: bool = False, params: dict = None):
+        self.name = name
+        self.func = func
+        self.depends_on = list(depends_on or [])
+        self.inputs = list(inputs or [])
+        self.outputs = list(outputs or [])
+        self.description = description or name
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.skip_when_current = skip_when_current
+        self.params = params
+
+def stage_order(stages: list) -> list:
+    """
+    Valida o grafo e retorna os nomes das etapas em uma ordem topológica.
+
+    Raises:
+        ValueError: Se houver nomes repetidos, dependências desconhecidas ou ciclos.
+    """
+    by_name = {}
+    for stage in stages:
+        if stage.name in by_name:
+            raise ValueError(f"Etapa repetida no grafo: '{stage.name}'.")
+        by_name[stage.name] = stage
+
+    for stage in stages:
+        unknown = [dep for dep in stage.depends_on if dep not in by_name]
+        if unknown:
+            raise ValueError(f"A etapa '{stage.name}' depende de etapas inexistentes: {unknown}")
+
+    order, visiting, done = [], set(), set()
+
+    def visit(name, path):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"Ciclo entre as etapas: {' -> '.join(path + [name])}")
+        visiting.add(name)
+        for dep in by_name[name].depends_on:
+            visit(dep, path + [name])
+        visiting.discard(name)
+        done.add(name)
+        order.append(name)
+
+    for stage in stages:
+        visit(stage.name, [])
+    return order
+
+def run_stage(stage: Stage, metrics: RunMetrics, manifest_path: str = None) -> str:
+    """
+    Executa uma etapa com as repetições configuradas, medindo-a com metrics.
+
+    Returns:
+        str: 'ok' ou 'skipped'. A exceção da última tentativa é propagada.
+    """
+    with metrics.stage(stage.name, inputs=stage.inputs, outputs=stage.outputs) as record:
+        if stage.skip_when_current and manifest_path:
+            manifest = load_manifest(manifest_path)
+            if stage_is_current(manifest, stage.name, stage.inputs, stage.outputs, stage.params):
+                record['skipped'] = True
+                logger.info(f"✅ Etapa '{stage.name}' atualizada, pulando.")
+                return 'skipped'
+
+        for attempt in range(1, stage.retries + 2):
+            record['attempts'] = attempt
+            try:
+                stage.func()
+                return 'ok'
+            except Exception as e:
+                if attempt > stage.retries:
+                    raise
+                delay = stage.retry_delay * 2 ** (attempt - 1)
+                logger.warning(f"Etapa '{stage.name}' falhou na tentativa {attempt}: {e}. Nova tentativa em {delay}s.")
+                time.sleep(delay)
+
+def run_stages(stages: list, metrics: RunMetrics = None, max_workers: int = None, manifest_path: str = None) -> dict:
+    """
+    Executa o grafo de etapas, com as etapas independentes em paralelo.
+
+    Uma etapa com falha bloqueia apenas as etapas que dependem dela; as demais continuam,
+    para que o que já foi processado fique salvo para a próxima execução.
+
+    Args:
+        stages (list): As etapas (Stage) do grafo.
+        metrics (RunMetrics): Coletor das métricas de cada etapa.
+        max_workers (int): Quantidade máxima de etapas ao mesmo tempo. Padrão: todas as etapas prontas.
+        manifest_path (str): Manifesto consultado pelas etapas com skip_when_current.
+
+    Returns:
+        dict: O resultado de cada etapa, na ordem topológica: 'ok', 'skipped', 'error' ou 'blocked'.
+    """
+    if metrics is None:
+        metrics = RunMetrics()
+    order = stage_order(stages)
+    by_name = {stage.name: stage for stage in stages}
+    results = {}
+    running = {}
+    first_record = len(metrics.stages)
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(stages) or 1, thread_name_prefix='stage') as executor:
+        while len(results) < len(order):
+            for name in order:
+                if name in results or name in running.values():
+                    continue
+                deps = [results.get(dep) for dep in by_name[name].depends_on]
+                if any(result in ('error', 'blocked') for result in deps):
+                    results[name] = 'blocked'
+                    logger.error(f"❌ Etapa '{name}' não executada: uma das etapas {by_name[name].depends_on} falhou.")
+                elif all(result in ('ok', 'skipped') for result in deps):
+                    running[executor.submit(run_stage, by_name[name], metrics, manifest_path)] = name
+
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                    logger.info(f"Etapa '{name}' concluída ({results[name]}).")
+                except Exception as e:
+                    results[name] = 'error'
+                    logger.error(f"❌ Falha no passo de {by_name[name].description}: {e}")
+
+    stage_seconds = sum(record.get('wall_seconds', 0) for record in metrics.stages[first_record:])
+    logger.info(
+        f"Grafo de {len(order)} etapas concluído em {time.perf_counter() - started:.2f}s "
+        f"(soma das etapas: {stage_seconds:.2f}s)."
+    )
+    return {name: results[name] for name in order}
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+# --- Esquemas das tabelas do pipeline ---
+# Colunas com poucos valores distintos (ou repetidas a cada mês, como o id da loja nas vendas
+# fictícias) são categóricas: cada linha guarda apenas um código inteiro pequeno. Os inteiros usam
+# o menor tipo que comporta os valores. Colunas ausentes do esquema mantêm o tipo original.
+# O volume base fica em float64 e não em float32: ele é multiplicado pelo fator acumulado da
+# inflação e arredondado para baixo nas vendas fictícias, e os ~7 dígitos do float32 mudariam o
+# quilo de algumas vendas. A base tem uma linha por loja, então a economia seria pequena.
+SALES_BASE_SCHEMA = {
+    'uf': 'category',
+    'id': 'string',
+    'pet_shop': 'category',
+    'compra_maio_2023_(kg)': 'float64',
+}
+
+# Quantidades gravadas em float64 (validation.validate_sales_data) que o csv escreve sem o '.0'
+# quando o valor é inteiro, como a planilha de origem: 210 e não 210.0
+INTEGRAL_CSV_COLUMNS = ('compra_maio_2023_(kg)',)
+
+INFLATION_SCHEMA = {
+    'ANO': 'int16',
+    'MES': 'category',
+    'INFLACAO_NO_MES': 'float64',
+}
+
+# Os volumes são quilos inteiros (arredondados para baixo), então int32 ocupa o mesmo espaço de
+# um float32 sem perder a exatidão dos valores
+MOCK_SALES_SCHEMA = {
+    'ano': 'int16',
+    'mes': 'category',
+    'uf': 'category',
+    'id': 'category',
+    'pet_shop': 'category',
+    'volume_vendas_(kg)': 'int32',
+}
+
+# As somas das agregações podem passar do limite do int32
+ROLLUP_SCHEMA = {**MOCK_SALES_SCHEMA, 'volume_vendas_(kg)': 'int64'}
+
+# Vendas projetadas por cenário, identificadas pela coluna 'cenario'
+SCENARIO_SALES_SCHEMA = {'cenario': 'category', **MOCK_SALES_SCHEMA}
+SCENARIO_ROLLUP_SCHEMA = {'cenario': 'category', **ROLLUP_SCHEMA}
+
+# Base de índices de preços: uma linha por índice e mês, com o fator acumulado desde o início da série
+PRICE_INDEX_SCHEMA = {
+    'indice': 'category',
+    'ano': 'int16',
+    'mes': 'int8',
+    'variacao_no_mes': 'float64',
+    'fator_acumulado': 'float64',
+}
+# --- Fim dos esquemas ---
+
+# Número de cada mês abreviado em português
+MONTH_NUMBERS = {
+    'JAN': 1, 'FEV': 2, 'MAR': 3, 'ABR': 4, 'MAI': 5, 'JUN': 6,
+    'JUL': 7, 'AGO': 8, 'SET': 9, 'OUT': 10, 'NOV': 11, 'DEZ': 12,
+}
+
+# Número do mês -> abreviação usada nas tabelas do pipeline
+MONTH_NAMES = {number: name for name, number in MONTH_NUMBERS.items()}
+
+def apply_schema(df: pd.DataFrame, schema: dict) -> pd.DataFrame:
+    """Converte as colunas do DataFrame para os tipos definidos no esquema."""
+    if not schema:
+        return df
+    changes = {col: dtype for col, dtype in schema.items() if col in df.columns and df[col].dtype != dtype}
+    return df.astype(changes) if changes else df
+
+def categorical_codes(values: pd.Series) -> tuple:
+    """
+    Retorna os códigos e as categorias de uma coluna, para montar colunas categóricas
+    repetidas com pd.Categorical.from_codes sem criar uma string por linha.
+
+    Args:
+        values (pd.Series): A coluna, categórica ou não.
+
+    Returns:
+        tuple: Os códigos (np.ndarray de inteiros, -1 para valores vazios) e as categorias (pd.Index).
+    """
+    categorical = values.array if isinstance(values.dtype, pd.CategoricalDtype) else pd.Categorical(values)
+    return np.asarray(categorical.codes), categorical.categories
+
+def month_numbers(meses: pd.Series) -> np.ndarray:
+    """Converte os meses abreviados ('JAN', 'fev', ...) nos números de 1 a 12, em int8."""
+    return meses.astype(str).str.upper().map(MONTH_NUMBERS).to_numpy(dtype=np.int8)
+
+def memory_usage_mb(df: pd.DataFrame) -> float:
+    """Memória ocupada pelo DataFrame, incluindo o conteúdo das strings, em MB."""
+    return round(df.memory_usage(deep=True).sum() / (1024 * 1024), 2)
@@ -0,0 +1,440 @@
+"""
+Modo serviço do pipeline: um processo de longa duração com o estado quente em memória.
+
+O serviço mantém a série do IPCA e as planilhas de vendas já limpas em memória, observa a pasta
+de planilhas e refaz apenas as etapas afetadas quando uma planilha é adicionada, alterada ou
+removida. Um endpoint HTTP local permite disparar uma execução e consultar o estado.
+
+Exemplo:
+    python -m dashboard_page_generator.service
+    curl -X POST http://127.0.0.1:8765/run
+    curl -X POST 'http://127.0.0.1:8765/run?ipca=1'
+    curl http://127.0.0.1:8765/status
+"""
+import os
+import sys
+import json
+import time
+import signal
+import logging
+import threading
+import multiprocessing
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+
+from .etl_runner import (
+    process_ipca_data, process_sales_workbook, prepare_inflation_table, write_mock_sales_data, process_price_index_files,
+    PROCESS_START_METHOD,
+)
+from .excel_reader import resolve_excel_engine
+from .validation import ColumnMapping, REJECTION_REPORT_FILE, load_column_mapping, failed_file_report, write_rejection_report
+from .rollups import build_sales_rollups, rollup_paths
+from .scenarios import generate_scenario_sales_data
+from .database import load_sales_database
+from .dashboard_renderer import DRILLDOWN_MAX_PET_SHOPS
+from .start import IPCA_ZIP_FILE_URL, INFLATION_YEARS, inflation_file_name, generate_dashboard, scenario_rollup_path
+from .schema import SALES_BASE_SCHEMA, INFLATION_SCHEMA, apply_schema
+from .storage import read_table, write_table
+from .instrumentation import RunMetrics
+
+logger = logging.getLogger(__name__)
+
+def _init_worker():
+    """Os processos do pool ignoram Ctrl+C e SIGTERM do grupo; o serviço os encerra ao parar."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+def _file_signature(path: str):
+    """Assinatura (mtime, tamanho) do arquivo, ou None se ele não existir."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+class PipelineService:
+    """
+    Executa o pipeline mantendo em memória o estado entre as execuções.
+
+    - As planilhas limpas ficam em memória, identificadas por (mtime, tamanho); apenas as
+      planilhas novas ou alteradas são lidas novamente, por um pool de processos mantido aberto.
+    - A série do IPCA fica em memória e o IBGE só é consultado a cada ipca_refresh_seconds
+      ou quando a execução pede a atualização.
+    - As vendas fictícias só são regeradas quando os dados base ou a inflação mudaram; as
+      agregações, os outros índices de preços, os cenários, o banco de dados e o dashboard
+      usam o manifesto para pular o que já está atualizado.
+
+    As execuções são serializadas por uma única thread: pedidos feitos durante uma execução
+    são agrupados em uma única execução seguinte.
+    """
+
+    def __init__(self, data_folder: str = 'data/raw', output_folder: str = 'data/docs', storage_extension: str = '.parquet',
+                 excel_engine: str = 'auto', max_workers: int = None, chunk_size: int = None, export_csv: bool = False,
+                 plotlyjs: str = 'asset', ipca_refresh_seconds: int = 24 * 60 * 60, dashboard_mode: str = 'static',
+                 column_mapping: ColumnMapping = None, price_index_files: dict = None, scenarios_file: str = None,
+                 database_file: str = None, max_pet_shops: int = DRILLDOWN_MAX_PET_SHOPS):
+        self.data_folder = data_folder
+        self.output_folder = output_folder
+        self.storage_extension = storage_extension
+        self.excel_engine = resolve_excel_engine(excel_engine)
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.export_csv = export_csv
+        self.plotlyjs = plotlyjs
+        self.dashboard_mode = dashboard_mode
+        self.ipca_refresh_seconds = ipca_refresh_seconds
+        self.column_mapping = column_mapping or ColumnMapping()
+        self.price_index_files = price_index_files or {}
+        self.scenarios_file = scenarios_file
+        self.database_file = database_file
+        self.max_pet_shops = max_pet_shops
+
+        self.manifest_path = os.path.join(output_folder, '.etl_manifest.json')
+        self.rollup_folder = os.path.join(output_folder, 'rollups')
+        self.metrics_path = os.path.join(output_folder, '.metrics', 'etl_metrics.jsonl')
+        self.inflacao_file = inflation_file_name(storage_extension)
+        self.base_data_file = f"dados{storage_extension}"
+        self.output_file = f"vendas_ficticias{storage_extension}"
+        self.report_path = os.path.join(output_folder, REJECTION_REPORT_FILE)
+        self.price_index_path = os.path.join(output_folder, f"indices_precos{storage_extension}")
+        self.scenario_output_file = f"vendas_cenarios{storage_extension}"
+
+        # Estado quente: planilha -> (assinatura, linhas válidas, relatório de rejeições)
+        self._partitions = {}
+        self._sales = None
+        self._inflation = None
+        self._inflation_signature = None
+        self._ipca_checked_at = None
+        self._executor = ProcessPoolExecutor(
+            max_workers=max_workers, initializer=_init_worker, mp_context=multiprocessing.get_context(PROCESS_START_METHOD),
+        ) if max_workers else None
+
+        # Controle das execuções
+        self._trigger = threading.Event()
+        self._stop = threading.Event()
+        self._pending = {'ipca': False, 'reasons': []}
+        self._lock = threading.Lock()
+        self._status = {'state': 'idle', 'runs': 0, 'last_run': None, 'pending': False}
+        self._worker = None
+        self._watcher = None
+
+    # --- Etapas ---
+
+    def _refresh_ipca(self, metrics: RunMetrics, force: bool) -> bool:
+        """Atualiza a série do IPCA em memória. Retorna True se ela mudou."""
+        inflacao_path = os.path.join(self.output_folder, self.inflacao_file)
+        due = force or self._ipca_checked_at is None or time.time() - self._ipca_checked_at >= self.ipca_refresh_seconds
+
+        with metrics.stage('ipca', outputs=[inflacao_path]) as record:
+            record['skipped'] = not due
+            if due:
+                process_ipca_data(IPCA_ZIP_FILE_URL, INFLATION_YEARS, self.inflacao_file, self.output_folder, manifest_path=self.manifest_path,
+                                  price_index_file=os.path.basename(self.price_index_path))
+                self._ipca_checked_at = time.time()
+
+            signature = _file_signature(inflacao_path)
+            if signature is None:
+                raise FileNotFoundError(f"Os dados de inflação '{inflacao_path}' não foram gerados.")
+            if signature == self._inflation_signature:
+                return False
+
+            self._inflation = prepare_inflation_table(read_table(inflacao_path, INFLATION_SCHEMA))
+            self._inflation_signature = signature
+            logger.info(f"Série do IPCA carregada em memória: {len(self._inflation)} meses.")
+            return True
+
+    def _scan_workbooks(self) -> dict:
+        """Assinatura de cada planilha da pasta de dados, em ordem alfabética."""
+        if not os.path.isdir(self.data_folder):
+            return {}
+        names = sorted(f for f in os.listdir(self.data_folder) if f.endswith('.xlsx') and not f.startswith('~'))
+        signatures = {os.path.join(self.data_folder, name): _file_signature(os.path.join(self.data_folder, name)) for name in names}
+        return {path: signature for path, signature in signatures.items() if signature is not None}
+
+    def _refresh_sales(self, metrics: RunMetrics) -> bool:
+        """Lê apenas as planilhas novas ou alteradas e regrava os dados base se o conjunto mudou."""
+        sales_path = os.path.join(self.output_folder, self.base_data_file)
+
+        with metrics.stage('sales_etl', outputs=[sales_path]) as record:
+            workbooks = self._scan_workbooks()
+            changed = [path for path, signature in workbooks.items() if self._partitions.get(path, (None,))[0] != signature]
+            removed = [path for path in self._partitions if path not in workbooks]
+            with self._lock:
+                for path in removed:
+                    del self._partitions[path]
+            record.update({'changed_files': len(changed), 'removed_files': len(removed)})
+            logger.info(f"{len(changed)} de {len(workbooks)} planilhas novas ou alteradas, {len(removed)} removidas.")
+
+            errors = {}
+            if self._executor and len(changed) > 1:
+                futures = {self._executor.submit(process_sales_workbook, path, self.excel_engine, self.column_mapping): path for path in changed}
+                loaders = ((futures[future], future.result) for future in as_completed(futures))
+            else:
+                loaders = ((path, partial(process_sales_workbook, path, self.excel_engine, self.column_mapping)) for path in changed)
+
+            for path, load in loaders:
+                try:
+                    clean_df, report = load()
+                    partition = (workbooks[path], clean_df, report)
+                except Exception as e:
+                    # A planilha com erro é tentada de novo quando for alterada
+                    partition = (workbooks[path], None, failed_file_report(os.path.basename(path), e))
+                    errors[os.path.basename(path)] = str(e)
+                    logger.error(f"Erro ao processar o arquivo {os.path.basename(path)}: {e}")
+                with self._lock:
+                    self._partitions[path] = partition
+            record['errors'] = errors
+            if changed or removed:
+                reports = [report for _, _, report in self._partitions.values()]
+                record['rejected_rows'] = sum(report['rejeitadas'] for report in reports)
+                write_rejection_report(reports, self.report_path)
+
+            if not changed and not removed and self._sales is not None and os.path.exists(sales_path):
+                record['skipped'] = True
+                return False
+
+            frames = [df for path, (_, df, _) in sorted(self._partitions.items()) if df is not None]
+            if not frames:
+                raise ValueError(f"Nenhuma planilha válida em '{self.data_folder}'.")
+            self._sales = apply_schema(pd.concat(frames, ignore_index=True), SALES_BASE_SCHEMA)
+            write_table(self._sales, sales_path, SALES_BASE_SCHEMA)
+            logger.info(f"{len(self._sales)} lojas gravadas em '{sales_path}'.")
+            return True
+
+    def _refresh_mock_sales(self, metrics: RunMetrics, changed: bool):
+        """Regera as vendas fictícias a partir das tabelas em memória, se os dados base ou a inflação mudaram."""
+        output_path = os.path.join(self.output_folder, self.output_file)
+        with metrics.stage('mock_sales', outputs=[output_path]) as record:
+            if not changed and os.path.exists(output_path):
+                record['skipped'] = True
+                return
+            df_sales = self._sales.rename(columns={'compra_maio_2023_(kg)': 'venda_base'})
+            rows = write_mock_sales_data(self._inflation, df_sales, output_path, export_csv=self.export_csv, chunk_size=self.chunk_size)
+            logger.info(f"{rows} linhas de vendas fictícias gravadas em '{output_path}'.")
+
+    def run(self, force_ipca: bool = False) -> dict:
+        """
+        Executa o pipeline de forma síncrona, refazendo apenas as etapas afetadas.
+
+        Args:
+            force_ipca (bool): Consulta o IBGE mesmo antes de ipca_refresh_seconds.
+
+        Returns:
+            dict: O resumo da execução, também disponível em status()['last_run'].
+        """
+        metrics = RunMetrics()
+        summary = {'run_id': metrics.run_id, 'started_at': metrics.started_at, 'status': 'ok'}
+        with self._lock:
+            self._status['state'] = 'running'
+
+        try:
+            inflation_changed = self._refresh_ipca(metrics, force_ipca)
+            sales_changed = self._refresh_sales(metrics)
+            self._refresh_mock_sales(metrics, inflation_changed or sales_changed)
+
+            with metrics.stage('rollups', outputs=list(rollup_paths(self.rollup_folder, self.storage_extension).values())):
+                build_sales_rollups(self.output_folder, self.base_data_file, self.inflacao_file, self.rollup_folder,
+                                    self.storage_extension, manifest_path=self.manifest_path, chunk_size=self.chunk_size)
+
+            # Etapas opcionais, como em start.main; cada uma consulta o manifesto e pula o que está atualizado
+            if self.price_index_files:
+                with metrics.stage('price_indices', inputs=list(self.price_index_files.values()), outputs=[self.price_index_path]):
+                    process_price_index_files(self.price_index_files, self.price_index_path, manifest_path=self.manifest_path)
+
+            if self.scenarios_file:
+                scenario_outputs = [os.path.join(self.output_folder, self.scenario_output_file),
+                                    scenario_rollup_path(self.rollup_folder, self.storage_extension)]
+                with metrics.stage('scenarios', inputs=[self.scenarios_file], outputs=scenario_outputs):
+                    generate_scenario_sales_data(self.output_folder, self.base_data_file, self.inflacao_file, self.scenarios_file,
+                                                 self.scenario_output_file, self.rollup_folder, manifest_path=self.manifest_path,
+                                                 chunk_size=self.chunk_size)
+
+            if self.database_file:
+                with metrics.stage('database', outputs=[self.database_file]):
+                    load_sales_database(self.output_folder, self.base_data_file, self.inflacao_file, self.output_file,
+                                        self.database_file, manifest_path=self.manifest_path)
+
+            with metrics.stage('dashboard', outputs=[os.path.join(self.output_folder, 'index.html')]):
+                generate_dashboard(os.path.join(self.output_folder, self.output_file), manifest_path=self.manifest_path,
+                                   rollup_folder=self.rollup_folder, plotlyjs=self.plotlyjs, database_path=self.database_file,
+                                   mode=self.dashboard_mode, max_pet_shops=self.max_pet_shops)
+        except Exception as e:
+            summary.update({'status': 'error', 'error': str(e)})
+            logger.error(f"❌ Falha na execução '{metrics.run_id}': {e}")
+
+        summary['finished_at'] = datetime.now(timezone.utc).isoformat()
+        summary['stages'] = [
+            {key: stage[key] for key in ('stage', 'status', 'wall_seconds', 'skipped', 'changed_files', 'removed_files', 'errors', 'error') if key in stage}
+            for stage in metrics.stages
+        ]
+        summary['wall_seconds'] = round(sum(stage['wall_seconds'] for stage in metrics.stages), 4)
+        try:
+            metrics.save(self.metrics_path)
+        except OSError as e:
+            logger.warning(f"Não foi possível gravar as métricas em '{self.metrics_path}': {e}")
+
+        with self._lock:
+            self._status.update({'state': 'idle', 'last_run': summary})
+            self._status['runs'] += 1
+        logger.info(f"Execução '{metrics.run_id}' concluída em {summary['wall_seconds']}s ({summary['status']}).")
+        return summary
+
+    # --- Disparo das execuções ---
+
+    def request_run(self, force_ipca: bool = False, reason: str = 'manual'):
+        """Agenda uma execução na thread do serviço. Pedidos próximos são agrupados."""
+        with self._lock:
+            self._pending['ipca'] |= force_ipca
+            self._pending['reasons'].append(reason)
+            self._status['pending'] = True
+        self._trigger.set()
+
+    def _run_loop(self):
+        while not self._stop.is_set():
+            self._trigger.wait()
+            if self._stop.is_set():
+                break
+            self._trigger.clear()
+            with self._lock:
+                force_ipca, reasons = self._pending['ipca'], self._pending['reasons']
+                self._pending = {'ipca': False, 'reasons': []}
+                self._status['pending'] = False
+            logger.info(f"Iniciando execução ({', '.join(sorted(set(reasons)))}).")
+            self.run(force_ipca=force_ipca)
+
+    def _watch_loop(self, poll_seconds: float):
+        """Observa a pasta de planilhas e pede uma execução quando ela muda e fica estável por um intervalo."""
+        last_seen = self._scan_workbooks()
+        while not self._stop.wait(poll_seconds):
+            current = self._scan_workbooks()
+            # As partições e o estado são alterados pela thread das execuções; lê uma cópia de ambos
+            with self._lock:
+                loaded = {path: partition[0] for path, partition in self._partitions.items()}
+                busy = self._status['pending'] or self._status['state'] == 'running'
+            # Arquivos ainda sendo copiados mudam entre duas leituras seguidas; espera estabilizar
+            if current == last_seen and current != loaded and not busy:
+                self.request_run(reason='watch')
+            last_seen = current
+
+    def start(self, watch: bool = True, poll_seconds: float = 2.0):
+        """Inicia a thread das execuções, a observação da pasta e agenda a primeira execução."""
+        self._worker = threading.Thread(target=self._run_loop, name='pipeline-runner', daemon=True)
+        self._worker.start()
+        if watch:
+            self._watcher = threading.Thread(target=self._watch_loop, args=(poll_seconds,), name='pipeline-watcher', daemon=True)
+            self._watcher.start()
+        self.request_run(reason='startup')
+
+    def stop(self):
+        """Encerra as threads e o pool de processos. Uma execução em andamento termina antes."""
+        self._stop.set()
+        self._trigger.set()
+        if self._worker:
+            self._worker.join()
+        if self._executor:
+            self._executor.shutdown()
+
+    def status(self) -> dict:
+        """O estado atual do serviço e o resumo da última execução."""
+        with self._lock:
+            status = json.loads(json.dumps(self._status))
+        status.update({
+            'workbooks': len(self._partitions),
+            'stores': 0 if self._sales is None else len(self._sales),
+            'inflation_months': 0 if self._inflation is None else len(self._inflation),
+            'ipca_checked_at': (
+                datetime.fromtimestamp(self._ipca_checked_at, timezone.utc).isoformat() if self._ipca_checked_at else None
+            ),
+        })
+        return status
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    """
+    Endpoint HTTP do serviço:
+        GET  /status         - estado do serviço e resumo da última execução
+        POST /run[?ipca=1]   - agenda uma execução (com ipca=1, consulta o IBGE)
+    """
+
+    def _send_json(self, code: int, payload: dict):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if urlparse(self.path).path == '/status':
+            self._send_json(200, self.server.service.status())
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/run':
+            self._send_json(404, {'error': 'not found'})
+            return
+        force_ipca = parse_qs(url.query).get('ipca', ['0'])[0].lower() in ('1', 'true', 'sim')
+        self.server.service.request_run(force_ipca=force_ipca, reason='http')
+        self._send_json(202, {'queued': True, 'ipca': force_ipca})
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+def serve(service: PipelineService, host: str = '127.0.0.1', port: int = 8765):
+    """Atende o endpoint HTTP até ser interrompido (Ctrl+C ou SIGTERM), encerrando o serviço ao final."""
+    # O docker stop envia SIGTERM; é tratado como Ctrl+C para encerrar o serviço de forma limpa
+    signal.signal(signal.SIGTERM, _interrupt)
+    server = ThreadingHTTPServer((host, port), ServiceRequestHandler)
+    server.service = service
+    logger.info(f"Serviço do pipeline atendendo em http://{host}:{server.server_address[1]} (GET /status, POST /run).")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Encerrando o serviço.")
+    finally:
+        # Novos sinais durante o encerramento não interrompem a execução em andamento
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        server.server_close()
+        service.stop()
+
+def main():
+    """Inicia o serviço com a configuração das variáveis de ambiente, as mesmas de start.main."""
+    for folder in ('data/raw', 'data/docs'):
+        os.makedirs(folder, exist_ok=True)
+
+    service = PipelineService(
+        data_folder='data/raw',
+        output_folder='data/docs',
+        storage_extension='.' + os.environ.get('ETL_STORAGE_FORMAT', 'parquet').lower().lstrip('.'),
+        excel_engine=os.environ.get('ETL_EXCEL_ENGINE', 'auto'),
+        max_workers=int(os.environ.get('ETL_MAX_WORKERS') or 0) or None,
+        chunk_size=int(os.environ.get('ETL_MOCK_CHUNK_SIZE') or 0) or None,
+        export_csv=os.environ.get('ETL_EXPORT_CSV', '').lower() in ('1', 'true', 'sim'),
+        plotlyjs=os.environ.get('DASHBOARD_PLOTLYJS', 'asset'),
+        ipca_refresh_seconds=int(os.environ.get('ETL_IPCA_REFRESH_SECONDS') or 24 * 60 * 60),
+        dashboard_mode=os.environ.get('DASHBOARD_MODE', 'static'),
+        column_mapping=load_column_mapping(os.environ.get('ETL_COLUMN_MAPPING_FILE')),
+        price_index_files=dict(
+            item.split('=', 1) for item in os.environ.get('ETL_PRICE_INDEX_FILES', '').split(',') if '=' in item
+        ),
+        scenarios_file=os.environ.get('ETL_SCENARIOS_FILE'),
+        database_file=os.environ.get('ETL_DATABASE_FILE'),
+        max_pet_shops=int(os.environ.get('DASHBOARD_MAX_PET_SHOPS') or DRILLDOWN_MAX_PET_SHOPS),
+    )
+    service.start(
+        watch=os.environ.get('ETL_WATCH', '1').lower() in ('1', 'true', 'sim'),
+        poll_seconds=float(os.environ.get('ETL_WATCH_INTERVAL') or 2),
+    )
+    serve(service, host=os.environ.get('ETL_SERVICE_HOST', '127.0.0.1'), port=int(os.environ.get('ETL_SERVICE_PORT') or 8765))
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,136 +1,342 @@
 import os
 import glob
 import logging
-import pandas as pd
 import sys
 import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 
 from .etl_runner import process_ipca_data
 from .etl_runner import generate_mock_sales_data
 from .etl_runner import run_etl_pipeline
+from .etl_runner import process_price_index_files
+from .manifest import load_manifest, save_manifest, stage_is_current, record_stage
+from .dashboard_renderer import render_dashboard_html, plotlyjs_asset_name
+from .dashboard_renderer import build_drilldown_payload, render_drilldown_html, DRILLDOWN_MAX_PET_SHOPS
+from .rollups import build_sales_rollups, read_rollups, rollup_paths, rollups_from_sales_table
+from .scenarios import generate_scenario_sales_data
+from .validation import load_column_mapping
+from .database import load_sales_database, rollups_from_database
+from .schema import SCENARIO_ROLLUP_SCHEMA
+from .storage import read_table
+from .instrumentation import RunMetrics
+from .scheduler import Stage, run_stages
 
 # Configura o sistema de logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', stream=sys.stdout)
 logger = logging.getLogger(__name__)
 
-def main():
+# Url para o arquivo zip com a planilha do IPCA
+IPCA_ZIP_FILE_URL = "https://ftp.ibge.gov.br/Precos_Indices_de_Precos_ao_Consumidor/IPCA/Serie_Historica/ipca_SerieHist.zip"
+
+# Intervalo fechado de anos dos dados de inflação usados nas vendas fictícias
+INFLATION_YEARS = [2020, 2024]
+
+# Modos do dashboard: gráficos fixos ou filtros recalculados no navegador
+DASHBOARD_MODES = ('static', 'interactive')
+
+def inflation_file_name(storage_extension: str) -> str:
+    """Nome do arquivo com os dados de inflação de INFLATION_YEARS. exemplo: inflacao_2020_2024.parquet"""
+    return f"inflacao_{INFLATION_YEARS[0]}_{INFLATION_YEARS[1]}{storage_extension}"
+
+def main(metrics: RunMetrics = None):
     """
     Função principal para orquestrar a execução do pipeline de dados.
+
+    Os passos formam um grafo de etapas (veja scheduler.run_stages): a obtenção do IPCA e o ETL
+    das planilhas rodam ao mesmo tempo, e as etapas que dependem dos dois começam quando ambos terminam.
+
+    Args:
+        metrics (RunMetrics): Coletor das métricas de cada etapa. Se não for informado, as
+            métricas são coletadas apenas para o log.
+
+    Returns:
+        str: O caminho das vendas fictícias, ou None se alguma etapa falhou.
     """
+    if metrics is None:
+        metrics = RunMetrics()
+
     # Define as constantes e caminhos dos arquivos
     DATA_FOLDER = 'data/raw'
     OUTPUT_FOLDER = 'data/docs'
     OUTPUT_MOCK_FOLDER = 'data/docs'
+    ROLLUP_FOLDER = os.path.join(OUTPUT_FOLDER, 'rollups')
 
-    # Define a url para o arquivo zip com a planilha do IPCA
-    IPCA_ZIP_FILE_URL = "https://ftp.ibge.gov.br/Precos_Indices_de_Precos_ao_Consumidor/IPCA/Serie_Historica/ipca_SerieHist.zip"
-    
-    # --- Passo 1: Verifica se o arquivo final já existe e retorna o caminho ---
-    target_dir = os.path.join('data', 'raw')
-    found_csv_files = glob.glob(os.path.join(target_dir, f"vendas_ficticias*.csv"))
-    
-    if found_csv_files:
-        logger.info(f"✅ O arquivo de vendas '{found_csv_files[0]}' já existe.")
-        return found_csv_files[0]
-    
-    # Se o arquivo não existe, inicia o processo de geração
-    
-    # 2. Obtém os dados de inflação do IBGE
-    logger.info("--- Passo 2: Obtendo dados de inflação do IBGE ---")
-    years_closed_interval = [2020, 2024]
-    inflacao_file_name = 'inflacao_2020_2024.csv'
+    # Formato dos arquivos intermediários (parquet, feather ou csv) e exportação opcional em csv
+    STORAGE_EXTENSION = '.' + os.environ.get('ETL_STORAGE_FORMAT', 'parquet').lower().lstrip('.')
+    EXPORT_CSV = os.environ.get('ETL_EXPORT_CSV', '').lower() in ('1', 'true', 'sim')
 
-    try:
-        process_ipca_data(IPCA_ZIP_FILE_URL, years_closed_interval, inflacao_file_name, OUTPUT_MOCK_FOLDER)
+    # Tamanho dos blocos na geração das vendas fictícias (vazio ou 0 = tudo em memória)
+    MOCK_CHUNK_SIZE = int(os.environ.get('ETL_MOCK_CHUNK_SIZE') or 0) or None
+
+    # Manifesto com as impressões digitais das entradas de cada etapa (execução incremental)
+    MANIFEST_PATH = os.path.join(OUTPUT_FOLDER, '.etl_manifest.json')
+
+    # Quantidade de processos para ler as planilhas em paralelo (vazio ou 0 = sequencial)
+    ETL_MAX_WORKERS = int(os.environ.get('ETL_MAX_WORKERS') or 0) or None
+
+    # Motor de leitura das planilhas (pandas, openpyxl, calamine ou auto)
+    ETL_EXCEL_ENGINE = os.environ.get('ETL_EXCEL_ENGINE', 'auto')
+
+    # Arquivo json com os aliases das colunas das planilhas de vendas (vazio = validation.DEFAULT_COLUMN_MAPPING)
+    ETL_COLUMN_MAPPING_FILE = os.environ.get('ETL_COLUMN_MAPPING_FILE')
+    column_mapping = load_column_mapping(ETL_COLUMN_MAPPING_FILE)
+
+    # Outros índices de preços carregados na base a partir de arquivos locais, no formato
+    # 'INDICE=arquivo', separados por vírgula. exemplo: INPC=data/docs/inpc_202508SerieHist.xls
+    ETL_PRICE_INDEX_FILES = dict(
+        item.split('=', 1) for item in os.environ.get('ETL_PRICE_INDEX_FILES', '').split(',') if '=' in item
+    )
+
+    # Arquivo json com os cenários de inflação projetados no passo 7 (vazio = sem projeções)
+    ETL_SCENARIOS_FILE = os.environ.get('ETL_SCENARIOS_FILE')
+
+    # Banco de dados SQLite carregado com as vendas fictícias (vazio = sem banco de dados)
+    ETL_DATABASE_FILE = os.environ.get('ETL_DATABASE_FILE')
+
+    # Quantidade de etapas independentes executadas ao mesmo tempo (vazio ou 0 = todas as prontas)
+    ETL_STAGE_WORKERS = int(os.environ.get('ETL_STAGE_WORKERS') or 0) or None
+
+    # Repetições da obtenção do IPCA quando o IBGE falha
+    ETL_IPCA_RETRIES = int(os.environ.get('ETL_IPCA_RETRIES') or 2)
+
+    # --- Passo 1: Cada etapa consulta o manifesto e só é refeita se suas entradas mudaram ---
+    logger.info(f"--- Passo 1: Execução incremental com o manifesto '{MANIFEST_PATH}' ---")
+    inflacao_file_name = inflation_file_name(STORAGE_EXTENSION)
+    base_data_file = f'dados{STORAGE_EXTENSION}'
+    output_file = f'vendas_ficticias{STORAGE_EXTENSION}'
+    inflacao_path = os.path.join(OUTPUT_MOCK_FOLDER, inflacao_file_name)
+    price_index_file = f'indices_precos{STORAGE_EXTENSION}'
+    price_index_path = os.path.join(OUTPUT_MOCK_FOLDER, price_index_file)
+    mock_inputs = [os.path.join(OUTPUT_FOLDER, base_data_file), inflacao_path]
+
+    # 2. Obtém os dados de inflação do IBGE
+    def obter_ipca():
+        logger.info("--- Passo 2: Obtendo dados de inflação do IBGE ---")
+        process_ipca_data(IPCA_ZIP_FILE_URL, INFLATION_YEARS, inflacao_file_name, OUTPUT_MOCK_FOLDER, manifest_path=MANIFEST_PATH, price_index_file=price_index_file)
+        # process_ipca_data registra as falhas no log sem propagá-las
+        if not os.path.exists(inflacao_path):
+            raise FileNotFoundError(f"Os dados de inflação '{inflacao_path}' não foram gerados.")
         logger.info("process_ipca_data() executado.")
-    except Exception as e:
-        logger.error(f"❌ Falha no passo de obtenção de dados de inflação: {e}")
-        return None
 
     # 3. Executa o pipeline ETL para processar os arquivos Excel
-    logger.info("\n--- Passo 3: Executando o pipeline ETL para dados de vendas ---")
-    try:
-        output_file_name = "dados.csv"
-        run_etl_pipeline(DATA_FOLDER, output_file_name, OUTPUT_FOLDER)
+    def executar_etl():
+        logger.info("\n--- Passo 3: Executando o pipeline ETL para dados de vendas ---")
+        run_etl_pipeline(DATA_FOLDER, base_data_file, OUTPUT_FOLDER, max_workers=ETL_MAX_WORKERS, manifest_path=MANIFEST_PATH, excel_engine=ETL_EXCEL_ENGINE, column_mapping=column_mapping)
         logger.info("run_etl_pipeline() executado.")
-    except Exception as e:
-        logger.error(f"❌ Falha no passo de ETL de vendas: {e}")
-        return None
 
     # 4. Gera os dados de vendas fictícios com base na inflação
-    logger.info("\n--- Passo 4: Gerando dados de vendas fictícios ---")
-    base_data_file = 'dados.csv'
-    output_file = 'vendas_ficticias.csv'
-    try:
-        generate_mock_sales_data(OUTPUT_FOLDER, base_data_file, inflacao_file_name, output_file)
+    def gerar_vendas():
+        logger.info("\n--- Passo 4: Gerando dados de vendas fictícios ---")
+        generate_mock_sales_data(OUTPUT_FOLDER, base_data_file, inflacao_file_name, output_file, manifest_path=MANIFEST_PATH, export_csv=EXPORT_CSV, chunk_size=MOCK_CHUNK_SIZE)
         logger.info("generate_mock_sales_data() executado.")
-        return os.path.join(OUTPUT_FOLDER, output_file)
-    except Exception as e:
-        logger.error(f"❌ Falha no passo de geração de dados fictícios: {e}")
+
+    # 5. Atualiza as tabelas pré-agregadas usadas pelo dashboard
+    def agregar_vendas():
+        logger.info("\n--- Passo 5: Atualizando as tabelas pré-agregadas de vendas ---")
+        build_sales_rollups(OUTPUT_FOLDER, base_data_file, inflacao_file_name, ROLLUP_FOLDER, STORAGE_EXTENSION, manifest_path=MANIFEST_PATH, chunk_size=MOCK_CHUNK_SIZE)
+        logger.info("build_sales_rollups() executado.")
+
+    # Os passos 2 e 3 são independentes e rodam ao mesmo tempo; os seguintes dependem dos dois
+    workbooks = [path for path in glob.glob(os.path.join(DATA_FOLDER, '*.xlsx')) if not os.path.basename(path).startswith('~')]
+    ipca_inputs = glob.glob(os.path.join(OUTPUT_MOCK_FOLDER, "ipca_*.xls")) + [
+        os.path.join(OUTPUT_MOCK_FOLDER, '.ipca_cache', os.path.basename(IPCA_ZIP_FILE_URL))
+    ]
+    stages = [
+        Stage('ipca', obter_ipca, inputs=ipca_inputs, outputs=[inflacao_path, price_index_path],
+              description='obtenção de dados de inflação', retries=ETL_IPCA_RETRIES),
+        Stage('sales_etl', executar_etl, inputs=workbooks, outputs=[os.path.join(OUTPUT_FOLDER, base_data_file)],
+              description='ETL de vendas', skip_when_current=True, params={'mapeamento': column_mapping.digest[:12]}),
+        Stage('mock_sales', gerar_vendas, depends_on=['ipca', 'sales_etl'], inputs=mock_inputs,
+              outputs=[os.path.join(OUTPUT_FOLDER, output_file)], description='geração de dados fictícios',
+              skip_when_current=True),
+        Stage('rollups', agregar_vendas, depends_on=['ipca', 'sales_etl'], inputs=mock_inputs,
+              outputs=list(rollup_paths(ROLLUP_FOLDER, STORAGE_EXTENSION).values()),
+              description='agregação das vendas', skip_when_current=True),
+    ]
+
+    # 6. Carrega na base de índices os outros índices de preços, depois do IPCA, que grava a mesma base
+    if ETL_PRICE_INDEX_FILES:
+        def carregar_indices():
+            logger.info(f"\n--- Passo 6: Carregando os índices {list(ETL_PRICE_INDEX_FILES)} na base '{price_index_path}' ---")
+            process_price_index_files(ETL_PRICE_INDEX_FILES, price_index_path, manifest_path=MANIFEST_PATH)
+            logger.info("process_price_index_files() executado.")
+
+        stages.append(Stage(
+            'price_indices', carregar_indices, depends_on=['ipca'], inputs=list(ETL_PRICE_INDEX_FILES.values()),
+            outputs=[price_index_path], description='carga dos índices de preços',
+        ))
+
+    # 7. Projeta as vendas nos cenários de inflação, se houver um arquivo de cenários
+    if ETL_SCENARIOS_FILE:
+        scenario_output_file = f'vendas_cenarios{STORAGE_EXTENSION}'
+
+        def projetar_cenarios():
+            logger.info(f"\n--- Passo 7: Projetando as vendas nos cenários de '{ETL_SCENARIOS_FILE}' ---")
+            generate_scenario_sales_data(OUTPUT_FOLDER, base_data_file, inflacao_file_name, ETL_SCENARIOS_FILE, scenario_output_file, ROLLUP_FOLDER, manifest_path=MANIFEST_PATH, chunk_size=MOCK_CHUNK_SIZE)
+            logger.info("generate_scenario_sales_data() executado.")
+
+        stages.append(Stage(
+            'scenarios', projetar_cenarios, depends_on=['ipca', 'sales_etl'], inputs=mock_inputs + [ETL_SCENARIOS_FILE],
+            outputs=[os.path.join(OUTPUT_FOLDER, scenario_output_file), scenario_rollup_path(ROLLUP_FOLDER, STORAGE_EXTENSION)],
+            description='projeção dos cenários', skip_when_current=True,
+        ))
+
+    # 8. Carrega as vendas no banco de dados, se houver um configurado
+    if ETL_DATABASE_FILE:
+        def carregar_banco():
+            logger.info(f"\n--- Passo 8: Carregando as vendas no banco de dados '{ETL_DATABASE_FILE}' ---")
+            load_sales_database(OUTPUT_FOLDER, base_data_file, inflacao_file_name, output_file, ETL_DATABASE_FILE, manifest_path=MANIFEST_PATH)
+            logger.info("load_sales_database() executado.")
+
+        stages.append(Stage(
+            'database', carregar_banco, depends_on=['mock_sales'],
+            inputs=[os.path.join(OUTPUT_FOLDER, output_file)] + mock_inputs, outputs=[ETL_DATABASE_FILE],
+            description='carga do banco de dados', skip_when_current=True,
+        ))
+
+    results = run_stages(stages, metrics, max_workers=ETL_STAGE_WORKERS, manifest_path=MANIFEST_PATH)
+    if any(result not in ('ok', 'skipped') for result in results.values()):
         return None
+    return os.path.join(OUTPUT_FOLDER, output_file)
+
+def scenario_rollup_path(rollup_folder: str, file_extension: str) -> str:
+    """Caminho da tabela do volume mensal por cenário gravada por generate_scenario_sales_data."""
+    return os.path.join(rollup_folder, f"vendas_cenarios_por_mes{file_extension}")
 
-def generate_dashboard(csv_file_path: str):
+def generate_dashboard(csv_file_path: str, manifest_path: str = None, rollup_folder: str = None, plotlyjs: str = 'asset',
+                       database_path: str = None, mode: str = 'static', max_pet_shops: int = DRILLDOWN_MAX_PET_SHOPS):
     """
     Cria um dashboard interativo com os principais indicadores de vendas.
     Args:
-        csv_file_path (str): O caminho para o arquivo CSV com os dados de vendas.
+        csv_file_path (str): O caminho para o arquivo (.csv, .parquet ou .feather) com os dados de vendas.
+        manifest_path (str): Manifesto do modo incremental. Quando informado, o dashboard
+            só é regerado se os dados de vendas mudaram desde a última execução.
+        rollup_folder (str): A pasta com as tabelas pré-agregadas de build_sales_rollups, no mesmo
+            formato de csv_file_path. Sem ela, as agregações são calculadas a partir de csv_file_path.
+            Se a pasta tiver o volume mensal dos cenários de inflação, o dashboard inclui a comparação dos cenários.
+        plotlyjs (str): Como a página carrega o plotly.js, sem depender de internet nos modos
+            'inline' (embutido na página) e 'asset' (arquivo local em 'assets/'). 'cdn' usa o CDN do plotly.
+        database_path (str): Banco de dados carregado por load_sales_database. Quando informado, as
+            agregações de vendas são calculadas com consultas SQL no lugar das tabelas pré-agregadas.
+        mode (str): 'static' gera os gráficos dos 5 meses e dos 3 pet shops com maior volume;
+            'interactive' envia o volume por UF, pet shop e mês para a página, com filtros de UF,
+            ano e pet shop e o top N recalculados no navegador.
+        max_pet_shops (int): No modo 'interactive', quantidade máxima de pet shops enviados
+            individualmente; os demais são somados em 'Outros', limitando o tamanho da página.
     """
+    if mode not in DASHBOARD_MODES:
+        raise ValueError(f"Modo do dashboard inválido: '{mode}'. Use um de {DASHBOARD_MODES}.")
+
+    DASHBOARD_DESTINATION = os.path.dirname(csv_file_path)
+    dashboard_html_path = os.path.join(DASHBOARD_DESTINATION, "index.html")
+    dashboard_outputs = [dashboard_html_path]
+    if plotlyjs == 'asset':
+        dashboard_outputs.append(os.path.join(DASHBOARD_DESTINATION, 'assets', plotlyjs_asset_name()))
+    file_extension = os.path.splitext(csv_file_path)[1]
+    dashboard_params = {'plotlyjs': plotlyjs, 'mode': mode}
+    if mode == 'interactive':
+        dashboard_params['max_pet_shops'] = max_pet_shops
+
+    scenario_path = scenario_rollup_path(rollup_folder, file_extension) if rollup_folder else None
+    if scenario_path and not os.path.exists(scenario_path):
+        scenario_path = None
+
+    if database_path:
+        dashboard_inputs = [database_path]
+    elif rollup_folder:
+        dashboard_inputs = list(rollup_paths(rollup_folder, file_extension).values())
+    else:
+        dashboard_inputs = [csv_file_path]
+    if scenario_path:
+        dashboard_inputs.append(scenario_path)
+
+    if manifest_path:
+        manifest = load_manifest(manifest_path)
+        if stage_is_current(manifest, 'dashboard', dashboard_inputs, dashboard_outputs, dashboard_params):
+            logger.info(f"✅ O dashboard '{dashboard_html_path}' está atualizado.")
+            return
+
     try:
-        df = pd.read_csv(csv_file_path)
-        logger.info(f"Dados de vendas carregados de '{csv_file_path}'.")
-
-        # 1. Análise dos 5 meses com maior volume de vendas
-        # Cria uma coluna de data no formato 'AAAA-MM' para facilitar o agrupamento
-        df['ano_mes'] = df['ano'].astype(str) + '-' + df['mes'].str.upper().map({
-            'JAN': '01', 'FEV': '02', 'MAR': '03', 'ABR': '04', 'MAI': '05', 'JUN': '06',
-            'JUL': '07', 'AGO': '08', 'SET': '09', 'OUT': '10', 'NOV': '11', 'DEZ': '12'
-        })
-        
-        vendas_por_mes = df.groupby('ano_mes')['volume_vendas_(kg)'].sum().reset_index()
-        top_5_meses = vendas_por_mes.sort_values(by='volume_vendas_(kg)', ascending=False).head(5)
-
-        fig_meses = px.bar(
-            top_5_meses,
-            x='ano_mes',
-            y='volume_vendas_(kg)',
-            title='Top 5 Meses com Maior Volume de Vendas',
-            labels={'ano_mes': 'Mês (Ano)', 'volume_vendas_(kg)': 'Volume de Vendas (kg)'},
-            color_discrete_sequence=px.colors.qualitative.Plotly
-        )
-        fig_meses.update_layout(xaxis_title="Mês (Ano)", yaxis_title="Volume de Vendas (kg)")
-
-        # 2. Análise dos 3 petshops com maior volume de vendas
-        vendas_por_petshop = df.groupby('pet_shop')['volume_vendas_(kg)'].sum().reset_index()
-        top_3_petshops = vendas_por_petshop.sort_values(by='volume_vendas_(kg)', ascending=False).head(3)
-
-        fig_petshops = px.bar(
-            top_3_petshops,
-            x='pet_shop',
-            y='volume_vendas_(kg)',
-            title='Top 3 Pet Shops com Maior Volume de Vendas',
-            labels={'pet_shop': 'Pet Shop', 'volume_vendas_(kg)': 'Volume de Vendas (kg)'},
-            color_discrete_sequence=px.colors.qualitative.Plotly
-        )
-        fig_petshops.update_layout(xaxis_title="Pet Shop", yaxis_title="Volume de Vendas (kg)")
-        
-        DASHBOARD_DESTINATION = os.path.dirname(csv_file_path)
+        if database_path:
+            rollups = rollups_from_database(database_path)
+            logger.info(f"Agregações calculadas no banco de dados '{database_path}'.")
+        elif rollup_folder:
+            rollups = read_rollups(rollup_folder, file_extension)
+            logger.info(f"Tabelas pré-agregadas carregadas de '{rollup_folder}'.")
+        else:
+            rollups = rollups_from_sales_table(csv_file_path)
+            logger.info(f"Dados de vendas carregados de '{csv_file_path}'.")
 
-        # 3. Combinar os gráficos em um único dashboard HTML
-        dashboard_html_path = os.path.join(DASHBOARD_DESTINATION, "index.html")
+        # Comparação do volume mensal nos cenários de inflação (clicar na legenda oculta ou exibe um cenário)
+        scenario_figures = []
+        if scenario_path:
+            vendas_cenarios = read_table(scenario_path, SCENARIO_ROLLUP_SCHEMA).sort_values(by=['cenario', 'ano_mes'])
+            fig_cenarios = px.line(
+                vendas_cenarios,
+                x='ano_mes',
+                y='volume_vendas_(kg)',
+                color='cenario',
+                title='Volume Mensal de Vendas por Cenário de Inflação',
+                labels={'ano_mes': 'Mês (Ano)', 'volume_vendas_(kg)': 'Volume de Vendas (kg)', 'cenario': 'Cenário'},
+            )
+            fig_cenarios.update_layout(xaxis_title="Mês (Ano)", yaxis_title="Volume de Vendas (kg)")
+            scenario_figures.append(fig_cenarios)
 
-        
-        with open(dashboard_html_path, 'w', encoding='utf-8') as f:
-            f.write("<html><head><title>Dashboard de Vendas</title></head><body>")
-            f.write("<h1>Dashboard de Vendas da Empresa</h1>")
-            f.write(fig_meses.to_html(full_html=False, include_plotlyjs='cdn'))
-            f.write("<br>")
-            f.write(fig_petshops.to_html(full_html=False, include_plotlyjs='cdn'))
-            f.write("</body></html>")
+        if mode == 'interactive':
+            # Volume por UF, pet shop e mês em colunas compactas, filtrado e agregado no navegador
+            payload = build_drilldown_payload(rollups['vendas_por_uf_pet_shop_mes'], max_pet_shops=max_pet_shops)
+            render_drilldown_html(
+                payload,
+                dashboard_html_path,
+                title="Dashboard de Vendas",
+                heading="Dashboard de Vendas da Empresa",
+                plotlyjs=plotlyjs,
+                figures=scenario_figures,
+            )
+            logger.info(f"Dashboard interativo com {payload['rows']} linhas agregadas e {len(payload['pet_shops'])} pet shops.")
+        else:
+            # 1. Análise dos 5 meses com maior volume de vendas
+            vendas_por_mes = rollups['vendas_por_mes']
+            top_5_meses = vendas_por_mes.sort_values(by='volume_vendas_(kg)', ascending=False).head(5)
+
+            fig_meses = px.bar(
+                top_5_meses,
+                x='ano_mes',
+                y='volume_vendas_(kg)',
+                title='Top 5 Meses com Maior Volume de Vendas',
+                labels={'ano_mes': 'Mês (Ano)', 'volume_vendas_(kg)': 'Volume de Vendas (kg)'},
+                color_discrete_sequence=px.colors.qualitative.Plotly
+            )
+            fig_meses.update_layout(xaxis_title="Mês (Ano)", yaxis_title="Volume de Vendas (kg)")
+
+            # 2. Análise dos 3 petshops com maior volume de vendas
+            vendas_por_petshop = rollups['vendas_por_pet_shop']
+            top_3_petshops = vendas_por_petshop.sort_values(by='volume_vendas_(kg)', ascending=False).head(3)
+
+            fig_petshops = px.bar(
+                top_3_petshops,
+                x='pet_shop',
+                y='volume_vendas_(kg)',
+                title='Top 3 Pet Shops com Maior Volume de Vendas',
+                labels={'pet_shop': 'Pet Shop', 'volume_vendas_(kg)': 'Volume de Vendas (kg)'},
+                color_discrete_sequence=px.colors.qualitative.Plotly
+            )
+            fig_petshops.update_layout(xaxis_title="Pet Shop", yaxis_title="Volume de Vendas (kg)")
+
+            # 3. Combinar os gráficos em um único dashboard HTML, com o plotly.js incluído uma única vez
+            render_dashboard_html(
+                [fig_meses, fig_petshops] + scenario_figures,
+                dashboard_html_path,
+                title="Dashboard de Vendas",
+                heading="Dashboard de Vendas da Empresa",
+                plotlyjs=plotlyjs,
+            )
         
         logger.info(f"\n✅ Dashboard gerado e salvo em '{dashboard_html_path}'.")
 
+        if manifest_path:
+            record_stage(manifest, 'dashboard', dashboard_inputs, dashboard_outputs, dashboard_params)
+            save_manifest(manifest, manifest_path)
+
     except Exception as e:
         logger.error(f"Erro ao gerar o dashboard: {e}")
 
@@ -144,10 +350,34 @@ if __name__ == '__main__':
         os.makedirs('data/docs')
         logger.info("Diretório 'data/docs' criado.")
 
-    csv_file = main()
+    # Métricas por etapa, com perfil do cProfile opcional (ex: ETL_PROFILE_STAGES=sales_etl,mock_sales)
+    METRICS_FOLDER = os.path.join('data/docs', '.metrics')
+    metrics = RunMetrics(
+        profile_stages=[stage for stage in os.environ.get('ETL_PROFILE_STAGES', '').split(',') if stage],
+        profile_dir=METRICS_FOLDER,
+        trace_memory=os.environ.get('ETL_TRACE_MEMORY', '').lower() in ('1', 'true', 'sim'),
+    )
+
+    csv_file = main(metrics)
     
     if csv_file:
         logger.info("\n--- Os dados de vendas foram localizados ---")
-        generate_dashboard(csv_file)
+        rollup_folder = os.path.join('data/docs', 'rollups')
+        rollup_files = list(rollup_paths(rollup_folder, os.path.splitext(csv_file)[1]).values())
+        if os.environ.get('ETL_SCENARIOS_FILE'):
+            rollup_files.append(scenario_rollup_path(rollup_folder, os.path.splitext(csv_file)[1]))
+        database_file = os.environ.get('ETL_DATABASE_FILE')
+        with metrics.stage('dashboard', inputs=[database_file] if database_file else rollup_files, outputs=[os.path.join('data/docs', 'index.html')]):
+            generate_dashboard(
+                csv_file,
+                manifest_path=os.path.join('data/docs', '.etl_manifest.json'),
+                rollup_folder=rollup_folder,
+                plotlyjs=os.environ.get('DASHBOARD_PLOTLYJS', 'asset'),
+                database_path=database_file,
+                mode=os.environ.get('DASHBOARD_MODE', 'static'),
+                max_pet_shops=int(os.environ.get('DASHBOARD_MAX_PET_SHOPS') or DRILLDOWN_MAX_PET_SHOPS),
+            )
     else:
-        logger.info("\n🛑 Falha ao gerar dados de vendas.")
\ No newline at end of file
+        logger.info("\n🛑 Falha ao gerar dados de vendas.")
+
+    metrics.save(os.path.join(METRICS_FOLDER, 'etl_metrics.jsonl'))
\ No newline at end of file
@@ -0,0 +1,303 @@
+import os
+import logging
+import numpy as np
+import pandas as pd
+
+from .schema import apply_schema, INTEGRAL_CSV_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# Formatos suportados, identificados pela extensão do arquivo
+STORAGE_FORMATS = {
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.feather': 'feather',
+}
+
+def storage_format(path: str) -> str:
+    """
+    Retorna o formato de armazenamento a partir da extensão do arquivo.
+
+    Args:
+        path (str): O caminho do arquivo. exemplo: data/docs/dados.parquet
+
+    Returns:
+        str: 'csv', 'parquet' ou 'feather'.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in STORAGE_FORMATS:
+        raise ValueError(f"Formato de arquivo não suportado: '{extension}'. Use um de {list(STORAGE_FORMATS)}.")
+    return STORAGE_FORMATS[extension]
+
+def with_extension(path: str, extension: str) -> str:
+    """Troca a extensão do arquivo. exemplo: with_extension('dados.csv', '.parquet') -> 'dados.parquet'"""
+    return os.path.splitext(path)[0] + extension
+
+def csv_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Prepara o DataFrame para o csv: os valores inteiros das colunas de INTEGRAL_CSV_COLUMNS em
+    float são escritos sem o '.0' (150.5 continua 150.5). A decisão é por valor, então um
+    arquivo gravado em blocos sai igual ao gravado de uma vez.
+    """
+    changes = {}
+    for col in INTEGRAL_CSV_COLUMNS:
+        if col not in df.columns or not pd.api.types.is_float_dtype(df[col].dtype):
+            continue
+        values = df[col].to_numpy(dtype='float64', na_value=np.nan)
+        # Acima de 2**53 nem todo inteiro cabe em um float64; esses valores mantêm o formato do float
+        integral = np.isfinite(values) & (values == np.trunc(values)) & (np.abs(values) < 2 ** 53)
+        text = np.where(integral, np.where(integral, values, 0).astype('int64').astype(str), values.astype(str))
+        changes[col] = pd.Series(text, index=df.index, dtype=object).where(~np.isnan(values), None)
+    return df.assign(**changes) if changes else df
+
+def write_table(df: pd.DataFrame, path: str, schema: dict = None, export_csv: bool = False):
+    """
+    Grava o DataFrame no formato indicado pela extensão do arquivo.
+
+    Args:
+        df (pd.DataFrame): Os dados a serem gravados.
+        path (str): O caminho do arquivo de saída (.csv, .parquet ou .feather).
+        schema (dict): Esquema aplicado antes da gravação. exemplo: MOCK_SALES_SCHEMA
+        export_csv (bool): Grava também uma cópia em csv ao lado do arquivo colunar.
+    """
+    file_format = storage_format(path)
+    df = apply_schema(df, schema)
+
+    if file_format == 'parquet':
+        df.to_parquet(path, index=False)
+    elif file_format == 'feather':
+        df.reset_index(drop=True).to_feather(path)
+    else:
+        csv_frame(df).to_csv(path, index=False)
+
+    if export_csv and file_format != 'csv':
+        csv_path = with_extension(path, '.csv')
+        csv_frame(df).to_csv(csv_path, index=False)
+        logger.info(f"Cópia em csv exportada para '{csv_path}'.")
+
+def read_table(path: str, schema: dict = None, columns: list = None) -> pd.DataFrame:
+    """
+    Lê uma tabela gravada por write_table.
+
+    Args:
+        path (str): O caminho do arquivo (.csv, .parquet ou .feather).
+        schema (dict): Esquema aplicado na leitura. No csv os tipos são passados direto ao parser.
+        columns (list): Lê apenas as colunas informadas.
+
+    Returns:
+        pd.DataFrame: Os dados lidos.
+    """
+    file_format = storage_format(path)
+
+    if file_format == 'parquet':
+        df = pd.read_parquet(path, columns=columns)
+    elif file_format == 'feather':
+        df = pd.read_feather(path, columns=columns)
+    else:
+        dtype = {col: dtype for col, dtype in (schema or {}).items() if columns is None or col in columns}
+        return pd.read_csv(path, usecols=columns, dtype=dtype or None)
+
+    return apply_schema(df, schema)
+
+def iter_table(path: str, schema: dict = None, columns: list = None, batch_size: int = 100_000):
+    """
+    Lê uma tabela gravada por write_table em blocos, sem carregá-la inteira em memória.
+
+    Args:
+        path (str): O caminho do arquivo (.csv, .parquet ou .feather).
+        schema (dict): Esquema aplicado a cada bloco.
+        columns (list): Lê apenas as colunas informadas.
+        batch_size (int): Quantidade máxima de linhas por bloco.
+
+    Yields:
+        pd.DataFrame: Os blocos da tabela, na ordem do arquivo.
+    """
+    file_format = storage_format(path)
+
+    if file_format == 'parquet':
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=columns):
+            yield apply_schema(batch.to_pandas(), schema)
+    elif file_format == 'feather':
+        import pyarrow as pa
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                if columns is not None:
+                    batch = batch.select(columns)
+                for offset in range(0, batch.num_rows, batch_size):
+                    yield apply_schema(batch.slice(offset, batch_size).to_pandas(), schema)
+    else:
+        dtype = {col: dtype for col, dtype in (schema or {}).items() if columns is None or col in columns}
+        yield from pd.read_csv(path, usecols=columns, dtype=dtype or None, chunksize=batch_size)
+
+def count_rows(path: str) -> int:
+    """
+    Conta as linhas de uma tabela sem carregá-la no pandas. No parquet e no feather a contagem
+    vem dos metadados; no csv são contadas as quebras de linha, descontando o cabeçalho.
+
+    Returns:
+        int: A quantidade de linhas, ou None se o arquivo não for uma tabela suportada.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.parquet':
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).metadata.num_rows
+    if extension == '.feather':
+        import pyarrow as pa
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_file(source)
+            return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+    if extension == '.csv':
+        with open(path, 'rb') as f:
+            lines = sum(chunk.count(b'\n') for chunk in iter(lambda: f.read(1024 * 1024), b''))
+        return max(lines - 1, 0)
+    return None
+
+class TableWriter:
+    """
+    Grava uma tabela em blocos, sem manter todos os dados em memória.
+
+    Cada bloco é anexado ao arquivo assim que recebido: no csv como texto, no parquet como um
+    row group e no feather como um record batch do formato de arquivo IPC do Arrow. No feather
+    o dicionário de cada coluna categórica só pode crescer entre os blocos, então as categorias
+    novas de um bloco são acrescentadas ao fim das já gravadas e gravadas como um delta.
+
+    No parquet e no feather, o tipo de cada coluna é o do primeiro bloco. Se um bloco seguinte
+    não cabe nele (por exemplo, volumes com casas decimais depois de um bloco só com inteiros),
+    o esquema é promovido (pa.unify_schemas) e o que já foi gravado é copiado uma vez, bloco a
+    bloco, para um novo arquivo com o esquema promovido.
+
+    Exemplo:
+        with TableWriter('data/docs/dados.parquet', SALES_BASE_SCHEMA) as writer:
+            writer.write(df_bloco)
+    """
+
+    def __init__(self, path: str, schema: dict = None):
+        self.path = path
+        self.schema = schema
+        self.format = storage_format(path)
+        self.rows_written = 0
+        self._writer = None
+        self._sink = None
+        self._schema = None
+        self._writer_path = path
+        self._promotions = 0
+        self._categories = {}
+
+    def write(self, df: pd.DataFrame):
+        """Anexa um bloco de dados à tabela."""
+        df = apply_schema(df, self.schema)
+
+        if self.format == 'csv':
+            csv_frame(df).to_csv(self.path, mode='w' if self.rows_written == 0 else 'a', header=self.rows_written == 0, index=False)
+        else:
+            import pyarrow as pa
+
+            if self.format == 'feather':
+                df = self._extend_categories(df)
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._open_writer(self.path, self._writer_schema(table.schema))
+            # No parquet as categorias podem variar entre blocos; o dicionário é reescrito por bloco
+            try:
+                table = table.cast(self._schema)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                self._promote_schema(table.schema)
+                table = table.cast(self._schema)
+            self._writer.write_table(table)
+
+        self.rows_written += len(df)
+
+    def _extend_categories(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Põe as categorias de cada coluna categórica na ordem acumulada dos blocos anteriores."""
+        changes = {}
+        for col in df.columns:
+            if not isinstance(df[col].dtype, pd.CategoricalDtype):
+                continue
+            categories = df[col].cat.categories
+            known = self._categories.get(col)
+            if known is not None:
+                categories = known.append(categories.difference(known, sort=False))
+                changes[col] = df[col].cat.set_categories(categories)
+            self._categories[col] = categories
+        return df.assign(**changes) if changes else df
+
+    def _writer_schema(self, schema):
+        """Esquema do arquivo. No feather os índices dos dicionários são int32, para comportar o crescimento."""
+        import pyarrow as pa
+
+        if self.format != 'feather':
+            return schema
+        for i, field in enumerate(schema):
+            if pa.types.is_dictionary(field.type):
+                schema = schema.set(i, field.with_type(pa.dictionary(pa.int32(), field.type.value_type, field.type.ordered)))
+        return schema
+
+    def _open_writer(self, path: str, schema):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._writer_path = path
+        self._schema = schema
+        if self.format == 'parquet':
+            self._writer = pq.ParquetWriter(path, schema)
+        else:
+            # Mesma compressão padrão do DataFrame.to_feather
+            compression = 'lz4' if pa.Codec.is_available('lz4') else None
+            options = pa.ipc.IpcWriteOptions(compression=compression, emit_dictionary_deltas=True)
+            self._sink = pa.OSFile(path, 'wb')
+            self._writer = pa.ipc.new_file(self._sink, schema, options=options)
+
+    def _close_writer(self):
+        self._writer.close()
+        self._writer = None
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+
+    def _written_batches(self, path: str):
+        """Os blocos já gravados no arquivo, como tabelas do Arrow."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self.format == 'parquet':
+            for batch in pq.ParquetFile(path).iter_batches():
+                yield pa.Table.from_batches([batch])
+        else:
+            with pa.memory_map(path) as source:
+                reader = pa.ipc.open_file(source)
+                for i in range(reader.num_record_batches):
+                    yield pa.Table.from_batches([reader.get_batch(i)])
+
+    def _promote_schema(self, schema):
+        """Troca o esquema do arquivo em gravação por um que comporte também schema."""
+        import pyarrow as pa
+
+        promoted = pa.unify_schemas([self._schema, schema], promote_options='permissive')
+        promoted = self._writer_schema(promoted.with_metadata(schema.metadata))
+        logger.info(f"Esquema de '{self.path}' promovido para comportar um novo bloco: {promoted.types}")
+
+        self._close_writer()
+        written_path = self._writer_path
+        self._promotions += 1
+        self._open_writer(f"{self.path}.{self._promotions}.tmp", promoted)
+        for table in self._written_batches(written_path):
+            self._writer.write_table(table.cast(promoted))
+        if written_path != self.path:
+            os.remove(written_path)
+
+    def close(self):
+        """Finaliza a gravação da tabela."""
+        if self._writer is not None:
+            self._close_writer()
+            if self._writer_path != self.path:
+                os.replace(self._writer_path, self.path)
+                self._writer_path = self.path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
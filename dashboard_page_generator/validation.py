@@ -0,0 +1,322 @@
+"""
+Mapeamento das colunas das planilhas de vendas e validação das linhas.
+
+As planilhas regionais não seguem exatamente o mesmo layout: o cabeçalho pode vir como
+'Estado' em vez de 'UF', ou a coluna de compras pode se referir a outro mês. O mapeamento
+declara, para cada coluna usada pelo pipeline, os nomes aceitos no cabeçalho (aliases, com
+curingas do fnmatch) e o tipo de validação. Ele pode ser estendido por um arquivo json, no
+mesmo formato de DEFAULT_COLUMN_MAPPING, informado na variável de ambiente ETL_COLUMN_MAPPING_FILE:
+
+    {
+        "uf": {"aliases": ["uf", "estado", "unidade_federativa"]},
+        "compra_maio_2023_(kg)": {"aliases": ["compra_*_(kg)", "volume_(kg)"]}
+    }
+
+As colunas do arquivo substituem as do mapeamento padrão; as demais continuam como estão.
+
+Por padrão são rejeitadas apenas as linhas com algum valor vazio, como no dropna() original,
+e as quantidades que não são números. Verificações mais rígidas são ligadas por coluna no
+arquivo de mapeamento, com a lista 'regras' (veja VALIDATION_RULES):
+
+    {
+        "uf": {"regras": ["sigla_uf"]},
+        "id": {"regras": ["unico"]},
+        "compra_maio_2023_(kg)": {"regras": ["nao_negativo"]}
+    }
+
+A validação é feita com máscaras booleanas sobre as colunas inteiras, uma por motivo de
+rejeição, e o relatório de cada planilha traz a contagem de linhas rejeitadas por motivo e
+os números das primeiras linhas (como aparecem no Excel) de cada motivo.
+"""
+import os
+import json
+import fnmatch
+import hashlib
+import logging
+import unicodedata
+import numpy as np
+import pandas as pd
+
+from .excel_reader import normalize_header
+
+logger = logging.getLogger(__name__)
+
+# Colunas do pipeline -> nomes aceitos no cabeçalho e tipo da coluna. Os aliases são
+# comparados com o cabeçalho normalizado e sem acentos, na ordem da lista; os nomes exatos
+# têm prioridade sobre os curingas. Tipos:
+#   'texto'      - valor obrigatório
+#   'quantidade' - número obrigatório, gravado como float64
+DEFAULT_COLUMN_MAPPING = {
+    'uf': {
+        'aliases': ['uf', 'sigla_uf', 'uf_loja', 'estado'],
+        'tipo': 'texto',
+    },
+    'id': {
+        'aliases': ['id', 'id_loja', 'codigo', 'codigo_loja', 'cod_loja'],
+        'tipo': 'texto',
+    },
+    'pet_shop': {
+        'aliases': ['pet_shop', 'petshop', 'nome_pet_shop', 'nome_loja', 'loja'],
+        'tipo': 'texto',
+    },
+    'compra_maio_2023_(kg)': {
+        'aliases': ['compra_maio_2023_(kg)', 'compra_*_(kg)', 'compras_*_(kg)', 'compra_*_kg', 'compra_(kg)'],
+        'tipo': 'quantidade',
+    },
+}
+
+VALIDATION_TYPES = ('texto', 'quantidade')
+
+# Regras opcionais de cada coluna ('regras' no mapeamento) -> tipos de coluna em que valem:
+#   'nao_branco'   - rejeita textos só com espaços
+#   'sigla_uf'     - rejeita o que não for uma sigla de duas letras
+#   'nao_negativo' - rejeita quantidades negativas
+#   'unico'        - rejeita as repetições do valor na mesma planilha (fica a primeira ocorrência)
+VALIDATION_RULES = {
+    'nao_branco': ('texto',),
+    'sigla_uf': ('texto',),
+    'nao_negativo': ('quantidade',),
+    'unico': VALIDATION_TYPES,
+}
+
+# Quantidade de números de linha guardados no relatório para cada motivo de rejeição
+REJECTION_SAMPLE_SIZE = 20
+
+# Relatório de rejeições gravado na pasta de saída do ETL
+REJECTION_REPORT_FILE = 'relatorio_rejeicoes.json'
+
+def header_key(name) -> str:
+    """Chave de comparação do cabeçalho: normalizado, sem acentos e sem '_' repetidos. exemplo: 'Código  Loja' -> 'codigo_loja'"""
+    key = unicodedata.normalize('NFKD', normalize_header(name))
+    key = ''.join(char for char in key if not unicodedata.combining(char))
+    while '__' in key:
+        key = key.replace('__', '_')
+    return key
+
+class ColumnMapping:
+    """
+    Localiza as colunas do pipeline no cabeçalho de uma planilha pelos aliases do mapeamento.
+
+    Args:
+        columns (dict): Coluna do pipeline -> {'aliases': [...], 'tipo': ..., 'regras': [...]},
+            no formato de DEFAULT_COLUMN_MAPPING.
+    """
+
+    def __init__(self, columns: dict = None):
+        columns = DEFAULT_COLUMN_MAPPING if columns is None else columns
+        self.columns = {}
+        for name, spec in columns.items():
+            aliases = [header_key(alias) for alias in spec.get('aliases') or [name]]
+            validation = spec.get('tipo', 'texto')
+            if validation not in VALIDATION_TYPES:
+                raise ValueError(f"Tipo de validação inválido para a coluna '{name}': '{validation}'. Use um de {VALIDATION_TYPES}.")
+            rules = list(spec.get('regras') or [])
+            invalid = [rule for rule in rules if validation not in VALIDATION_RULES.get(rule, ())]
+            if invalid:
+                valid = [rule for rule, types in VALIDATION_RULES.items() if validation in types]
+                raise ValueError(f"Regras inválidas para a coluna '{name}' do tipo '{validation}': {invalid}. Use as de {valid}.")
+            self.columns[name] = {'aliases': aliases, 'tipo': validation, 'regras': rules}
+
+    @property
+    def names(self) -> list:
+        """As colunas do pipeline, na ordem do mapeamento."""
+        return list(self.columns)
+
+    @property
+    def digest(self) -> str:
+        """Hash do mapeamento, para identificar os resultados gerados com ele."""
+        return hashlib.sha256(json.dumps(self.columns, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def accepts(self, name) -> bool:
+        """Indica se o nome do cabeçalho corresponde a algum alias do mapeamento."""
+        key = header_key(name)
+        return any(fnmatch.fnmatchcase(key, alias) for spec in self.columns.values() for alias in spec['aliases'])
+
+    def resolve(self, header: list) -> dict:
+        """
+        Retorna a posição de cada coluna do pipeline no cabeçalho.
+
+        Para cada coluna, os aliases são testados na ordem do mapeamento, os nomes exatos antes
+        dos curingas; uma mesma coluna da planilha não é usada para duas colunas do pipeline.
+
+        Raises:
+            KeyError: Se alguma coluna do mapeamento não for encontrada no cabeçalho.
+        """
+        keys = [header_key(name) if name is not None else None for name in header]
+        positions = {}
+        used = set()
+        for name, spec in self.columns.items():
+            exact = [alias for alias in spec['aliases'] if not any(char in alias for char in '*?[')]
+            patterns = [alias for alias in spec['aliases'] if alias not in exact]
+            candidates = [position for alias in exact for position, key in enumerate(keys) if key == alias]
+            candidates += [
+                position for alias in patterns for position, key in enumerate(keys)
+                if key is not None and fnmatch.fnmatchcase(key, alias)
+            ]
+            position = next((position for position in candidates if position not in used), None)
+            if position is not None:
+                positions[name] = position
+                used.add(position)
+
+        missing = [name for name in self.columns if name not in positions]
+        if missing:
+            raise KeyError(
+                f"Colunas ausentes na planilha: {missing}. Cabeçalho encontrado: {[name for name in header if name is not None]}. "
+                f"Nomes aceitos: { {name: self.columns[name]['aliases'] for name in missing} }"
+            )
+        return positions
+
+def load_column_mapping(mapping_file: str = None) -> ColumnMapping:
+    """
+    Monta o mapeamento de colunas, aplicando o arquivo json sobre DEFAULT_COLUMN_MAPPING.
+
+    Args:
+        mapping_file (str): O caminho do arquivo json. Sem arquivo, usa o mapeamento padrão.
+
+    Returns:
+        ColumnMapping: O mapeamento pronto para uso.
+    """
+    columns = dict(DEFAULT_COLUMN_MAPPING)
+    if mapping_file:
+        with open(mapping_file, 'r', encoding='utf-8') as f:
+            overrides = json.load(f)
+        unknown = [name for name in overrides if name not in columns]
+        if unknown:
+            raise ValueError(f"Colunas desconhecidas no mapeamento '{mapping_file}': {unknown}. Use as colunas de {list(columns)}.")
+        for name, spec in overrides.items():
+            columns[name] = {**columns[name], **spec}
+        logger.info(f"Mapeamento de colunas carregado de '{mapping_file}'.")
+    return ColumnMapping(columns)
+
+def rejection_masks(df: pd.DataFrame, mapping: ColumnMapping) -> dict:
+    """
+    Calcula uma máscara booleana por motivo de rejeição, sobre as colunas inteiras.
+
+    Args:
+        df (pd.DataFrame): A planilha com as colunas já renomeadas para as do mapeamento.
+        mapping (ColumnMapping): O mapeamento com a validação de cada coluna.
+
+    Returns:
+        dict: Motivo -> máscara (np.ndarray de bool). exemplo: {'uf_vazio': ..., 'uf_invalida': ...}
+    """
+    masks = {}
+    for name, spec in mapping.columns.items():
+        values = df[name]
+        rules = spec['regras']
+        # Vazio é o mesmo critério do dropna(): célula sem valor
+        empty = values.isna().to_numpy()
+        masks[f'{name}_vazio'] = empty
+        if spec['tipo'] == 'quantidade':
+            numbers = pd.to_numeric(values, errors='coerce')
+            masks[f'{name}_nao_numerico'] = numbers.isna().to_numpy() & ~empty
+            if 'nao_negativo' in rules:
+                masks[f'{name}_negativo'] = (numbers < 0).fillna(False).to_numpy(dtype=bool)
+        elif 'nao_branco' in rules or 'sigla_uf' in rules:
+            text = values.astype('string').str.strip()
+            if 'nao_branco' in rules:
+                masks[f'{name}_branco'] = (text == '').fillna(False).to_numpy(dtype=bool)
+            if 'sigla_uf' in rules:
+                masks[f'{name}_invalida'] = ~text.str.fullmatch(r'[A-Za-z]{2}').fillna(False).to_numpy(dtype=bool) & ~empty
+
+        if 'unico' in rules:
+            # Só as linhas com valor conferem a repetição; as vazias já foram rejeitadas acima
+            masks[f'{name}_duplicado'] = values.duplicated(keep='first').to_numpy() & ~empty
+    return masks
+
+def validate_sales_data(df: pd.DataFrame, mapping: ColumnMapping, file_name: str = None) -> tuple:
+    """
+    Renomeia as colunas da planilha pelo mapeamento e separa as linhas válidas das rejeitadas.
+
+    Args:
+        df (pd.DataFrame): A planilha lida. As colunas podem estar com os nomes originais
+            (leitura com o pandas) ou já com os nomes do mapeamento (leitura com read_excel_columns).
+        mapping (ColumnMapping): O mapeamento das colunas.
+        file_name (str): O nome da planilha, usado no relatório.
+
+    Returns:
+        tuple: As linhas válidas (pd.DataFrame, com as colunas na ordem do mapeamento) e o
+            relatório da planilha (dict) com as contagens e os motivos das rejeições.
+    """
+    source_columns = df.attrs.get('source_columns')
+    if source_columns is None:
+        positions = mapping.resolve(list(df.columns))
+        source_columns = {name: str(df.columns[position]) for name, position in positions.items()}
+        df = pd.DataFrame({name: df.iloc[:, position] for name, position in positions.items()})
+    else:
+        df = df[mapping.names]
+
+    masks = rejection_masks(df, mapping)
+    rejected = np.logical_or.reduce(list(masks.values())) if masks else np.zeros(len(df), dtype=bool)
+
+    # Número da linha no Excel: o cabeçalho ocupa a linha 1
+    excel_rows = np.arange(len(df)) + 2
+    report = {
+        'arquivo': file_name,
+        'linhas': len(df),
+        'aceitas': int(len(df) - rejected.sum()),
+        'rejeitadas': int(rejected.sum()),
+        'colunas': source_columns,
+        'motivos': {reason: int(mask.sum()) for reason, mask in masks.items() if mask.any()},
+        'exemplos': {
+            reason: excel_rows[mask][:REJECTION_SAMPLE_SIZE].tolist()
+            for reason, mask in masks.items() if mask.any()
+        },
+    }
+
+    clean_df = df[~rejected] if rejected.any() else df
+    # Quantidades sempre em float64: uma planilha só com inteiros e outra com decimais geram
+    # partições com o mesmo esquema, e a remontagem da base não depende da ordem das planilhas
+    quantities = {
+        name: pd.to_numeric(clean_df[name]).astype('float64')
+        for name, spec in mapping.columns.items() if spec['tipo'] == 'quantidade'
+    }
+    if quantities:
+        clean_df = clean_df.assign(**quantities)
+    return clean_df, report
+
+def failed_file_report(file_name: str, error: Exception) -> dict:
+    """Relatório de uma planilha que não pôde ser lida ou não tem as colunas do mapeamento."""
+    return {'arquivo': file_name, 'linhas': 0, 'aceitas': 0, 'rejeitadas': 0, 'erro': str(error)}
+
+def log_rejections(report: dict):
+    """Registra no log o resumo das rejeições de uma planilha."""
+    if report.get('erro'):
+        logger.warning(f"⚠️ Planilha '{report['arquivo']}' rejeitada: {report['erro']}")
+    elif report.get('rejeitadas'):
+        logger.warning(
+            f"⚠️ {report['rejeitadas']} de {report['linhas']} linhas rejeitadas em '{report['arquivo']}': {report['motivos']}"
+        )
+
+def write_rejection_report(reports: list, report_path: str):
+    """
+    Grava o relatório de rejeições de todas as planilhas em json.
+
+    Args:
+        reports (list): Os relatórios de cada planilha (validate_sales_data e failed_file_report).
+        report_path (str): O caminho do arquivo json. exemplo: data/docs/relatorio_rejeicoes.json
+    """
+    reports = sorted(reports, key=lambda report: report['arquivo'] or '')
+    summary = {
+        'planilhas': len(reports),
+        'planilhas_com_erro': sum(1 for report in reports if report.get('erro')),
+        'linhas': sum(report['linhas'] for report in reports),
+        'aceitas': sum(report['aceitas'] for report in reports),
+        'rejeitadas': sum(report['rejeitadas'] for report in reports),
+        'motivos': {},
+    }
+    for report in reports:
+        for reason, count in report.get('motivos', {}).items():
+            summary['motivos'][reason] = summary['motivos'].get(reason, 0) + count
+
+    tmp_path = f"{report_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'resumo': summary, 'arquivos': reports}, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, report_path)
+
+    if summary['rejeitadas'] or summary['planilhas_com_erro']:
+        logger.warning(
+            f"⚠️ {summary['rejeitadas']} linhas e {summary['planilhas_com_erro']} planilhas rejeitadas. "
+            f"Relatório em '{report_path}'."
+        )
+    else:
+        logger.info(f"Nenhuma linha rejeitada. Relatório em '{report_path}'.")
@@ -0,0 +1,4 @@
+import os
+
+# O logger do etl_runner grava em ETL_LOG_FILE ao ser importado; nos testes o arquivo é descartado
+os.environ.setdefault('ETL_LOG_FILE', os.devnull)
@@ -0,0 +1,66 @@
+"""Dados de teste: planilhas de vendas e a série histórica do IPCA no layout do IBGE."""
+import os
+import numpy as np
+import pandas as pd
+
+MESES = ['JAN', 'FEV', 'MAR', 'ABR', 'MAI', 'JUN', 'JUL', 'AGO', 'SET', 'OUT', 'NOV', 'DEZ']
+
+def write_sales_workbook(path: str, volumes: list, ids: list = None, ufs: list = None, headers: dict = None) -> str:
+    """
+    Grava uma planilha de vendas no layout original (UF, ID, Pet Shop, Compra Maio 2023 (kg)).
+
+    Args:
+        path (str): O caminho da planilha xlsx.
+        volumes (list): O volume de cada loja.
+        ids (list): Os ids das lojas. Padrão: derivados do nome do arquivo.
+        ufs (list): As UFs das lojas. Padrão: SP e RJ alternados.
+        headers (dict): Troca os nomes do cabeçalho. exemplo: {'UF': 'Estado'}
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    df = pd.DataFrame({
+        'UF': ufs or [('SP', 'RJ')[i % 2] for i in range(len(volumes))],
+        'ID': ids or [f'{name}-{i}' for i in range(len(volumes))],
+        'Pet Shop': [f'Pet {name} {i % 3}' for i in range(len(volumes))],
+        'Compra Maio 2023 (kg)': volumes,
+    })
+    df.rename(columns=headers or {}).to_excel(path, index=False)
+    return path
+
+def write_ipca_sheet(path: str, first_year: int = 2018, last_year: int = 2025, last_month: int = 8, seed: int = 0) -> str:
+    """Grava uma série histórica do IPCA no layout da planilha do IBGE, com cabeçalhos repetidos."""
+    rng = np.random.default_rng(seed)
+    rows = [['SÉRIE HISTÓRICA DO IPCA', None, None, None], [None] * 4, ['ANO', 'MÊS', 'NÚMERO ÍNDICE', 'NO MÊS'], [None] * 4]
+    for year in range(first_year, last_year + 1):
+        months = 12 if year < last_year else last_month
+        for i in range(months):
+            variation = f"{rng.uniform(-0.5, 1.5):.2f}".replace('.', ',')
+            rows.append([str(year) if i == 0 else None, MESES[i], 1000 + i, variation])
+        rows.append([None] * 4)
+    # O conteúdo é xlsx; o pandas identifica o formato pelo conteúdo, não pela extensão
+    pd.DataFrame(rows).to_excel(path, header=False, index=False, engine='openpyxl')
+    return path
+
+def run_sales_pipeline(raw: str, docs: str, extension: str = '.parquet', chunk_size: int = None) -> dict:
+    """
+    Executa o ETL, o IPCA (da planilha 'ipca_*.xls' em docs), as vendas fictícias e as agregações.
+
+    Returns:
+        dict: Os nomes dos arquivos gravados em docs: 'dados', 'inflacao', 'vendas' e a pasta 'rollups'.
+    """
+    from dashboard_page_generator.etl_runner import run_etl_pipeline, process_ipca_data, generate_mock_sales_data
+    from dashboard_page_generator.rollups import build_sales_rollups
+    from dashboard_page_generator.start import IPCA_ZIP_FILE_URL, INFLATION_YEARS, inflation_file_name
+
+    files = {
+        'dados': f'dados{extension}',
+        'inflacao': inflation_file_name(extension),
+        'vendas': f'vendas_ficticias{extension}',
+        'rollups': os.path.join(docs, 'rollups'),
+    }
+    manifest_path = os.path.join(docs, '.etl_manifest.json')
+    run_etl_pipeline(raw, files['dados'], docs, manifest_path=manifest_path, excel_engine='openpyxl')
+    process_ipca_data(IPCA_ZIP_FILE_URL, INFLATION_YEARS, files['inflacao'], docs, manifest_path=manifest_path,
+                      price_index_file=f'indices_precos{extension}')
+    generate_mock_sales_data(docs, files['dados'], files['inflacao'], files['vendas'], manifest_path=manifest_path, chunk_size=chunk_size)
+    build_sales_rollups(docs, files['dados'], files['inflacao'], files['rollups'], extension, manifest_path=manifest_path, chunk_size=chunk_size)
+    return files
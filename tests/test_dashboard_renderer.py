@@ -0,0 +1,166 @@
+import base64
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import pytest
+from plotly.offline import get_plotlyjs_version
+
+from dashboard_page_generator.dashboard_renderer import (
+    DRILLDOWN_EMPTY, DRILLDOWN_OTHERS, build_drilldown_payload, encode_column, plotlyjs_asset_name,
+    render_dashboard_html, render_drilldown_html,
+)
+
+VOLUME = 'volume_vendas_(kg)'
+
+def _figures():
+    return [
+        go.Figure(go.Bar(x=['JAN', 'FEV', 'MAR'], y=[10, 20, 30])),
+        go.Figure(go.Scatter(x=list(range(50)), y=[i / 2 for i in range(50)])),
+    ]
+
+def _page_json(page: str, name: str, end: str):
+    return json.loads(re.search(rf'var {name} = (.*?);{end}', page).group(1))
+
+@pytest.mark.parametrize('plotlyjs', ['inline', 'asset', 'cdn'])
+def test_plotlyjs_carregado_uma_vez_em_cada_modo(tmp_path, plotlyjs):
+    html_path = str(tmp_path / 'index.html')
+    asset_path = render_dashboard_html(_figures(), html_path, 'Vendas', 'Dashboard', plotlyjs=plotlyjs)
+    page = open(html_path, encoding='utf-8').read()
+
+    plotlyjs_tags = re.findall(r'<script type="text/javascript"(?: src="([^"]*)")?>', page)
+    assert page.count('plotly.js v') <= 1
+    if plotlyjs == 'inline':
+        assert asset_path is None
+        assert 'plotly.js v' in page and not any(plotlyjs_tags)
+        assert not (tmp_path / 'assets').exists()
+    elif plotlyjs == 'asset':
+        assert asset_path == str(tmp_path / 'assets' / plotlyjs_asset_name())
+        assert os.path.getsize(asset_path) > 1_000_000
+        assert [src for src in plotlyjs_tags if src] == [f'assets/{plotlyjs_asset_name()}']
+        assert 'plotly.js v' not in page
+    else:
+        assert asset_path is None
+        assert [src for src in plotlyjs_tags if src] == [f'https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js']
+        assert 'plotly.js v' not in page and not (tmp_path / 'assets').exists()
+
+def test_asset_compartilhado_entre_paginas(tmp_path):
+    assets = str(tmp_path / 'static')
+    first = render_dashboard_html(_figures(), str(tmp_path / 'a.html'), 'A', 'A', asset_dir=assets)
+    mtime = os.stat(first).st_mtime_ns
+    second = render_dashboard_html(_figures(), str(tmp_path / 'b.html'), 'B', 'B', asset_dir=assets)
+
+    assert first == second and os.stat(second).st_mtime_ns == mtime
+    assert os.listdir(assets) == [plotlyjs_asset_name()]
+    assert f'src="static/{plotlyjs_asset_name()}"' in open(tmp_path / 'b.html', encoding='utf-8').read()
+
+def test_series_numericas_como_arrays_tipados_e_template_unico(tmp_path):
+    html_path = str(tmp_path / 'index.html')
+    render_dashboard_html(_figures(), html_path, 'Vendas', 'Dashboard', plotlyjs='cdn', typed_array_min_length=10)
+    page = open(html_path, encoding='utf-8').read()
+
+    figures = _page_json(page, 'FIGURES', 'FIGURES.forEach')
+    templates = _page_json(page, 'TEMPLATES', 'var FIGURES')
+    assert len(figures) == 2 and len(templates) == 1
+    assert [fig['template'] for fig in figures] == [0, 0]
+    assert all('template' not in fig['layout'] for fig in figures)
+
+    bar, scatter = figures[0]['data'][0], figures[1]['data'][0]
+    # Abaixo do tamanho mínimo e em texto, as séries continuam como listas
+    assert bar['x'] == ['JAN', 'FEV', 'MAR'] and bar['y'] == [10, 20, 30]
+    assert set(scatter['x']) == {'dtype', 'bdata'} and scatter['y']['dtype'] == 'f8'
+
+def test_modo_invalido(tmp_path):
+    with pytest.raises(ValueError):
+        render_dashboard_html(_figures(), str(tmp_path / 'index.html'), 'Vendas', 'Dashboard', plotlyjs='local')
+
+# --- Dashboard interativo ---
+
+TYPED_ARRAYS = {'Uint8Array': '<u1', 'Uint16Array': '<u2', 'Uint32Array': '<u4', 'Float64Array': '<f8'}
+
+def _decode(column: dict) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(column['data']), dtype=TYPED_ARRAYS[column['dtype']])
+
+def _drilldown_rows(payload: dict) -> pd.DataFrame:
+    """Remonta as linhas do payload a partir dos códigos e dos dicionários."""
+    columns = {name: _decode(column) for name, column in payload['columns'].items()}
+    return pd.DataFrame({
+        'uf': [payload['ufs'][code] for code in columns['uf']],
+        'pet_shop': [payload['pet_shops'][code] for code in columns['pet_shop']],
+        'ano_mes': [payload['meses'][code] for code in columns['mes']],
+        VOLUME: columns['volume'].astype(np.int64),
+    })
+
+@pytest.fixture
+def rollup():
+    """Volume por UF, pet shop e mês, no formato da agregação 'vendas_por_uf_pet_shop_mes'."""
+    rows = [
+        ('SP', 'Pet A', 2024, 'JAN', 1000), ('SP', 'Pet A', 2024, 'FEV', 70000),
+        ('RJ', 'Pet B', 2024, 'JAN', 500), ('SP', 'Pet C', 2023, 'DEZ', 30),
+        ('RJ', 'Pet D', 2024, 'JAN', 20), (None, 'Pet C', 2024, 'JAN', 5),
+    ]
+    df = pd.DataFrame(rows, columns=['uf', 'pet_shop', 'ano', 'mes', VOLUME]).astype({'uf': 'category', 'pet_shop': 'category'})
+    return df.assign(ano_mes=df['ano'].astype(str) + '-' + df['mes'].map({'DEZ': '12', 'JAN': '01', 'FEV': '02'}))
+
+def test_payload_em_arrays_tipados(rollup):
+    payload = build_drilldown_payload(rollup)
+
+    assert payload['rows'] == 6 and payload['outros'] is None
+    assert payload['ufs'] == [DRILLDOWN_EMPTY, 'RJ', 'SP']
+    assert payload['pet_shops'] == ['Pet A', 'Pet B', 'Pet C', 'Pet D']
+    assert payload['meses'] == ['2023-12', '2024-01', '2024-02']
+    assert _decode(payload['anos_meses']).tolist() == [2023, 2024, 2024]
+    # Cada coluna no menor tipo que comporta os valores
+    assert {name: column['dtype'] for name, column in payload['columns'].items()} == {
+        'uf': 'Uint8Array', 'pet_shop': 'Uint8Array', 'mes': 'Uint8Array', 'volume': 'Uint32Array',
+    }
+
+    expected = rollup.assign(uf=rollup['uf'].astype(object).fillna(DRILLDOWN_EMPTY), pet_shop=rollup['pet_shop'].astype(str))
+    pd.testing.assert_frame_equal(_drilldown_rows(payload), expected[['uf', 'pet_shop', 'ano_mes', VOLUME]], check_dtype=False)
+
+def test_payload_soma_os_pet_shops_excedentes_em_outros(rollup):
+    payload = build_drilldown_payload(rollup, max_pet_shops=2)
+
+    # Pet A e Pet B têm os maiores volumes; Pet C e Pet D vão para 'Outros', por UF e mês
+    assert payload['outros'] == DRILLDOWN_OTHERS
+    assert payload['pet_shops'] == ['Pet A', 'Pet B', DRILLDOWN_OTHERS]
+    rows = _drilldown_rows(payload)
+    outros = rows[rows['pet_shop'] == DRILLDOWN_OTHERS].sort_values(['uf', 'ano_mes'], ignore_index=True)
+    assert outros.values.tolist() == [
+        [DRILLDOWN_EMPTY, DRILLDOWN_OTHERS, '2024-01', 5],
+        ['RJ', DRILLDOWN_OTHERS, '2024-01', 20],
+        ['SP', DRILLDOWN_OTHERS, '2023-12', 30],
+    ]
+    assert payload['rows'] == len(rows) == 6
+    assert rows[VOLUME].sum() == rollup[VOLUME].sum()
+
+    # Com 200 pet shops, o 'Outros' ganha no máximo uma linha por UF e mês
+    many = pd.concat([rollup] + [
+        rollup.assign(pet_shop=rollup['pet_shop'].astype(str) + f' filial {i}', **{VOLUME: 1}) for i in range(50)
+    ], ignore_index=True)
+    payload = build_drilldown_payload(many, max_pet_shops=2)
+    assert payload['pet_shops'] == ['Pet A', 'Pet B', DRILLDOWN_OTHERS]
+    # Pet A e Pet B em 3 linhas e o 'Outros' em 5 combinações de UF e mês
+    assert payload['rows'] == 3 + 5
+    assert _drilldown_rows(payload)[VOLUME].sum() == many[VOLUME].sum()
+
+def test_encode_column_usa_float_para_negativos_e_decimais():
+    assert encode_column(np.array([0, 255]))['dtype'] == 'Uint8Array'
+    assert encode_column(np.array([0, 256]))['dtype'] == 'Uint16Array'
+    assert encode_column(np.array([], dtype=np.int64))['dtype'] == 'Uint8Array'
+    for values in (np.array([-1, 2]), np.array([1.5, 2.0])):
+        column = encode_column(values)
+        assert column['dtype'] == 'Float64Array'
+        assert _decode(column).tolist() == values.tolist()
+
+def test_pagina_interativa_embute_o_payload(tmp_path, rollup):
+    payload = build_drilldown_payload(rollup, max_pet_shops=2)
+    html_path = str(tmp_path / 'drilldown.html')
+    assert render_drilldown_html(payload, html_path, 'Vendas', 'Dashboard', plotlyjs='cdn', top_n=3) is None
+
+    page = open(html_path, encoding='utf-8').read()
+    assert _page_json(page, 'DATA', 'var TEMPLATE') == payload
+    assert 'id="filtro-top-n" type="number" min="1" value="3"' in page
@@ -0,0 +1,32 @@
+import pandas as pd
+
+from dashboard_page_generator.database import load_sales_database, query_database, rollups_from_database
+from dashboard_page_generator.rollups import read_rollups
+
+from .helpers import run_sales_pipeline, write_ipca_sheet, write_sales_workbook
+
+def test_agregacoes_sql_iguais_as_do_pandas_com_ids_repetidos(tmp_path):
+    """Lojas diferentes com o mesmo id, em planilhas diferentes, não se sobrepõem no banco."""
+    raw, docs = tmp_path / 'raw', tmp_path / 'docs'
+    raw.mkdir()
+    docs.mkdir()
+    write_sales_workbook(str(raw / 'norte.xlsx'), [100, 200, 300], ids=['L1', 'L2', 'L3'], ufs=['AM', 'PA', 'AM'])
+    write_sales_workbook(str(raw / 'sul.xlsx'), [50, 60.5], ids=['L1', 'L9'], ufs=['RS', 'SC'])
+    write_ipca_sheet(str(docs / 'ipca_202508SerieHist.xls'))
+    files = run_sales_pipeline(str(raw), str(docs), chunk_size=7)
+
+    database_path = str(docs / 'vendas.sqlite')
+    rows = load_sales_database(str(docs), files['dados'], files['inflacao'], files['vendas'], database_path, batch_size=4)
+    assert query_database(database_path, 'SELECT COUNT(*) AS n FROM vendas')['n'][0] == rows
+    assert query_database(database_path, 'SELECT COUNT(*) AS n FROM lojas')['n'][0] == 5
+
+    expected = read_rollups(files['rollups'], '.parquet')
+    actual = rollups_from_database(database_path)
+    assert set(actual) == set(expected)
+    for name, df in expected.items():
+        keys = [col for col in df.columns if col != 'volume_vendas_(kg)']
+        pd.testing.assert_frame_equal(
+            actual[name].sort_values(keys, ignore_index=True)[df.columns],
+            df.sort_values(keys, ignore_index=True),
+            check_dtype=False, check_categorical=False, obj=name,
+        )
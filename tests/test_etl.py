@@ -0,0 +1,101 @@
+import pandas as pd
+import pytest
+
+from dashboard_page_generator.etl_runner import run_etl_pipeline
+from dashboard_page_generator.schema import SALES_BASE_SCHEMA
+from dashboard_page_generator.storage import read_table
+
+from .helpers import write_sales_workbook
+
+VOLUME = 'compra_maio_2023_(kg)'
+
+@pytest.fixture
+def mixed_volume_workbooks(tmp_path):
+    """Uma planilha só com volumes inteiros e outra com um volume decimal."""
+    raw = tmp_path / 'raw'
+    raw.mkdir()
+    write_sales_workbook(str(raw / 'a_inteiros.xlsx'), [100, 200, 300])
+    write_sales_workbook(str(raw / 'b_decimais.xlsx'), [150.5, 10, 20])
+    return raw
+
+@pytest.mark.parametrize('engine', ['pandas', 'openpyxl'])
+def test_incremental_com_volumes_inteiros_e_decimais(tmp_path, mixed_volume_workbooks, engine):
+    output = tmp_path / 'docs'
+    output.mkdir()
+    run_etl_pipeline(str(mixed_volume_workbooks), 'dados.parquet', str(output),
+                     manifest_path=str(output / 'manifest.json'), excel_engine=engine)
+
+    df = read_table(str(output / 'dados.parquet'), SALES_BASE_SCHEMA)
+    assert df[VOLUME].tolist() == [100, 200, 300, 150.5, 10, 20]
+
+def test_paralelo_com_volumes_inteiros_e_decimais(tmp_path, mixed_volume_workbooks):
+    output = tmp_path / 'docs'
+    output.mkdir()
+    run_etl_pipeline(str(mixed_volume_workbooks), 'dados.parquet', str(output), max_workers=2, excel_engine='openpyxl')
+
+    df = read_table(str(output / 'dados.parquet'), SALES_BASE_SCHEMA)
+    assert sorted(df[VOLUME].tolist()) == [10, 20, 100, 150.5, 200, 300]
+
+def test_particoes_com_volumes_em_float(tmp_path, mixed_volume_workbooks):
+    """As partições em cache têm o mesmo tipo de volume, com ou sem casas decimais na planilha."""
+    output = tmp_path / 'docs'
+    output.mkdir()
+    run_etl_pipeline(str(mixed_volume_workbooks), 'dados.parquet', str(output), manifest_path=str(output / 'manifest.json'))
+
+    partitions = sorted((output / '.etl_cache' / 'partitions').iterdir())
+    assert len(partitions) == 2
+    for partition in partitions:
+        assert str(read_table(str(partition), SALES_BASE_SCHEMA)[VOLUME].dtype) == 'float64'
+
+def _sorted_rows(path: str):
+    df = read_table(path, SALES_BASE_SCHEMA)
+    return df.astype(str).sort_values(list(df.columns), ignore_index=True)
+
+@pytest.fixture
+def regional_workbooks(tmp_path):
+    """Planilhas com ids numéricos e de texto, volumes inteiros e decimais e uma linha vazia."""
+    raw = tmp_path / 'raw'
+    raw.mkdir()
+    write_sales_workbook(str(raw / 'centro.xlsx'), [10, 20, 30], ids=[101, 102, 103])
+    write_sales_workbook(str(raw / 'norte.xlsx'), [1.5, None, 7], ids=['N1', 'N2', 'N3'])
+    write_sales_workbook(str(raw / 'sul.xlsx'), [100, 200], ids=['S1', 'S2'], headers={'UF': 'Estado'})
+    return raw
+
+@pytest.mark.parametrize('extension', ['.csv', '.parquet', '.feather'])
+def test_sequencial_paralelo_e_incremental_geram_os_mesmos_dados(tmp_path, regional_workbooks, extension):
+    outputs = {}
+    for mode, options in {
+        'sequencial': {},
+        'paralelo': {'max_workers': 2},
+        'incremental': {'manifest_path': 'manifest'},
+        'incremental_paralelo': {'manifest_path': 'manifest', 'max_workers': 2},
+    }.items():
+        output = tmp_path / mode
+        output.mkdir()
+        if 'manifest_path' in options:
+            options = {**options, 'manifest_path': str(output / '.etl_manifest.json')}
+        run_etl_pipeline(str(regional_workbooks), f'dados{extension}', str(output), excel_engine='openpyxl', **options)
+        outputs[mode] = _sorted_rows(str(output / f'dados{extension}'))
+
+    assert len(outputs['sequencial']) == 7
+    for mode, df in outputs.items():
+        pd.testing.assert_frame_equal(df, outputs['sequencial'], obj=mode)
+
+def test_incremental_reprocessa_apenas_a_planilha_alterada(tmp_path, regional_workbooks):
+    output = tmp_path / 'docs'
+    output.mkdir()
+    manifest_path = str(output / '.etl_manifest.json')
+    run_etl_pipeline(str(regional_workbooks), 'dados.parquet', str(output), manifest_path=manifest_path, excel_engine='openpyxl')
+    partitions = {path.name: path.stat().st_mtime_ns for path in (output / '.etl_cache' / 'partitions').iterdir()}
+
+    write_sales_workbook(str(regional_workbooks / 'sul.xlsx'), [100, 250.5, 300], ids=['S1', 'S2', 'S3'])
+    run_etl_pipeline(str(regional_workbooks), 'dados.parquet', str(output), manifest_path=manifest_path, excel_engine='openpyxl')
+
+    current = {path.name: path.stat().st_mtime_ns for path in (output / '.etl_cache' / 'partitions').iterdir()}
+    assert len(set(current) - set(partitions)) == 1
+    assert {name: current[name] for name in partitions if name in current} == {name: mtime for name, mtime in partitions.items() if name in current}
+
+    sequential = tmp_path / 'sequencial'
+    sequential.mkdir()
+    run_etl_pipeline(str(regional_workbooks), 'dados.parquet', str(sequential), excel_engine='openpyxl')
+    pd.testing.assert_frame_equal(_sorted_rows(str(output / 'dados.parquet')), _sorted_rows(str(sequential / 'dados.parquet')))
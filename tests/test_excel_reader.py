@@ -0,0 +1,28 @@
+import pandas as pd
+import pytest
+
+from dashboard_page_generator.etl_runner import process_sales_workbook
+from dashboard_page_generator.excel_reader import calamine_available
+from dashboard_page_generator.schema import SALES_BASE_SCHEMA, apply_schema
+
+from .helpers import write_sales_workbook
+
+ENGINES = ['pandas', 'openpyxl'] + (['calamine'] if calamine_available() else [])
+
+@pytest.mark.parametrize('volumes', [
+    [100, 200, 300],
+    [150.5, 10, 20.25],
+    [100, None, 'x', 7.0],
+])
+def test_motores_geram_o_mesmo_resultado(tmp_path, volumes):
+    path = write_sales_workbook(str(tmp_path / 'vendas.xlsx'), volumes, ids=[f'{i}' for i in range(len(volumes))])
+
+    # O motor 'pandas' aplica o esquema só na gravação; os demais, já na leitura
+    results = {engine: process_sales_workbook(path, engine) for engine in ENGINES}
+    expected_df, expected_report = results['pandas']
+    expected_df = apply_schema(expected_df, SALES_BASE_SCHEMA).reset_index(drop=True)
+    for engine, (df, report) in results.items():
+        df = apply_schema(df, SALES_BASE_SCHEMA).reset_index(drop=True)
+        # Categorias sem uso, que sobram das linhas rejeitadas, não contam
+        pd.testing.assert_frame_equal(df, expected_df, check_categorical=False, obj=engine)
+        assert {**report, 'colunas': None} == {**expected_report, 'colunas': None}, engine
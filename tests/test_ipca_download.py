@@ -0,0 +1,108 @@
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from dashboard_page_generator.etl_runner import fetch_ipca_archive
+
+PAYLOAD = bytes(range(256)) * 64
+ETAG = '"ipca-v1"'
+
+class IpcaHandler(BaseHTTPRequestHandler):
+    """Serve PAYLOAD com ETag, respostas condicionais (304) e faixas (206 e 416)."""
+
+    def do_GET(self):
+        self.server.requests.append(dict(self.headers))
+        if self.headers.get('If-None-Match') == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        body, status = PAYLOAD, 200
+        byte_range = self.headers.get('Range')
+        if byte_range and self.headers.get('If-Range') == ETAG:
+            start = int(byte_range.split('=')[1].rstrip('-'))
+            if start >= len(PAYLOAD):
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{len(PAYLOAD)}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            body, status = PAYLOAD[start:], 206
+
+        self.send_response(status)
+        self.send_header('ETag', ETAG)
+        self.send_header('Content-Length', str(len(body)))
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {len(PAYLOAD) - len(body)}-{len(PAYLOAD) - 1}/{len(PAYLOAD)}')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def ipca_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), IpcaHandler)
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, f'http://127.0.0.1:{server.server_address[1]}/ipca_SerieHist.zip'
+    server.shutdown()
+    server.server_close()
+
+def write_partial(url: str, cache_dir: str, content: bytes, validator: str = ETAG):
+    """Simula um download interrompido: o arquivo '.part' e o validador guardado nos metadados."""
+    os.makedirs(cache_dir, exist_ok=True)
+    zip_path = os.path.join(cache_dir, 'ipca_SerieHist.zip')
+    with open(f'{zip_path}.part', 'wb') as f:
+        f.write(content)
+    with open(f'{zip_path}.json', 'w', encoding='utf-8') as f:
+        json.dump({'url': url, 'partial': {'validator': validator, 'etag': validator, 'last_modified': None}}, f)
+
+def test_download_completo_e_304(tmp_path, ipca_server):
+    server, url = ipca_server
+    cache_dir = str(tmp_path / 'cache')
+
+    zip_path = fetch_ipca_archive(url, cache_dir)
+    with open(zip_path, 'rb') as f:
+        assert f.read() == PAYLOAD
+
+    # A segunda consulta é condicional e reaproveita o arquivo em cache
+    assert fetch_ipca_archive(url, cache_dir) == zip_path
+    assert server.requests[-1].get('If-None-Match') == ETAG
+    assert not os.path.exists(f'{zip_path}.part')
+
+def test_retoma_download_interrompido(tmp_path, ipca_server):
+    server, url = ipca_server
+    cache_dir = str(tmp_path / 'cache')
+    write_partial(url, cache_dir, PAYLOAD[:1000])
+
+    zip_path = fetch_ipca_archive(url, cache_dir)
+    assert server.requests[0]['Range'] == 'bytes=1000-'
+    with open(zip_path, 'rb') as f:
+        assert f.read() == PAYLOAD
+
+def test_416_descarta_o_parcial(tmp_path, ipca_server):
+    server, url = ipca_server
+    cache_dir = str(tmp_path / 'cache')
+    write_partial(url, cache_dir, PAYLOAD + b'lixo')
+
+    zip_path = fetch_ipca_archive(url, cache_dir)
+    assert [request.get('Range') for request in server.requests] == [f'bytes={len(PAYLOAD) + 4}-', None]
+    with open(zip_path, 'rb') as f:
+        assert f.read() == PAYLOAD
+    assert not os.path.exists(f'{zip_path}.part')
+
+def test_200_para_um_range_recomeca_do_inicio(tmp_path, ipca_server):
+    """Com outro validador (o arquivo mudou no servidor), a resposta é 200 e o parcial é descartado."""
+    server, url = ipca_server
+    cache_dir = str(tmp_path / 'cache')
+    write_partial(url, cache_dir, b'conteudo antigo', validator='"ipca-v0"')
+
+    zip_path = fetch_ipca_archive(url, cache_dir)
+    assert len(server.requests) == 1
+    with open(zip_path, 'rb') as f:
+        assert f.read() == PAYLOAD
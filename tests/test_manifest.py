@@ -0,0 +1,21 @@
+from dashboard_page_generator.manifest import load_manifest, save_manifest
+
+def test_gravacoes_de_manifestos_carregados_ao_mesmo_tempo(tmp_path):
+    path = str(tmp_path / 'manifest.json')
+    save_manifest({'stages': {'a': {'inputs': {'x': '1'}}, 'b': {'inputs': {'x': '1'}}}}, path)
+
+    # Duas etapas carregam o manifesto antes de qualquer uma gravar
+    first, second = load_manifest(path), load_manifest(path)
+    first['stages']['a'] = {'inputs': {'x': '2'}}
+    save_manifest(first, path)
+    second['stages']['b'] = {'inputs': {'x': '2'}}
+    save_manifest(second, path)
+
+    stages = load_manifest(path)['stages']
+    assert stages == {'a': {'inputs': {'x': '2'}}, 'b': {'inputs': {'x': '2'}}}
+
+    # Uma nova alteração do mesmo manifesto continua sendo gravada
+    first['stages']['a'] = {'inputs': {'x': '3'}}
+    save_manifest(first, path)
+    assert load_manifest(path)['stages']['a'] == {'inputs': {'x': '3'}}
+    assert load_manifest(path)['stages']['b'] == {'inputs': {'x': '2'}}
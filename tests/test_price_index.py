@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from dashboard_page_generator.price_index import PriceIndexStore, update_price_index
+from dashboard_page_generator.schema import MONTH_NAMES
+
+def _series(first_year: int, last_year: int, variation) -> pd.DataFrame:
+    """Série mensal no formato de INFLATION_SCHEMA, com a variação de cada mês dada por variation(ano, mes)."""
+    rows = [(ano, mes) for ano in range(first_year, last_year + 1) for mes in range(1, 13)]
+    return pd.DataFrame({
+        'ANO': [ano for ano, _ in rows],
+        'MES': [MONTH_NAMES[mes] for _, mes in rows],
+        'INFLACAO_NO_MES': [variation(ano, mes) for ano, mes in rows],
+    })
+
+@pytest.fixture
+def store_path(tmp_path):
+    path = str(tmp_path / 'indices_precos.parquet')
+    update_price_index(path, 'IPCA', _series(2019, 2024, lambda ano, mes: 1.0))
+    update_price_index(path, 'inpc', _series(2020, 2021, lambda ano, mes: mes / 10))
+    return path
+
+def test_update_price_index_substitui_apenas_o_indice_gravado(store_path):
+    store = PriceIndexStore.load(store_path)
+    assert store.indices == ['INPC', 'IPCA']
+    assert len(store.table) == 72 + 24
+
+    # Regravar o INPC com outra série não altera o IPCA
+    update_price_index(store_path, 'INPC', _series(2020, 2020, lambda ano, mes: 2.0))
+    store = PriceIndexStore.load(store_path)
+    assert (store.table['indice'].astype(str) == 'INPC').sum() == 12
+    assert store.factor('INPC', 2020, 12) == pytest.approx(1.02 ** 12)
+    assert store.factor('IPCA', 2024, 12) == pytest.approx(1.01 ** 72)
+
+def test_ratio_escalar_e_vetorizado(store_path):
+    store = PriceIndexStore.load(store_path)
+    # Fator de FEV/2020 a DEZ/2024: 59 meses de 1%
+    assert store.ratio('IPCA', (2020, 1), (2024, 12)) == pytest.approx(1.01 ** 59)
+    assert store.ratio('ipca', (2024, 12), (2020, 1)) == pytest.approx(1.01 ** -59)
+    assert store.ratio('IPCA', (2022, 3), (2022, 3)) == 1.0
+
+    anos = np.array([2019, 2023, 2023, 2024])
+    meses = np.array([5, 5, 6, 12])
+    ratios = store.ratios('IPCA', anos, meses, base=(2023, 5))
+    expected = [store.ratio('IPCA', (2023, 5), (ano, mes)) for ano, mes in zip(anos, meses)]
+    np.testing.assert_allclose(ratios, expected)
+    np.testing.assert_allclose(ratios, 1.01 ** np.array([-48, 0, 1, 19]))
+
+    # Fora da série o fator é NaN
+    assert np.isnan(store.ratios('INPC', [2019, 2022], [12, 1], base=(2020, 6))).all()
+    with pytest.raises(KeyError):
+        store.ratio('IGPM', (2020, 1), (2020, 2))
+
+def test_monthly_table_nos_intervalos_de_anos(store_path):
+    store = PriceIndexStore.load(store_path)
+    df = store.monthly_table('INPC', [(2021, 2021)])
+    assert df['ANO'].tolist() == [2021] * 12
+    assert df['MES'].astype(str).tolist() == [MONTH_NAMES[mes] for mes in range(1, 13)]
+    np.testing.assert_allclose(df['INFLACAO_NO_MES'], np.arange(1, 13) / 10)
+
+    df = store.monthly_table('IPCA', [(2019, 2019), (2024, 2030)])
+    assert df['ANO'].unique().tolist() == [2019, 2024]
+    assert len(df) == 24
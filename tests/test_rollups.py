@@ -0,0 +1,90 @@
+import logging
+import os
+
+import pandas as pd
+import pytest
+
+from dashboard_page_generator.etl_runner import generate_mock_sales_data
+from dashboard_page_generator.rollups import (
+    MONTHS_STATE, STORES_STATE, ROLLUPS, VOLUME_COLUMN, build_sales_rollups, read_rollups, rollups_from_sales_table,
+)
+from dashboard_page_generator.schema import INFLATION_SCHEMA, MONTH_NAMES, SALES_BASE_SCHEMA
+from dashboard_page_generator.storage import read_table, write_table
+
+STORES = {
+    'uf': ['SP', 'RJ', 'SP'],
+    'id': ['L1', 'L2', 'L3'],
+    'pet_shop': ['Pet A', 'Pet B', 'Pet A'],
+    'compra_maio_2023_(kg)': [100.0, 250.5, 40.0],
+}
+
+def _write_inputs(docs, n_stores: int, last_month: int, changes: dict = None):
+    """Grava os dados base com as primeiras n_stores lojas e a inflação de JAN/2023 até last_month."""
+    stores = {col: values[:n_stores] for col, values in STORES.items()}
+    write_table(pd.DataFrame({**stores, **(changes or {})}), str(docs / 'dados.parquet'), SALES_BASE_SCHEMA)
+    write_table(pd.DataFrame({
+        'ANO': [2023] * last_month,
+        'MES': [MONTH_NAMES[mes] for mes in range(1, last_month + 1)],
+        'INFLACAO_NO_MES': [0.3 * mes for mes in range(1, last_month + 1)],
+    }), str(docs / 'inflacao.parquet'), INFLATION_SCHEMA)
+
+def _build(docs, name: str) -> str:
+    folder = str(docs / name)
+    build_sales_rollups(str(docs), 'dados.parquet', 'inflacao.parquet', folder,
+                        manifest_path=str(docs / f'{name}.json'), chunk_size=5)
+    return folder
+
+def _assert_same_rollups(actual: dict, expected: dict):
+    assert set(actual) == set(expected) == set(ROLLUPS)
+    for name, df in expected.items():
+        keys = [col for col in df.columns if col != VOLUME_COLUMN]
+        pd.testing.assert_frame_equal(
+            actual[name].astype({col: str for col in keys}).sort_values(keys, ignore_index=True)[df.columns],
+            df.astype({col: str for col in keys}).sort_values(keys, ignore_index=True),
+            check_dtype=False, obj=name,
+        )
+
+@pytest.fixture
+def docs(tmp_path):
+    docs = tmp_path / 'docs'
+    docs.mkdir()
+    return docs
+
+def test_atualizacao_incremental_igual_a_reconstrucao_completa(docs, caplog):
+    _write_inputs(docs, n_stores=2, last_month=6)
+    incremental = _build(docs, 'incremental')
+
+    # Chegam seis meses e uma loja novos: só as linhas novas são agregadas
+    _write_inputs(docs, n_stores=3, last_month=12)
+    with caplog.at_level(logging.INFO, logger='dashboard_page_generator.rollups'):
+        _build(docs, 'incremental')
+    assert 'Agregando 6 meses novos e 1 lojas novas' in caplog.text
+    assert 'Refazendo as agregações do zero' not in caplog.text
+
+    full = _build(docs, 'completo')
+    _assert_same_rollups(read_rollups(incremental, '.parquet'), read_rollups(full, '.parquet'))
+
+    generate_mock_sales_data(str(docs), 'dados.parquet', 'inflacao.parquet', 'vendas.parquet')
+    _assert_same_rollups(read_rollups(incremental, '.parquet'), rollups_from_sales_table(str(docs / 'vendas.parquet')))
+
+    # As tabelas de estado registram todos os meses e lojas agregados, como na reconstrução
+    for state in (MONTHS_STATE, STORES_STATE):
+        pd.testing.assert_frame_equal(
+            read_table(os.path.join(incremental, f'{state}.parquet')),
+            read_table(os.path.join(full, f'{state}.parquet')),
+            obj=state,
+        )
+    assert len(read_table(os.path.join(incremental, f'{MONTHS_STATE}.parquet'))) == 12
+    assert read_table(os.path.join(incremental, f'{STORES_STATE}.parquet'))['id'].tolist() == ['L1', 'L2', 'L3']
+
+def test_loja_alterada_refaz_as_agregacoes(docs, caplog):
+    _write_inputs(docs, n_stores=3, last_month=6)
+    folder = _build(docs, 'incremental')
+
+    _write_inputs(docs, n_stores=3, last_month=6, changes={'compra_maio_2023_(kg)': [100.0, 999.0, 40.0]})
+    with caplog.at_level(logging.INFO, logger='dashboard_page_generator.rollups'):
+        _build(docs, 'incremental')
+    assert 'Refazendo as agregações do zero' in caplog.text
+
+    generate_mock_sales_data(str(docs), 'dados.parquet', 'inflacao.parquet', 'vendas.parquet')
+    _assert_same_rollups(read_rollups(folder, '.parquet'), rollups_from_sales_table(str(docs / 'vendas.parquet')))
@@ -0,0 +1,90 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dashboard_page_generator.scenarios import generate_scenario_sales_data, project_scenarios, read_scenario_sales
+from dashboard_page_generator.schema import MOCK_SALES_SCHEMA
+from dashboard_page_generator.storage import read_table
+
+from .helpers import run_sales_pipeline, write_ipca_sheet, write_sales_workbook
+
+VOLUME = 'volume_vendas_(kg)'
+KEYS = ['ano', 'mes', 'id']
+
+@pytest.fixture
+def pipeline(tmp_path):
+    raw, docs = tmp_path / 'raw', tmp_path / 'docs'
+    raw.mkdir()
+    docs.mkdir()
+    write_sales_workbook(str(raw / 'norte.xlsx'), [100, 200, 300], ids=['N1', 'N2', 'N3'], ufs=['AM', 'SP', 'AM'])
+    write_sales_workbook(str(raw / 'sul.xlsx'), [150.5, 10], ids=['S1', 'S2'], ufs=['SP', 'RS'])
+    write_ipca_sheet(str(docs / 'ipca_202508SerieHist.xls'))
+    files = run_sales_pipeline(str(raw), str(docs))
+    return docs, files
+
+def test_project_scenarios_calcula_cenarios_meses_e_lojas_de_uma_vez():
+    factors = np.array([[1.0, 1.1, 1.21], [0.5, 1.0, 2.0]])
+    # Duas UFs e a coluna extra das lojas sem UF
+    elasticity = np.array([[1.0, 1.0, 1.0], [1.0, 2.0, 0.0]])
+    vendas_base = np.array([100.0, 50.5, 7.0])
+    uf_codes = np.array([0, 1, 2])
+
+    volumes = project_scenarios(factors, elasticity, vendas_base, uf_codes)
+    assert volumes.shape == (2, 3, 3)
+    assert volumes.dtype == np.int32
+
+    for s in range(2):
+        for m in range(3):
+            for loja in range(3):
+                expected = np.floor(vendas_base[loja] / factors[s, m] ** elasticity[s, uf_codes[loja]])
+                assert volumes[s, m, loja] == expected, (s, m, loja)
+    assert volumes[0, :, 0].tolist() == [100, 90, 82]
+    assert volumes[1, :, 1].tolist() == [202, 50, 12]
+    assert volumes[1, :, 2].tolist() == [7, 7, 7]
+
+@pytest.mark.parametrize('chunk_size', [None, 7])
+def test_cenario_ipca_reproduz_as_vendas_ficticias(tmp_path, pipeline, chunk_size):
+    docs, files = pipeline
+    scenarios_file = tmp_path / 'cenarios.json'
+    scenarios_file.write_text(json.dumps([
+        {'name': 'ipca'},
+        {'name': 'sem_inflacao', 'inflation': 0},
+        {'name': 'sp_elastico', 'elasticity': {'SP': 2.0, 'default': 1.0}},
+    ]), encoding='utf-8')
+    rollups = tmp_path / 'rollups'
+
+    monthly_path = generate_scenario_sales_data(str(docs), files['dados'], files['inflacao'], str(scenarios_file),
+                                                'vendas_cenarios.parquet', str(rollups), chunk_size=chunk_size)
+
+    vendas = read_table(str(docs / files['vendas']), MOCK_SALES_SCHEMA)
+    n_meses, n_lojas = vendas['ano'].astype(str).str.cat(vendas['mes'].astype(str)).nunique(), 5
+    assert len(vendas) == n_meses * n_lojas
+
+    cenarios = read_scenario_sales(str(docs / 'vendas_cenarios.parquet'))
+    assert len(cenarios) == 3 * n_meses * n_lojas
+    assert cenarios['cenario'].astype(str).unique().tolist() == ['ipca', 'sem_inflacao', 'sp_elastico']
+
+    ipca = read_scenario_sales(str(docs / 'vendas_cenarios.parquet'), ['ipca']).drop(columns='cenario')
+    pd.testing.assert_frame_equal(
+        ipca.sort_values(KEYS, ignore_index=True)[vendas.columns],
+        vendas.sort_values(KEYS, ignore_index=True),
+        check_categorical=False,
+    )
+
+    # Sem inflação o fator é 1 em todos os meses: o volume é a venda base arredondada para baixo
+    sem_inflacao = read_scenario_sales(str(docs / 'vendas_cenarios.parquet'), ['sem_inflacao'])
+    base = {'N1': 100, 'N2': 200, 'N3': 300, 'S1': 150, 'S2': 10}
+    assert (sem_inflacao[VOLUME] == sem_inflacao['id'].astype(str).map(base)).all()
+
+    # Fora de SP a elasticidade é 1, como no cenário ipca
+    elastico = read_scenario_sales(str(docs / 'vendas_cenarios.parquet'), ['sp_elastico'])
+    fora_de_sp = elastico[elastico['uf'].astype(str) != 'SP'].drop(columns='cenario').sort_values(KEYS, ignore_index=True)
+    ipca_fora_de_sp = ipca[ipca['uf'].astype(str) != 'SP'].sort_values(KEYS, ignore_index=True)
+    pd.testing.assert_frame_equal(fora_de_sp, ipca_fora_de_sp[fora_de_sp.columns], check_categorical=False)
+
+    monthly = read_table(monthly_path)
+    totals = monthly.groupby('cenario', observed=True)[VOLUME].sum()
+    assert totals['ipca'] == vendas[VOLUME].sum()
+    assert totals['sem_inflacao'] == n_meses * sum(base.values())
@@ -0,0 +1,35 @@
+import json
+import sqlite3
+
+from dashboard_page_generator.price_index import PriceIndexStore
+from dashboard_page_generator.service import PipelineService
+
+from .helpers import write_ipca_sheet, write_sales_workbook
+
+def test_servico_executa_as_etapas_opcionais(tmp_path):
+    """Cenários, banco de dados e outros índices configurados no serviço rodam como em start.main."""
+    raw, docs = tmp_path / 'raw', tmp_path / 'docs'
+    raw.mkdir()
+    docs.mkdir()
+    write_sales_workbook(str(raw / 'norte.xlsx'), [100, 150.5, 80])
+    write_sales_workbook(str(raw / 'sul.xlsx'), [10, 20])
+    write_ipca_sheet(str(docs / 'ipca_202508SerieHist.xls'))
+    inpc = write_ipca_sheet(str(tmp_path / 'inpc_202508SerieHist.xls'), seed=1)
+    scenarios = tmp_path / 'cenarios.json'
+    scenarios.write_text(json.dumps([{'name': 'ipca'}, {'name': 'ipca_x1.5', 'inflation_scale': 1.5}]))
+
+    service = PipelineService(str(raw), str(docs), excel_engine='openpyxl', plotlyjs='cdn', max_workers=2,
+                              price_index_files={'INPC': inpc}, scenarios_file=str(scenarios),
+                              database_file=str(docs / 'vendas.sqlite'))
+    try:
+        summary = service.run()
+    finally:
+        service.stop()
+
+    assert summary['status'] == 'ok', summary
+    stages = {stage['stage']: stage['status'] for stage in summary['stages']}
+    assert {'price_indices', 'scenarios', 'database'} <= set(stages)
+    assert PriceIndexStore.load(str(docs / 'indices_precos.parquet')).indices == ['INPC', 'IPCA']
+    assert (docs / 'vendas_cenarios.parquet').exists()
+    with sqlite3.connect(str(docs / 'vendas.sqlite')) as db:
+        assert db.execute('SELECT COUNT(*) FROM lojas').fetchone()[0] == 5
@@ -0,0 +1,50 @@
+import pytest
+
+from dashboard_page_generator import start
+from dashboard_page_generator.instrumentation import RunMetrics
+
+from .helpers import write_ipca_sheet, write_sales_workbook
+
+def _output_files(folder):
+    return {str(path): path.stat().st_mtime_ns for path in folder.rglob('*') if path.is_file() and '.metrics' not in path.parts}
+
+@pytest.fixture
+def pipeline_folders(tmp_path, monkeypatch):
+    """As pastas data/raw e data/docs de start.main, com duas planilhas e a série do IPCA."""
+    monkeypatch.chdir(tmp_path)
+    for name in ('ETL_MAX_WORKERS', 'ETL_SCENARIOS_FILE', 'ETL_DATABASE_FILE', 'ETL_PRICE_INDEX_FILES', 'ETL_COLUMN_MAPPING_FILE'):
+        monkeypatch.delenv(name, raising=False)
+    raw, docs = tmp_path / 'data' / 'raw', tmp_path / 'data' / 'docs'
+    raw.mkdir(parents=True)
+    docs.mkdir(parents=True)
+    write_sales_workbook(str(raw / 'norte.xlsx'), [100, 200, 300])
+    write_sales_workbook(str(raw / 'sul.xlsx'), [150.5, 10])
+    write_ipca_sheet(str(docs / 'ipca_202508SerieHist.xls'))
+    return raw, docs
+
+def _assert_second_run_skips_everything(docs):
+    before = _output_files(docs)
+    metrics = RunMetrics()
+    assert start.main(metrics) == 'data/docs/vendas_ficticias.parquet'
+    stages = {stage['stage']: stage for stage in metrics.stages}
+    assert {'ipca', 'sales_etl', 'mock_sales', 'rollups'} <= set(stages)
+    # A etapa do IPCA sempre consulta a origem; as demais são puladas pelo manifesto sem chamar a função
+    assert {name: bool(stages[name].get('skipped')) for name in ('sales_etl', 'mock_sales', 'rollups')} == {
+        'sales_etl': True, 'mock_sales': True, 'rollups': True,
+    }
+    # Nenhum arquivo é regravado, nem mesmo o manifesto
+    assert _output_files(docs) == before
+
+def test_segunda_execucao_pula_todas_as_etapas(pipeline_folders):
+    raw, docs = pipeline_folders
+    assert start.main(RunMetrics()) == 'data/docs/vendas_ficticias.parquet'
+    _assert_second_run_skips_everything(docs)
+
+def test_etapas_paralelas_nao_desfazem_o_registro_uma_da_outra(pipeline_folders):
+    """mock_sales e rollups gravam o manifesto ao mesmo tempo; nenhuma pode apagar o registro da outra."""
+    raw, docs = pipeline_folders
+    assert start.main(RunMetrics()) == 'data/docs/vendas_ficticias.parquet'
+
+    write_sales_workbook(str(raw / 'sul.xlsx'), [150.5, 10, 42])
+    assert start.main(RunMetrics()) == 'data/docs/vendas_ficticias.parquet'
+    _assert_second_run_skips_everything(docs)
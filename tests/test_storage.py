@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+
+from dashboard_page_generator.schema import SALES_BASE_SCHEMA
+from dashboard_page_generator.storage import TableWriter, read_table, write_table
+
+@pytest.mark.parametrize('extension', ['.csv', '.parquet', '.feather'])
+def test_table_writer_promove_inteiros_para_float(tmp_path, extension):
+    """Um bloco com decimais depois de um bloco só com inteiros não pode truncar nem falhar."""
+    path = str(tmp_path / f'dados{extension}')
+    with TableWriter(path, SALES_BASE_SCHEMA) as writer:
+        writer.write(pd.DataFrame({'uf': ['SP'], 'id': ['a'], 'pet_shop': ['x'], 'compra_maio_2023_(kg)': [100]}))
+        writer.write(pd.DataFrame({'uf': ['RJ'], 'id': ['b'], 'pet_shop': ['y'], 'compra_maio_2023_(kg)': [150.5]}))
+        writer.write(pd.DataFrame({'uf': ['MG'], 'id': ['c'], 'pet_shop': ['z'], 'compra_maio_2023_(kg)': [7]}))
+
+    df = read_table(path, SALES_BASE_SCHEMA)
+    assert df['compra_maio_2023_(kg)'].tolist() == [100, 150.5, 7]
+    assert df['uf'].astype(str).tolist() == ['SP', 'RJ', 'MG']
+    assert sorted(p.name for p in tmp_path.iterdir()) == [f'dados{extension}']
+
+def test_feather_grava_cada_bloco_ao_receber(tmp_path):
+    """As categorias mudam entre os blocos e passam de 127 valores; nada fica acumulado em memória."""
+    from dashboard_page_generator.storage import count_rows, iter_table
+
+    path = str(tmp_path / 'dados.feather')
+    blocks = [
+        pd.DataFrame({'uf': ['SP', 'RJ'], 'id': ['a', 'b'], 'pet_shop': ['x', 'y'], 'v': [1.0, 2.0]}),
+        pd.DataFrame({'uf': ['AM', 'SP'], 'id': ['c', 'd'], 'pet_shop': ['z', 'x'], 'v': [3.0, 4.0]}),
+        pd.DataFrame({'uf': ['MG'] * 200, 'id': [f'e{i}' for i in range(200)],
+                      'pet_shop': [f'loja {i}' for i in range(200)], 'v': [5.0] * 200}),
+    ]
+    with TableWriter(path, SALES_BASE_SCHEMA) as writer:
+        sizes = []
+        for block in blocks:
+            writer.write(block)
+            sizes.append((tmp_path / 'dados.feather').stat().st_size)
+    assert sizes[0] < sizes[1] < sizes[2]
+
+    expected = pd.concat(blocks, ignore_index=True)
+    df = read_table(path, SALES_BASE_SCHEMA)
+    pd.testing.assert_frame_equal(df.astype(str), expected.astype(str))
+    assert str(df['pet_shop'].dtype) == 'category'
+    assert count_rows(path) == len(expected)
+    assert sum(len(chunk) for chunk in iter_table(path, SALES_BASE_SCHEMA, batch_size=50)) == len(expected)
+
+def test_csv_grava_volumes_inteiros_sem_casa_decimal(tmp_path):
+    """Os volumes em float64 saem no csv como na planilha: 210 e não 210.0, 150.5 como está."""
+    df = pd.DataFrame({
+        'uf': ['SP', 'RJ', 'MG'], 'id': ['a', 'b', 'c'], 'pet_shop': ['x', 'y', 'z'],
+        'compra_maio_2023_(kg)': [210.0, 150.5, float('nan')],
+    })
+    write_table(df, str(tmp_path / 'dados.csv'), SALES_BASE_SCHEMA)
+    with TableWriter(str(tmp_path / 'blocos.csv'), SALES_BASE_SCHEMA) as writer:
+        writer.write(df.iloc[:1])
+        writer.write(df.iloc[1:])
+
+    expected = 'uf,id,pet_shop,compra_maio_2023_(kg)\nSP,a,x,210\nRJ,b,y,150.5\nMG,c,z,\n'
+    assert (tmp_path / 'dados.csv').read_text(encoding='utf-8') == expected
+    assert (tmp_path / 'blocos.csv').read_text(encoding='utf-8') == expected
+    assert df['compra_maio_2023_(kg)'].dtype == 'float64'
@@ -0,0 +1,52 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dashboard_page_generator.validation import ColumnMapping, load_column_mapping, validate_sales_data
+
+VOLUME = 'compra_maio_2023_(kg)'
+
+@pytest.fixture
+def planilha():
+    """Linhas aceitas pelo dropna() original, mesmo com UF por extenso, id repetido e volume negativo."""
+    return pd.DataFrame({
+        'UF': ['SP', 'São Paulo', 'RJ', None, 'MG', ' '],
+        'ID': ['a', 'a', 'b', 'c', None, 'd'],
+        'Pet Shop': ['x', 'y', 'z', 'w', 'v', 'u'],
+        'Compra Maio 2023 (kg)': [10, 20.5, -3, 4, 5, 6],
+    })
+
+def test_padrao_equivale_ao_dropna(planilha):
+    clean_df, report = validate_sales_data(planilha, ColumnMapping(), 'vendas.xlsx')
+
+    expected = planilha.dropna()
+    assert clean_df['id'].tolist() == expected['ID'].tolist()
+    assert clean_df[VOLUME].tolist() == expected['Compra Maio 2023 (kg)'].astype(float).tolist()
+    assert report['motivos'] == {'uf_vazio': 1, 'id_vazio': 1}
+    assert report['exemplos'] == {'uf_vazio': [5], 'id_vazio': [6]}
+
+def test_quantidade_nao_numerica_rejeitada():
+    df = pd.DataFrame({'uf': ['SP', 'RJ'], 'id': ['a', 'b'], 'pet_shop': ['x', 'y'], VOLUME: [10, 'dez']})
+    clean_df, report = validate_sales_data(df, ColumnMapping(), 'vendas.xlsx')
+    assert clean_df[VOLUME].dtype == np.float64
+    assert report['motivos'] == {f'{VOLUME}_nao_numerico': 1}
+
+def test_regras_opcionais_do_mapeamento(tmp_path, planilha):
+    mapping_file = tmp_path / 'mapeamento.json'
+    mapping_file.write_text(json.dumps({
+        'uf': {'regras': ['sigla_uf', 'nao_branco']},
+        'id': {'regras': ['unico']},
+        VOLUME: {'regras': ['nao_negativo']},
+    }))
+    clean_df, report = validate_sales_data(planilha, load_column_mapping(str(mapping_file)), 'vendas.xlsx')
+
+    assert clean_df['id'].tolist() == ['a']
+    assert report['motivos'] == {
+        'uf_vazio': 1, 'uf_branco': 1, 'uf_invalida': 2, 'id_vazio': 1, 'id_duplicado': 1, f'{VOLUME}_negativo': 1,
+    }
+
+def test_regra_incompativel_com_o_tipo():
+    with pytest.raises(ValueError, match='nao_negativo'):
+        ColumnMapping({'uf': {'tipo': 'texto', 'regras': ['nao_negativo']}})